@@ -8,8 +8,9 @@ from django.utils.html import format_html
 from .models import DriverProfile, CustomLabel, SponsorProfile
 from .models import FailedLoginAttempt
 from .models import PasswordPolicy, LockoutPolicy
-from .models import ChatRoom, ChatMessage, MessageReadStatus
-from .models import SponsorPointsAccount, SponsorPointsTransaction
+from .models import ChatRoom, ChatMessage, ChatReadCursor
+from .models import SponsorPointsAccount, SponsorPointsTransaction, DriverPointsBalance, NotificationOutbox, UnreadCounter
+from .models import NotificationDigest
 from .models import BulkUploadLog
 from .models import ImpersonationLog
 
@@ -113,12 +114,11 @@ class ChatMessageAdmin(admin.ModelAdmin):
         return obj.message[:50] + "..." if len(obj.message) > 50 else obj.message
 
 
-@admin.register(MessageReadStatus)
-class MessageReadStatusAdmin(admin.ModelAdmin):
-    list_display = ("message", "user", "is_read", "read_at")
-    search_fields = ("user__username", "message__message")
-    list_filter = ("is_read", "read_at")
-    readonly_fields = ("read_at",)
+@admin.register(ChatReadCursor)
+class ChatReadCursorAdmin(admin.ModelAdmin):
+    list_display = ("chat_room", "user", "last_read_id", "updated_at")
+    search_fields = ("user__username", "chat_room__name")
+    readonly_fields = ("updated_at",)
 
 
 @admin.register(SponsorProfile)
@@ -161,6 +161,31 @@ class SponsorPointsTransactionAdmin(admin.ModelAdmin):
     search_fields = ("wallet__driver__username", "wallet__sponsor__username", "reason")
     readonly_fields = ("created_at",)
 
+@admin.register(DriverPointsBalance)
+class DriverPointsBalanceAdmin(admin.ModelAdmin):
+    list_display = ("driver", "total", "updated_at")
+    search_fields = ("driver__username",)
+    readonly_fields = ("driver", "total", "updated_at")
+
+@admin.register(UnreadCounter)
+class UnreadCounterAdmin(admin.ModelAdmin):
+    list_display = ("user", "notifications", "messages", "updated_at")
+    search_fields = ("user__username",)
+    readonly_fields = ("user", "notifications", "messages", "updated_at")
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ("user", "kind", "title", "status", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("status", "kind")
+    search_fields = ("user__username", "title")
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+@admin.register(NotificationDigest)
+class NotificationDigestAdmin(admin.ModelAdmin):
+    list_display = ("user", "day", "total")
+    search_fields = ("user__username",)
+    readonly_fields = ("user", "day", "total", "by_kind")
+
 @admin.register(BulkUploadLog)
 class BulkUploadLogAdmin(admin.ModelAdmin):
     list_display = ("filename", "uploaded_by", "created_at", "total_rows", "created_count", "skipped_count", "success_rate_display")
@@ -7,6 +7,7 @@ class AccountsConfig(AppConfig):
     
     def ready(self):
         import accounts.signals
+        import accounts.checks
         from django.db.models.signals import post_migrate
         from django.dispatch import receiver
         from .models import SecurityQuestion
@@ -0,0 +1,193 @@
+"""
+Monthly archive partitions for the append-only audit/ledger tables.
+
+Rows older than the archive horizon are moved out of the hot table into
+`<table>_archive_<yyyymm>` tables (see the `archive_history` command).
+Reports read through `history_rows`, which unions in only the monthly
+archives their date range overlaps.
+
+Archive models live in their own app registry so they never show up in
+migrations; foreign keys are stored as plain id columns.
+"""
+import datetime
+
+from django.apps.registry import Apps
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import PointsLedger, PointChangeLog, LoginActivity, FailedLoginAttempt, PasswordChangeLog
+
+# source name -> (model, date field used for the horizon and range reads)
+ARCHIVE_SOURCES = {
+    "points_ledger": (PointsLedger, "created_at"),
+    "point_change_log": (PointChangeLog, "created_at"),
+    "login_activity": (LoginActivity, "created_at"),
+    "failed_login_attempt": (FailedLoginAttempt, "timestamp"),
+    "password_change_log": (PasswordChangeLog, "created_at"),
+}
+
+ARCHIVE_TABLES_CACHE_KEY = "accounts.archive.tables:v1"
+
+_archive_apps = Apps()
+_archive_models = {}
+
+
+def _table_prefix(model):
+    return f"{model._meta.db_table}_archive_"
+
+
+def _copy_field(field, date_field):
+    if field.primary_key:
+        return models.BigIntegerField(primary_key=True, db_column=field.column)
+    if field.is_relation:
+        return models.BigIntegerField(null=field.null, blank=field.null, db_column=field.column)
+    _, _, args, kwargs = field.deconstruct()
+    # keep the original timestamps rather than stamping the archive time
+    kwargs.pop("auto_now", None)
+    kwargs.pop("auto_now_add", None)
+    kwargs.pop("editable", None)
+    if field.name == date_field:
+        kwargs["db_index"] = True
+    return field.__class__(*args, **kwargs)
+
+
+def archive_model(model, year, month):
+    """Model class for one month's archive table of `model`."""
+    key = (model._meta.label, year, month)
+    if key not in _archive_models:
+        date_field = next(d for m, d in ARCHIVE_SOURCES.values() if m is model)
+        attrs = {
+            f.attname: _copy_field(f, date_field)
+            for f in model._meta.concrete_fields
+        }
+        attrs["__module__"] = __name__
+        attrs["Meta"] = type("Meta", (), {
+            "app_label": model._meta.app_label,
+            "apps": _archive_apps,
+            "db_table": f"{_table_prefix(model)}{year:04d}{month:02d}",
+        })
+        name = f"{model.__name__}Archive{year:04d}{month:02d}"
+        _archive_models[key] = type(name, (models.Model,), attrs)
+    return _archive_models[key]
+
+
+def archive_tables():
+    tables = cache.get(ARCHIVE_TABLES_CACHE_KEY)
+    if tables is None:
+        tables = {t for t in connection.introspection.table_names() if "_archive_" in t}
+        cache.set(ARCHIVE_TABLES_CACHE_KEY, tables, 300)
+    return tables
+
+
+def _ensure_table(archive_cls):
+    if archive_cls._meta.db_table in archive_tables():
+        return
+    with connection.schema_editor() as editor:
+        editor.create_model(archive_cls)
+    cache.delete(ARCHIVE_TABLES_CACHE_KEY)
+
+
+def _month_key(value):
+    return value.year * 100 + value.month
+
+
+def archived_months(model, start=None, end=None):
+    """(year, month) pairs with an archive table for `model` inside [start, end]."""
+    prefix = _table_prefix(model)
+    lo = _month_key(start) if start else None
+    hi = _month_key(end) if end else None
+    months = []
+    for table in archive_tables():
+        suffix = table[len(prefix):] if table.startswith(prefix) else ""
+        if not suffix.isdigit():
+            continue
+        yyyymm = int(suffix)
+        if (lo is None or yyyymm >= lo) and (hi is None or yyyymm <= hi):
+            months.append(divmod(yyyymm, 100))
+    return sorted(months)
+
+
+def archivable(source, cutoff):
+    """Hot-table rows of `source` that an archive pass at `cutoff` would move."""
+    model, date_field = ARCHIVE_SOURCES[source]
+    qs = model.objects.filter(**{f"{date_field}__lt": cutoff})
+    if model is PointsLedger:
+        # keep each driver's newest row hot: PointsLedger.append chains off it
+        qs = qs.filter(Exists(PointsLedger.objects.filter(user_id=OuterRef("user_id"), id__gt=OuterRef("id"))))
+    return qs
+
+
+def archive_batch(source, cutoff, batch_size=1000):
+    """
+    Move up to `batch_size` rows older than `cutoff` from the hot table into
+    their monthly archives. Returns the number of rows moved (0 when done).
+    """
+    model, date_field = ARCHIVE_SOURCES[source]
+    qs = archivable(source, cutoff)
+
+    attnames = [f.attname for f in model._meta.concrete_fields]
+    rows = list(qs.order_by("pk").values(*attnames)[:batch_size])
+    if not rows:
+        return 0
+
+    by_month = {}
+    for row in rows:
+        when = row[date_field]
+        by_month.setdefault((when.year, when.month), []).append(row)
+
+    archives = {ym: archive_model(model, *ym) for ym in by_month}
+    for archive_cls in archives.values():
+        _ensure_table(archive_cls)
+
+    with transaction.atomic():
+        for ym, group in by_month.items():
+            archive_cls = archives[ym]
+            archive_cls.objects.bulk_create([archive_cls(**row) for row in group], ignore_conflicts=True)
+        model.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def history_rows(source, start=None, end=None, *q, fields, order_by=None, **filters):
+    """
+    values() rows for `source` over [start, end], from the hot table plus any
+    monthly archives that overlap the range. Filters must use the table's
+    own columns (e.g. `user_id`, not `user__username`).
+    """
+    model, date_field = ARCHIVE_SOURCES[source]
+    if start:
+        filters[f"{date_field}__gte"] = start
+    if end:
+        filters[f"{date_field}__lte"] = end
+
+    qs = model.objects.filter(*q, **filters).values(*fields).order_by()
+    parts = [
+        archive_model(model, year, month).objects.filter(*q, **filters).values(*fields).order_by()
+        for year, month in archived_months(model, start, end)
+    ]
+    if parts:
+        qs = qs.union(*parts, all=True)
+    if order_by:
+        qs = qs.order_by(*order_by)
+    return qs
+
+
+def archived_balance(user_id):
+    """balance_after of a driver's newest archived ledger row (0 if none)."""
+    for year, month in reversed(archived_months(PointsLedger)):
+        row = (
+            archive_model(PointsLedger, year, month).objects
+            .filter(user_id=user_id).order_by("-id").values_list("balance_after", flat=True).first()
+        )
+        if row is not None:
+            return row
+    return 0
+
+
+def archive_cutoff(horizon_days, now=None):
+    """Start of the day `horizon_days` ago; rows before it are archived."""
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    day = (now - datetime.timedelta(days=horizon_days)).date()
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
@@ -0,0 +1,128 @@
+"""
+Batched PointChangeLog writer.
+
+Ledger-writing code records audit rows with `record_point_change`; rows are
+buffered for the current transaction and flushed with one sponsor lookup and
+one bulk_create when it commits. Outside a transaction the row is written
+immediately. `@transaction.atomic` ledger writers are wrapped in
+`models.audit_outside_savepoint` so the flush is registered in the caller's
+block rather than under each call's own savepoint.
+
+Rows that name their ledger entry are dropped at flush time if that entry
+no longer exists, i.e. it was written inside a savepoint that rolled back.
+Bulk writers, whose ledger ids may be unknown (bulk_create on MySQL), use
+`block_audit_writer` instead: its flush is registered inside their own
+atomic block, so Django discards it if that block rolls back.
+"""
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import DriverProfile, PointChangeLog, PointsLedger
+
+_local = threading.local()
+
+
+class PointAuditWriter:
+    def __init__(self, using=DEFAULT_DB_ALIAS, key=None):
+        self.using = using
+        self.key = key
+        self.rows = []
+        # the outermost atomic block and the savepoints the flush is
+        # registered under; Django drops the callback if any rolls back
+        self.block = None
+        self.savepoint_ids = ()
+
+    def add(self, driver_id, delta, reason="", ledger_id=None):
+        self.rows.append((driver_id, delta, (reason or "")[:255], ledger_id))
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        if self.key is not None and _writers().get(self.key) is self:
+            del _writers()[self.key]
+        ledger_ids = {row[3] for row in rows if row[3] is not None}
+        if ledger_ids:
+            live = set(PointsLedger.objects.using(self.using).filter(id__in=ledger_ids).values_list("id", flat=True))
+            rows = [row for row in rows if row[3] is None or row[3] in live]
+        if not rows:
+            return []
+        sponsor_info = {
+            user_id: (name or "", email or "")
+            for user_id, name, email in DriverProfile.objects.using(self.using)
+            .filter(user_id__in={row[0] for row in rows})
+            .values_list("user_id", "sponsor_name", "sponsor_email")
+        }
+        return PointChangeLog.objects.using(self.using).bulk_create([
+            PointChangeLog(
+                driver_id=driver_id,
+                sponsor_name=sponsor_info.get(driver_id, ("", ""))[0],
+                sponsor_email=sponsor_info.get(driver_id, ("", ""))[1],
+                points_changed=delta,
+                reason=reason,
+            )
+            for driver_id, delta, reason, _ in rows
+        ], batch_size=1000)
+
+
+def _writers():
+    if not hasattr(_local, "writers"):
+        _local.writers = {}
+    return _local.writers
+
+
+def _savepoint_path(connection):
+    return tuple(sid for sid in connection.savepoint_ids if sid is not None)
+
+
+def _registration_live(writer, connection):
+    """Whether every block `writer` registered its flush under is still open."""
+    if not connection.atomic_blocks or connection.atomic_blocks[0] is not writer.block:
+        return False
+    path = _savepoint_path(connection)
+    return path[:len(writer.savepoint_ids)] == writer.savepoint_ids
+
+
+def point_audit_writer(using=None):
+    """
+    The audit writer for the current transaction on `using`, or None
+    outside a transaction. Its flush runs on commit.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    connection = connections[using]
+    writers = _writers()
+    if not connection.in_atomic_block:
+        # anything left here belonged to a transaction that rolled back
+        writers.pop(using, None)
+        return None
+
+    # don't reuse a writer registered under a block that has since closed:
+    # if it rolled back, Django dropped its callback and its rows went with it
+    writer = writers.get(using)
+    if writer is not None and not _registration_live(writer, connection):
+        writer = None
+    if writer is None:
+        writer = writers[using] = PointAuditWriter(using, using)
+        writer.block = connection.atomic_blocks[0]
+        writer.savepoint_ids = _savepoint_path(connection)
+        transaction.on_commit(writer.flush, using=using)
+    return writer
+
+
+def block_audit_writer(using=None):
+    """
+    A writer whose rows are written when the current atomic block commits,
+    and dropped with its on_commit callback if the block (or an enclosing
+    savepoint) rolls back. Call inside the block.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    writer = PointAuditWriter(using)
+    transaction.on_commit(writer.flush, using=using)
+    return writer
+
+
+def record_point_change(driver_id, delta, reason="", *, ledger_id=None, using=None):
+    """Queue a PointChangeLog row for `driver_id`; written on commit."""
+    writer = point_audit_writer(using) or PointAuditWriter(using or DEFAULT_DB_ALIAS)
+    writer.add(driver_id, delta, reason, ledger_id)
+    if writer.key is None:
+        writer.flush()
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Invalidation and the eBay breaker need one cache shared by every worker."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"The default cache ({backend}) is per-process.",
+        hint="Set REDIS_URL or MEMCACHED_LOCATION so every worker sees the same cache; "
+             "otherwise cached balances, preferences and chat access can go stale across workers.",
+        id="accounts.W001",
+    )]
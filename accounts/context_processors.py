@@ -1,7 +1,6 @@
 from .models import (
     DriverNotificationPreference,
-    Notification,
-    MessageRecipient,
+    UnreadCounter,
 )
 from django.utils import translation
 from django.conf import settings
@@ -14,7 +13,7 @@ def theme(request):
     val = "system"
     if request.user.is_authenticated:
         try:
-            val = DriverNotificationPreference.for_user(request.user).theme or "system"
+            val = DriverNotificationPreference.for_user(request.user, request).theme or "system"
         except Exception:
             pass
     return {"theme": val}
@@ -24,7 +23,7 @@ def apply_user_language(get_response):
     def middleware(request):
         if request.user.is_authenticated:
             try:
-                lang = request.user.notif_prefs.language
+                lang = DriverNotificationPreference.for_user(request.user, request).language
                 translation.activate(lang)
                 request.LANGUAGE_CODE = lang
             except Exception:
@@ -54,9 +53,10 @@ def unread_counts(request):
     if not getattr(request, "user", None) or not request.user.is_authenticated:
         return {}
     try:
+        notifications, messages = UnreadCounter.for_user(request.user)
         return {
-            "unread_notifications": Notification.objects.filter(user=request.user, read=False).count(),
-            "unread_messages": MessageRecipient.objects.filter(user=request.user, is_read=False).count(),
+            "unread_notifications": notifications,
+            "unread_messages": messages,
         }
     except Exception:
         # Be resilient if tables are missing during migrations
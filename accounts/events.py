@@ -0,0 +1,71 @@
+"""
+In-process pub/sub for the server-sent events stream (views.events_stream).
+
+Publishers wake subscribers on a topic ("room:<id>", "user:<id>"); the
+stream then reads new rows from the DB past its cursors, so a wake-up only
+says "look now" and coalesces bursts. Other processes (e.g. the
+dispatch_notifications worker) can't reach this hub; streams also re-check
+the DB every SSE_DB_POLL_SECONDS to pick those rows up.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+
+def room_topic(room_id):
+    return f"room:{room_id}"
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+class Subscription:
+    def __init__(self, topics, loop):
+        self.topics = tuple(topics)
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class EventHub:
+    def __init__(self):
+        self._subs = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        sub = Subscription(topics, asyncio.get_running_loop())
+        with self._lock:
+            for topic in sub.topics:
+                self._subs[topic].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for topic in sub.topics:
+                subs = self._subs.get(topic)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[topic]
+
+    def publish(self, *topics):
+        with self._lock:
+            subs = {sub for topic in topics for sub in self._subs.get(topic, ())}
+        for sub in subs:
+            try:
+                sub.wake()
+            except RuntimeError:
+                # the subscriber's loop already closed
+                pass
+
+    def publish_on_commit(self, *topics):
+        """Publish once the rows are visible to the streams' own queries."""
+        transaction.on_commit(lambda: self.publish(*topics))
+
+
+hub = EventHub()
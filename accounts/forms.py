@@ -223,7 +223,7 @@ class AddressForm(forms.ModelForm):
 class NotificationPreferenceForm(forms.ModelForm):
     class Meta:
         model = DriverNotificationPreference
-        fields = ["orders", "points", "promotions", "email_enabled", "sms_enabled", "sound_mode", "sound_file", "theme", "language", "low_balance_threshold", "low_balance_alert_enabled"]
+        fields = ["orders", "points", "promotions", "email_enabled", "sms_enabled", "email_digest", "sound_mode", "sound_file", "theme", "language", "low_balance_threshold", "low_balance_alert_enabled"]
         widgets = {
             "orders": forms.CheckboxInput(),
             "points": forms.CheckboxInput(),
@@ -237,6 +237,7 @@ class NotificationPreferenceForm(forms.ModelForm):
         labels = {
             "email_enabled": "Email alerts",
             "sms_enabled": "SMS alerts (preferred; no duplicate emails)",
+            "email_digest": "Points and order emails",
             "theme": "Theme",
             "low_balance_alert_enabled": "Warn me when my points are low",
             "low_balance_threshold": "Low balance threshold (points)",
@@ -337,6 +338,18 @@ class SponsorAwardForm(forms.Form):
         amt = self.cleaned_data["amount"]
         return amt if self.cleaned_data["action"] == "award" else -amt
     
+class SponsorBulkAwardForm(forms.Form):
+    """CSV of `driver,amount` rows; driver is a username or user id."""
+    file = forms.FileField(help_text="CSV rows: driver (username or ID), amount. Amount may be omitted to use the default below.")
+    default_amount = forms.IntegerField(min_value=1, required=False, label="Default amount")
+    reason = forms.CharField(required=False, max_length=255)
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        if not (f.name.endswith(".csv") or f.name.endswith(".txt")):
+            raise forms.ValidationError("Please upload a .csv or .txt file.")
+        return f
+
 class SponsorFeeRatioForm(forms.ModelForm):
     """Form for admins to set fee ratio (points per USD) for a sponsor."""
     class Meta:
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.archive import ARCHIVE_SOURCES, archivable, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move ledger/audit rows older than the horizon into monthly archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horizon-days", type=int, default=None,
+                            help="Archive rows older than this many days (default: settings.ARCHIVE_HORIZON_DAYS).")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows moved per transaction.")
+        parser.add_argument("--only", action="append", choices=sorted(ARCHIVE_SOURCES),
+                            help="Only archive these tables (repeatable).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count rows that would move without writing.")
+
+    def handle(self, *args, **opts):
+        horizon = opts["horizon_days"]
+        if horizon is None:
+            horizon = getattr(settings, "ARCHIVE_HORIZON_DAYS", 365)
+        if horizon < 1:
+            raise CommandError("--horizon-days must be at least 1.")
+        batch_size = opts["batch_size"]
+        cutoff = archive_cutoff(horizon)
+
+        for source in opts["only"] or ARCHIVE_SOURCES:
+            started = time.monotonic()
+            if opts["dry_run"]:
+                count = archivable(source, cutoff).count()
+                self.stdout.write(f"{source}: up to {count} rows older than {cutoff:%Y-%m-%d} would move")
+                continue
+
+            moved = 0
+            while True:
+                n = archive_batch(source, cutoff, batch_size)
+                if not n:
+                    break
+                moved += n
+            self.stdout.write(f"{source}: moved {moved} rows in {time.monotonic() - started:.2f}s")
+
+        self.stdout.write(self.style.SUCCESS(f"Archive pass complete (cutoff {cutoff:%Y-%m-%d})."))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.models import Message
+
+
+class Command(BaseCommand):
+    help = "Resume delivery of targeted messages whose chunked send was interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="Recipients per chunk (default: settings.MESSAGE_DELIVERY_CHUNK_SIZE).")
+
+    def handle(self, *args, **opts):
+        chunk_size = opts["chunk_size"] or getattr(settings, "MESSAGE_DELIVERY_CHUNK_SIZE", 1000)
+        pending = Message.objects.filter(delivery_status=Message.DELIVERY_PENDING, is_broadcast=False).order_by("id")
+        resumed = 0
+        for msg in pending.iterator():
+            before = msg.recipients_delivered
+            msg.deliver(chunk_size=chunk_size)
+            resumed += 1
+            self.stdout.write(f"Message {msg.id}: delivered {msg.recipients_delivered - before} more "
+                              f"({msg.recipients_delivered}/{msg.recipients_total})")
+        self.stdout.write(self.style.SUCCESS(f"Resumed {resumed} messages."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.notifications import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications (in-app rows and email) from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200,
+                            help="Outbox rows claimed per batch; their emails share one SMTP connection.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep polling instead of exiting once the queue is drained.")
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="Seconds to sleep between polls when idle (with --loop).")
+
+    def handle(self, *args, **opts):
+        totals = {"claimed": 0, "in_app": 0, "sent": 0, "held": 0, "retry": 0, "failed": 0}
+        started = time.monotonic()
+        while True:
+            counts = dispatch_outbox(batch_size=opts["batch_size"])
+            for k, v in counts.items():
+                totals[k] += v
+            if counts["claimed"]:
+                continue
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dispatched {totals['claimed']} notifications: {totals['in_app']} in-app, "
+            f"{totals['sent']} delivered, {totals['held']} held for digests, {totals['retry']} to retry, {totals['failed']} failed "
+            f"in {time.monotonic() - started:.2f}s."
+        ))
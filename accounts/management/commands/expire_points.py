@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from accounts.models import PointsLot
+from accounts.services import expire_points_for
+
+
+class Command(BaseCommand):
+    help = "Expire due points lots, posting one debit per driver/wallet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Lots read per index scan batch.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would expire without writing.")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"]
+        dry_run = opts["dry_run"]
+        now = timezone.now()
+        started = time.monotonic()
+
+        # Walk due lots along the expires_at index with a (expires_at, id) keyset
+        due = PointsLot.objects.filter(remaining__gt=0, expires_at__lte=now).order_by("expires_at", "id")
+        if dry_run:
+            totals = due.aggregate(s=Sum("remaining"))
+            wallets = due.values("user_id", "wallet_id").distinct().count()
+            self.stdout.write(self.style.SUCCESS(
+                f"Would expire {totals['s'] or 0} points across {wallets} driver wallets "
+                f"in {time.monotonic() - started:.2f}s."
+            ))
+            return
+
+        expired_total = 0
+        wallets = 0
+        failed = set()
+        cursor = None
+        while True:
+            qs = due
+            if cursor:
+                qs = qs.filter(Q(expires_at__gt=cursor[0]) | Q(expires_at=cursor[0], id__gt=cursor[1]))
+            batch = list(qs.values_list("id", "expires_at", "user_id", "wallet_id")[:batch_size])
+            if not batch:
+                break
+            cursor = (batch[-1][1], batch[-1][0])
+
+            # each pair is drained in full, so it can't turn up in a later batch
+            # unless it failed
+            pairs = {(user_id, wallet_id) for _, _, user_id, wallet_id in batch} - failed
+            for user_id, wallet_id in sorted(pairs, key=lambda p: (p[0], p[1] or 0)):
+                try:
+                    expired_total += expire_points_for(user_id, wallet_id, now=now)
+                except Exception as exc:
+                    failed.add((user_id, wallet_id))
+                    self.stderr.write(f"User {user_id} wallet {wallet_id}: {exc}")
+                    continue
+                wallets += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {expired_total} points across {wallets} driver wallets "
+            f"in {time.monotonic() - started:.2f}s."
+        ))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from accounts.models import Notification
+from accounts.notifications import prune_notification_range
+
+
+class Command(BaseCommand):
+    help = "Delete notifications past their per-kind retention in small primary-key ranges."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Width of each primary-key range (one short transaction each).")
+        parser.add_argument("--digest", action="store_true",
+                            help="Roll pruned read notifications into per-user daily digest rows.")
+        parser.add_argument("--sleep", type=float, default=0,
+                            help="Seconds to pause between ranges.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count what would be pruned without deleting.")
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, opts["batch_size"])
+        now = timezone.now()
+        started = time.monotonic()
+
+        bounds = Notification.objects.aggregate(lo=Min("id"), hi=Max("id"))
+        if bounds["lo"] is None:
+            self.stdout.write(self.style.SUCCESS("No notifications."))
+            return
+
+        totals = {}
+        lo = bounds["lo"]
+        while lo <= bounds["hi"]:
+            hi = lo + batch_size
+            pruned = prune_notification_range(lo, hi, now=now, digest=opts["digest"], dry_run=opts["dry_run"])
+            for kind, n in pruned.items():
+                totals[kind] = totals.get(kind, 0) + n
+            lo = hi
+            if opts["sleep"] and pruned:
+                time.sleep(opts["sleep"])
+
+        for kind, n in sorted(totals.items()):
+            self.stdout.write(f"  {kind}: {n}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(totals.values())} notifications {'would be pruned' if opts['dry_run'] else 'pruned'} "
+            f"({time.monotonic() - started:.2f}s)."
+        ))
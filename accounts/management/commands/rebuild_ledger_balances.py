@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.archive import archived_balance
+from accounts.models import PointsLedger
+
+
+class Command(BaseCommand):
+    help = "Rebuild PointsLedger.balance_after chains as running totals of delta, in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user-id", type=int, action="append", dest="user_ids",
+                            help="Only rebuild these users (repeatable). Default: everyone with ledger rows.")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows per bulk_update.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report broken chains without writing.")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"]
+        dry_run = opts["dry_run"]
+
+        user_ids = opts["user_ids"] or (
+            PointsLedger.objects.order_by().values_list("user_id", flat=True).distinct()
+        )
+
+        users_fixed = 0
+        rows_fixed = 0
+        for user_id in user_ids:
+            fixed = self._rebuild_user(user_id, batch_size, dry_run)
+            if fixed:
+                users_fixed += 1
+                rows_fixed += fixed
+                self.stdout.write(f"User {user_id}: {fixed} rows {'would be ' if dry_run else ''}rewritten")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Found' if dry_run else 'Rebuilt'} {rows_fixed} rows across {users_fixed} users."
+        ))
+
+    def _rebuild_user(self, user_id, batch_size, dry_run):
+        fixed = 0
+        pending = []
+        # archived rows are never rewritten; continue the chain from them
+        running = archived_balance(user_id)
+        with transaction.atomic():
+            rows = (
+                PointsLedger.objects.select_for_update()
+                .filter(user_id=user_id)
+                .order_by("id")
+                .only("id", "delta", "balance_after")
+            )
+            for row in rows.iterator(chunk_size=batch_size):
+                running += row.delta
+                if row.balance_after == running:
+                    continue
+                row.balance_after = running
+                pending.append(row)
+                fixed += 1
+                if len(pending) >= batch_size:
+                    if not dry_run:
+                        PointsLedger.objects.bulk_update(pending, ["balance_after"])
+                    pending = []
+            if pending and not dry_run:
+                PointsLedger.objects.bulk_update(pending, ["balance_after"])
+        return fixed
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from accounts.models import MessageRecipient, Notification, UnreadCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user unread notification/message counters and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report drifted counters without rewriting them.")
+
+    def handle(self, *args, **opts):
+        dry_run = opts["dry_run"]
+
+        notifications = dict(
+            Notification.objects.filter(read=False).order_by()
+            .values("user_id").annotate(n=Count("id")).values_list("user_id", "n")
+        )
+        messages = dict(
+            MessageRecipient.objects.filter(is_read=False, is_deleted=False).order_by()
+            .values("user_id").annotate(n=Count("id")).values_list("user_id", "n")
+        )
+        # unopened broadcasts have no rows and aren't part of the stored counter
+        stored = {
+            user_id: (n, m)
+            for user_id, n, m in UnreadCounter.objects.values_list("user_id", "notifications", "messages")
+        }
+
+        drifted = []
+        for user_id in sorted(set(notifications) | set(messages) | set(stored)):
+            want = (notifications.get(user_id, 0), messages.get(user_id, 0))
+            have = stored.get(user_id)
+            if have == want or (have is None and want == (0, 0)):
+                continue
+            drifted.append(user_id)
+            self.stdout.write(f"User {user_id}: counter={have} actual={want}")
+
+        if not dry_run:
+            for user_id in drifted:
+                UnreadCounter.recompute(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(drifted)} counters {'drifted' if dry_run else 'repaired'}."
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from accounts.models import SponsorPointsAccount, DriverPointsBalance
+
+
+class Command(BaseCommand):
+    help = "Recompute per-driver points summaries from sponsor wallets and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true",
+                            help="Rewrite drifted summaries instead of only reporting them.")
+
+    def handle(self, *args, **opts):
+        fix = opts["fix"]
+
+        expected = dict(
+            SponsorPointsAccount.objects
+            .values("driver_id")
+            .annotate(total=Sum("balance"))
+            .values_list("driver_id", "total")
+        )
+        stored = dict(DriverPointsBalance.objects.values_list("driver_id", "total"))
+
+        drifted = 0
+        for driver_id in sorted(set(expected) | set(stored)):
+            want = expected.get(driver_id) or 0
+            have = stored.get(driver_id)
+            if have == want:
+                continue
+            drifted += 1
+            self.stdout.write(f"Driver {driver_id}: summary={have} wallets={want}")
+            if fix:
+                DriverPointsBalance.recompute(driver_id)
+
+        checked = len(set(expected) | set(stored))
+        if drifted and not fix:
+            self.stdout.write(self.style.WARNING(
+                f"Checked {checked} drivers, {drifted} drifted. Re-run with --fix to repair."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Checked {checked} drivers, {drifted} {'repaired' if fix else 'drifted'}."
+            ))
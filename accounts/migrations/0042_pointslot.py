@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_lots_from_wallets(apps, schema_editor):
+    """Open one non-expiring lot per funded wallet so FIFO debits start from the current balance."""
+    SponsorPointsAccount = apps.get_model("accounts", "SponsorPointsAccount")
+    PointsLot = apps.get_model("accounts", "PointsLot")
+    lots = [
+        PointsLot(user_id=w.driver_id, wallet_id=w.id, amount=w.balance, remaining=w.balance, created_at=w.created_at)
+        for w in SponsorPointsAccount.objects.filter(balance__gt=0).iterator()
+    ]
+    PointsLot.objects.bulk_create(lots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0041_driverpointsbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField()),
+                ('remaining', models.PositiveIntegerField()),
+                ('expired', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_lots', to=settings.AUTH_USER_MODEL)),
+                ('wallet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='accounts.sponsorpointsaccount')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['expires_at'], name='accounts_po_expires_5fb135_idx')],
+            },
+        ),
+        migrations.RunPython(seed_lots_from_wallets, migrations.RunPython.noop),
+    ]
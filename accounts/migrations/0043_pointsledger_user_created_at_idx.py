@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0042_pointslot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pointsledger',
+            index=models.Index(fields=['user', 'created_at'], name='accounts_po_user_id_4c5972_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_from_notifications(apps, schema_editor):
+    """Carry over alerts already sent so upgrading doesn't re-send them."""
+    import re
+
+    Notification = apps.get_model("accounts", "Notification")
+    AlertState = apps.get_model("accounts", "AlertState")
+    states = set()
+    for user_id in (
+        Notification.objects.filter(kind="points", title="Low Points Alert")
+        .values_list("user_id", flat=True).distinct().iterator()
+    ):
+        states.add((user_id, "low_balance", 0))
+    order_re = re.compile(r"Order #(\d+) ")
+    for user_id, body in (
+        Notification.objects.filter(kind="orders", title="Order Delayed")
+        .values_list("user_id", "body").iterator()
+    ):
+        m = order_re.search(body or "")
+        if m:
+            states.add((user_id, "order_delayed", int(m.group(1))))
+    AlertState.objects.bulk_create(
+        [AlertState(user_id=u, alert_type=t, subject_id=sid) for u, t, sid in states],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0044_notificationoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('low_balance', 'Low balance'), ('order_delayed', 'Order delayed')], max_length=20)),
+                ('subject_id', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'alert_type', 'subject_id'), name='uniq_alert_state')],
+            },
+        ),
+        migrations.RunPython(seed_from_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_recipient_counts(apps, schema_editor):
+    """Existing messages were delivered in one go; record their recipient counts."""
+    from django.db.models import Count
+
+    Message = apps.get_model("accounts", "Message")
+    counts = Message.objects.annotate(n=Count("recipients")).filter(n__gt=0).values_list("id", "n")
+    for message_id, n in counts.iterator():
+        Message.objects.filter(id=message_id).update(recipients_total=n, recipients_delivered=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0046_unreadcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='delivery_cursor',
+            field=models.PositiveBigIntegerField(default=0, help_text='Highest recipient user id delivered so far.'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='delivery_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done')], default='done', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='is_broadcast',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='recipients_delivered',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='recipients_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagerecipient',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['is_broadcast', 'created_at'], name='accounts_me_is_broa_cd4497_idx'),
+        ),
+        migrations.RunPython(backfill_recipient_counts, migrations.RunPython.noop),
+    ]
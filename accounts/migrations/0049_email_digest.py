@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0048_notificationdigest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drivernotificationpreference',
+            name='email_digest',
+            field=models.CharField(choices=[('immediate', 'Send each email right away'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('digest', 'Held for digest'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+    ]
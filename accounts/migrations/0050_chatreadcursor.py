@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def collapse_read_statuses(apps, schema_editor):
+    """One cursor per (room, user) at the newest message they had read."""
+    MessageReadStatus = apps.get_model("accounts", "MessageReadStatus")
+    ChatReadCursor = apps.get_model("accounts", "ChatReadCursor")
+    rows = (
+        MessageReadStatus.objects.filter(is_read=True).order_by()
+        .values("message__chat_room_id", "user_id").annotate(last=Max("message_id"))
+    )
+    ChatReadCursor.objects.bulk_create(
+        [ChatReadCursor(chat_room_id=r["message__chat_room_id"], user_id=r["user_id"], last_read_id=r["last"])
+         for r in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0049_email_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chat_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='accounts.chatroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_cursors', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Chat Read Cursor',
+                'verbose_name_plural': 'Chat Read Cursors',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chatreadcursor',
+            constraint=models.UniqueConstraint(fields=('chat_room', 'user'), name='uniq_chat_read_cursor'),
+        ),
+        migrations.RunPython(collapse_read_statuses, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='MessageReadStatus',
+        ),
+    ]
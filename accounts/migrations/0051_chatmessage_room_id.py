@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0050_chatreadcursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['chat_room', 'id'], name='chatmessage_room_id'),
+        ),
+    ]
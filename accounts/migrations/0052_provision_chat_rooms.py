@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def provision_rooms(apps, schema_editor):
+    """Rooms used to be created lazily on the chat list page; create the missing ones now."""
+    ChatRoom = apps.get_model("accounts", "ChatRoom")
+    SponsorshipRequest = apps.get_model("accounts", "SponsorshipRequest")
+    User = apps.get_model("auth", "User")
+
+    involved = set()
+    for from_id, to_id in SponsorshipRequest.objects.filter(status="approved").values_list("from_user_id", "to_user_id"):
+        involved.update((from_id, to_id))
+    sponsors = (
+        User.objects.filter(id__in=involved, groups__name="sponsor")
+        .exclude(sponsor_chat_rooms__isnull=False)
+        .distinct()
+    )
+    ChatRoom.objects.bulk_create(
+        [ChatRoom(sponsor_id=s.id, name=f"{s.username}'s Team Chat") for s in sponsors],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0051_chatmessage_room_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(provision_rooms, migrations.RunPython.noop),
+    ]
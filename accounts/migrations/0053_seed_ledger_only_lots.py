@@ -0,0 +1,54 @@
+from django.db import migrations
+from django.db.models import Max, Min, Sum
+
+
+def seed_ledger_only_lots(apps, schema_editor):
+    """
+    0042 only opened lots for wallet balances. Points added straight to the
+    ledger (adjust_points) before lots existed had none, so open one
+    non-expiring wallet-less lot per driver for whatever part of their ledger
+    balance isn't covered by wallets or existing wallet-less lots.
+    """
+    PointsLedger = apps.get_model("accounts", "PointsLedger")
+    PointsLot = apps.get_model("accounts", "PointsLot")
+    SponsorPointsAccount = apps.get_model("accounts", "SponsorPointsAccount")
+
+    wallet_totals = dict(
+        SponsorPointsAccount.objects.values("driver_id").annotate(s=Sum("balance")).values_list("driver_id", "s")
+    )
+    open_lots = dict(
+        PointsLot.objects.filter(wallet__isnull=True)
+        .values("user_id").annotate(s=Sum("remaining")).values_list("user_id", "s")
+    )
+    tails = list(
+        PointsLedger.objects.values("user_id")
+        .annotate(last_id=Max("id"), first_at=Min("created_at"))
+        .values_list("user_id", "last_id", "first_at")
+    )
+
+    for start in range(0, len(tails), 1000):
+        chunk = tails[start:start + 1000]
+        balances = dict(
+            PointsLedger.objects.filter(id__in=[last_id for _, last_id, _ in chunk])
+            .values_list("user_id", "balance_after")
+        )
+        lots = []
+        for user_id, _, first_at in chunk:
+            uncovered = balances.get(user_id, 0) - (wallet_totals.get(user_id) or 0) - (open_lots.get(user_id) or 0)
+            if uncovered > 0:
+                # oldest first, so FIFO debits drain it before newer expiring lots
+                lots.append(PointsLot(
+                    user_id=user_id, wallet_id=None, amount=uncovered, remaining=uncovered, created_at=first_at,
+                ))
+        PointsLot.objects.bulk_create(lots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0052_provision_chat_rooms'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_ledger_only_lots, migrations.RunPython.noop),
+    ]
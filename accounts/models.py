@@ -1,15 +1,22 @@
 from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Sum, F, Q, Exists, OuterRef
+from django.core.cache import cache
 from django.contrib.auth.models import User
 from django.core.validators import validate_email
 from django.core.validators import FileExtensionValidator # for validating uploaded file types
 from django.contrib.auth.hashers import make_password, check_password
+import functools
 import os
 import pyotp
 from django.core.exceptions import ValidationError
 
+POINTS_BALANCE_CACHE_KEY = "accounts.points_balance:v1:{driver_id}"
+UNREAD_COUNTS_CACHE_KEY = "accounts.unread_counts:v2:{generation}:{user_id}"
+BROADCAST_GENERATION_CACHE_KEY = "accounts.broadcast_generation:v1"
+CHAT_PARTICIPANTS_CACHE_KEY = "accounts.chat_participants:v1:{sponsor_id}"
+
 
 def avatar_upload_path_to(instance, filename):
     base, ext = os.path.splitext(filename.lower())
@@ -228,6 +235,18 @@ class DriverNotificationPreference(models.Model):
     email_enabled = models.BooleanField(default=True)
     sms_enabled = models.BooleanField(default=False)
 
+    # Email digest: points and order emails held and sent as one summary
+    DIGEST_IMMEDIATE = "immediate"
+    DIGEST_HOURLY = "hourly"
+    DIGEST_DAILY = "daily"
+    DIGEST_CHOICES = [
+        (DIGEST_IMMEDIATE, "Send each email right away"),
+        (DIGEST_HOURLY, "Hourly digest"),
+        (DIGEST_DAILY, "Daily digest"),
+    ]
+    DIGEST_KINDS = ("points", "orders")
+    email_digest = models.CharField(max_length=10, choices=DIGEST_CHOICES, default=DIGEST_IMMEDIATE)
+
     # Visual theme
     THEME_CHOICES = [
         ("system", "System / Default"),
@@ -263,22 +282,13 @@ class DriverNotificationPreference(models.Model):
         return f"NotifPrefs<{self.user}>"
 
     @classmethod
-    def for_user(cls, user):
-        """Get or create preferences for a user with sensible defaults."""
-        obj, _ = cls.objects.get_or_create(
-            user=user,
-            defaults={
-                "orders": True,
-                "points": True,
-                "promotions": False,
-                "email_enabled": True,
-                "sms_enabled": False,
-                "sound_mode": "default",
-                "low_balance_alert_enabled": True,
-                "low_balance_threshold": 100,
-            },
-        )
-        return obj
+    def for_user(cls, user, request=None):
+        """
+        Read-only preferences for a user (model defaults if they have no row).
+        Served through accounts.prefs, so repeat lookups skip the DB.
+        """
+        from .prefs import get_prefs
+        return get_prefs(user, request)
     
 class Notification(models.Model):
     KIND_CHOICES = [
@@ -298,10 +308,140 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="notification_user_created"),
+        ]
 
     def __str__(self):
         return f"[{self.kind}] {self.title} → {self.user}"
-    
+
+
+class NotificationDigest(models.Model):
+    """
+    Per-user daily roll-up of read notifications removed by
+    prune_notifications --digest: how many there were, by kind.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notification_digests")
+    day = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+    by_kind = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day"], name="uniq_notification_digest"),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.total} notifications → {self.user}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    A notification intent, written in the same transaction as the change
+    that caused it. The dispatch_notifications worker turns pending rows
+    into in-app Notification rows and emails, retrying failed sends.
+    Rows whose email belongs in the user's digest wait in STATUS_DIGEST
+    until flush_notification_digests sends them.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_DIGEST = "digest"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DIGEST, "Held for digest"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notification_outbox")
+    kind = models.CharField(max_length=20, choices=Notification.KIND_CHOICES)
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    url = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    in_app_done = models.BooleanField(default=False)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"[{self.status}] {self.title} → {self.user}"
+
+class AlertState(models.Model):
+    """
+    One row per alert that has fired and must not fire again until re-armed,
+    keyed by (user, alert_type, subject_id). subject_id is the order id for
+    delayed-order alerts and 0 for per-user alerts such as low balance.
+    """
+    LOW_BALANCE = "low_balance"
+    ORDER_DELAYED = "order_delayed"
+    ALERT_CHOICES = [
+        (LOW_BALANCE, "Low balance"),
+        (ORDER_DELAYED, "Order delayed"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="alert_states")
+    alert_type = models.CharField(max_length=20, choices=ALERT_CHOICES)
+    subject_id = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "alert_type", "subject_id"], name="uniq_alert_state"),
+        ]
+
+    def __str__(self):
+        return f"{self.alert_type}:{self.subject_id} → {self.user}"
+
+    @classmethod
+    def claim(cls, user_id, alert_type, subject_id=0) -> bool:
+        """
+        Mark the alert as fired. Returns False if it already had, so callers
+        send only when this returns True. Safe under concurrent claims.
+        """
+        _, created = cls.objects.get_or_create(user_id=user_id, alert_type=alert_type, subject_id=subject_id)
+        return created
+
+    @classmethod
+    def rearm(cls, user_id, alert_type, subject_id=0) -> None:
+        """Allow the alert to fire again (e.g. balance recovered)."""
+        cls.objects.filter(user_id=user_id, alert_type=alert_type, subject_id=subject_id).delete()
+
+
+def lock_drivers(driver_ids):
+    """
+    Row-lock the drivers' auth_user rows (in id order, so concurrent callers
+    can't deadlock). Per-driver summaries whose first row may not exist yet
+    serialize on this; call inside the writing transaction.
+    """
+    list(User.objects.select_for_update().filter(id__in=driver_ids).order_by("id").values_list("id", flat=True))
+
+
+def audit_outside_savepoint(func):
+    """
+    For `@transaction.atomic` ledger writers: take the caller's audit writer
+    (accounts.audit) before the function's own savepoint opens, so repeated
+    calls in one transaction share one flush instead of each registering it
+    under a savepoint that is gone by the next call. Goes above the atomic.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from .audit import point_audit_writer
+        point_audit_writer()
+        return func(*args, **kwargs)
+    return wrapper
+
+
 class PointsLedger(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="points_ledger")
     delta = models.IntegerField()  # positive or negative
@@ -312,11 +452,38 @@ class PointsLedger(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+        ]
 
     def __str__(self):
         sign = "+" if self.delta >= 0 else ""
         return f"{self.user} {sign}{self.delta} ({self.reason}) → {self.balance_after}"
     
+    @classmethod
+    def append(cls, user, delta, *, reason="", expires_at=None):
+        """
+        Append a ledger row chained off the driver's previous balance_after.
+        Concurrent writers for the same driver serialize on the driver's user
+        row, which exists even before their first ledger row; the previous
+        row is then an indexed (user, id) probe rather than a ledger SUM.
+        """
+        lock_drivers([user.pk])
+        prior_total = (
+            cls.objects.select_for_update()
+            .filter(user=user)
+            .order_by("-id")
+            .values_list("balance_after", flat=True)
+            .first()
+        ) or 0
+        return cls.objects.create(
+            user=user,
+            delta=delta,
+            reason=reason,
+            balance_after=prior_total + delta,
+            expires_at=expires_at,
+        )
+
     def is_expired(self):
         """Check if these points have expired."""
         if not self.expires_at:
@@ -394,11 +561,95 @@ class Message(models.Model):
     direct_users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="messages_direct", blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # "All users" messages are stored once; MessageRecipient rows for them
+    # only appear when a user opens or deletes one.
+    is_broadcast = models.BooleanField(default=False)
+
+    # Targeted sends are delivered in chunks of recipient ids; progress lets
+    # `deliver_messages` resume a send that was interrupted.
+    DELIVERY_PENDING = "pending"
+    DELIVERY_DONE = "done"
+    DELIVERY_CHOICES = [(DELIVERY_PENDING, "Pending"), (DELIVERY_DONE, "Done")]
+    delivery_status = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default=DELIVERY_DONE)
+    recipients_total = models.PositiveIntegerField(default=0)
+    recipients_delivered = models.PositiveIntegerField(default=0)
+    delivery_cursor = models.PositiveBigIntegerField(default=0, help_text="Highest recipient user id delivered so far.")
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["is_broadcast", "created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.subject} ({self.created_at:%Y-%m-%d %H:%M})"
+
+    def audience_q(self):
+        """Q over active users for a targeted message, or None if it has no audience."""
+        q = Q()
+        if self.include_admins:
+            q |= Q(is_staff=True) | Q(is_superuser=True)
+        if self.include_sponsors:
+            q |= Q(groups__name="sponsor")
+        if self.include_drivers:
+            q |= (
+                Q(driver_profile__isnull=False)
+                & ~Q(groups__name="sponsor")
+                & ~Q(is_staff=True) & ~Q(is_superuser=True)
+            )
+        direct_ids = list(self.direct_users.values_list("id", flat=True))
+        if direct_ids:
+            q |= Q(id__in=direct_ids)
+        return q or None
+
+    def audience(self):
+        q = self.audience_q()
+        users = User.objects.filter(is_active=True)
+        return users.filter(q).distinct() if q is not None else users.none()
+
+    def deliver(self, chunk_size=1000):
+        """
+        Create MessageRecipient rows for the audience in id order, one short
+        transaction per chunk, recording progress after each. Safe to call
+        again on a partly delivered message: it resumes from the cursor.
+        """
+        audience = self.audience().order_by("id")
+        while True:
+            ids = list(audience.filter(id__gt=self.delivery_cursor).values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                MessageRecipient.objects.bulk_create(
+                    [MessageRecipient(message=self, user_id=u) for u in ids], ignore_conflicts=True,
+                )
+                UnreadCounter.adjust_many(messages={u: 1 for u in ids})
+                self.delivery_cursor = ids[-1]
+                self.recipients_delivered += len(ids)
+                Message.objects.filter(pk=self.pk).update(
+                    delivery_cursor=self.delivery_cursor, recipients_delivered=self.recipients_delivered,
+                )
+        self.delivery_status = self.DELIVERY_DONE
+        Message.objects.filter(pk=self.pk).update(delivery_status=self.DELIVERY_DONE)
+
+    # --- broadcasts ---
+
+    @classmethod
+    def broadcasts_for(cls, user):
+        """Broadcasts addressed to `user` (sent since they joined)."""
+        return cls.objects.filter(is_broadcast=True, created_at__gte=user.date_joined)
+
+    @classmethod
+    def unopened_broadcasts_for(cls, user):
+        """Broadcasts with no MessageRecipient row yet for `user`, i.e. unread and not deleted."""
+        return cls.broadcasts_for(user).exclude(recipients__user=user)
+
+    @staticmethod
+    def broadcasts_changed():
+        """New or removed broadcast: every user's unread badge needs recounting."""
+        try:
+            cache.incr(BROADCAST_GENERATION_CACHE_KEY)
+        except ValueError:
+            cache.set(BROADCAST_GENERATION_CACHE_KEY, 1, None)
     
 class MessageRecipient(models.Model):
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name="recipients")
@@ -406,6 +657,8 @@ class MessageRecipient(models.Model):
     is_read = models.BooleanField(default=False)
     delivered_at = models.DateTimeField(auto_now_add=True) #for ordering
     read_at = models.DateTimeField(null=True, blank=True)
+    # broadcast rows are kept (hidden) when deleted so the message stays gone
+    is_deleted = models.BooleanField(default=False)
 
     class Meta:
         unique_together = (("message", "user"),)
@@ -626,34 +879,89 @@ class ChatRoom(models.Model):
     def __str__(self):
         return self.name or f"Chat with {self.sponsor.username}"
     
+    @staticmethod
+    def invalidate_participants(*user_ids):
+        """Drop cached participant sets for rooms sponsored by any of `user_ids`."""
+        keys = [CHAT_PARTICIPANTS_CACHE_KEY.format(sponsor_id=u) for u in user_ids]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def participant_ids(self):
+        """
+        Ids of the sponsor and every driver with an approved sponsorship
+        with them, cached per sponsor until a sponsorship changes (and for
+        at most CHAT_PARTICIPANTS_CACHE_SECONDS, since this gates access).
+        """
+        key = CHAT_PARTICIPANTS_CACHE_KEY.format(sponsor_id=self.sponsor_id)
+        ids = cache.get(key)
+        if ids is None:
+            approved = SponsorshipRequest.objects.filter(status="approved")
+            ids = frozenset(
+                DriverProfile.objects.filter(
+                    Exists(approved.filter(from_user_id=OuterRef("user_id"), to_user_id=self.sponsor_id))
+                    | Exists(approved.filter(to_user_id=OuterRef("user_id"), from_user_id=self.sponsor_id))
+                ).values_list("user_id", flat=True)
+            ) | {self.sponsor_id}
+            if not transaction.get_connection().in_atomic_block:
+                cache.set(key, ids, getattr(settings, "CHAT_PARTICIPANTS_CACHE_SECONDS", 60))
+        return ids
+
+    def has_participant(self, user):
+        return user.pk in self.participant_ids()
+
     def get_participants(self):
         """Get all participants in this chat room (sponsor + all drivers)"""
-        # Get drivers from approved sponsorship requests
-        from django.db.models import Q
-        approved_requests = SponsorshipRequest.objects.filter(
-            Q(from_user=self.sponsor, status="approved") | Q(to_user=self.sponsor, status="approved")
-        ).select_related("from_user", "to_user")
-        
-        drivers = []
-        for req in approved_requests:
-            # Get the driver (the other user who is a driver)
-            if req.from_user == self.sponsor:
-                other_user = req.to_user
-            else:
-                other_user = req.from_user
-            
-            if hasattr(other_user, "driver_profile"):
-                drivers.append(other_user)
-        
+        drivers = list(User.objects.filter(id__in=self.participant_ids() - {self.sponsor_id}).order_by("username"))
         return drivers + [self.sponsor]
     
+    @classmethod
+    def ensure_for(cls, sponsor):
+        """The sponsor's team chat, created the first time a sponsorship is approved."""
+        room, _ = cls.objects.get_or_create(
+            sponsor=sponsor,
+            defaults={"name": f"{sponsor.username}'s Team Chat"}
+        )
+        return room
+
+    @classmethod
+    def list_for(cls, user, is_sponsor):
+        """
+        The user's rooms in one query, annotated with the latest message
+        (latest_message_text/_sender/_at) and unread_count past their
+        read cursor.
+        """
+        from django.db.models import Count, IntegerField, Subquery
+        from django.db.models.functions import Coalesce
+
+        if is_sponsor:
+            rooms = cls.objects.filter(sponsor=user)
+        else:
+            approved = SponsorshipRequest.objects.filter(status="approved")
+            rooms = cls.objects.filter(
+                Exists(approved.filter(from_user_id=user.pk, to_user_id=OuterRef("sponsor_id")))
+                | Exists(approved.filter(to_user_id=user.pk, from_user_id=OuterRef("sponsor_id")))
+            )
+
+        latest = ChatMessage.objects.filter(chat_room_id=OuterRef("pk")).order_by("-id")
+        cursor = ChatReadCursor.objects.filter(chat_room_id=OuterRef("pk"), user_id=user.pk).values("last_read_id")[:1]
+        return rooms.annotate(
+            latest_message_text=Subquery(latest.values("message")[:1]),
+            latest_message_sender=Subquery(latest.values("sender__username")[:1]),
+            latest_message_at=Subquery(latest.values("created_at")[:1]),
+            last_read_id=Coalesce(Subquery(cursor), 0, output_field=IntegerField()),
+            unread_count=Count(
+                "messages",
+                filter=Q(messages__id__gt=F("last_read_id")) & ~Q(messages__sender_id=user.pk),
+            ),
+        )
+
     def get_latest_message(self):
         """Get the most recent message in this chat room"""
         return self.messages.order_by("-created_at").first()
     
     def get_unread_count(self, user):
         """Get count of unread messages for a specific user"""
-        return self.messages.exclude(sender=user).filter(read_by__user=user, read_by__is_read=False).count()
+        return self.messages.exclude(sender=user).filter(id__gt=ChatReadCursor.last_read(self.id, user.pk)).count()
 
 
 class ChatMessage(models.Model):
@@ -678,44 +986,79 @@ class ChatMessage(models.Model):
         ordering = ["created_at"]
         verbose_name = "Chat Message"
         verbose_name_plural = "Chat Messages"
+        indexes = [
+            # keyset pages: newest N, id < cursor (older), id > cursor (new)
+            models.Index(fields=["chat_room", "id"], name="chatmessage_room_id"),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.message[:50]}"
     
     def mark_as_read(self, user):
-        """Mark this message as read by a specific user"""
-        MessageReadStatus.objects.update_or_create(
-            message=self,
-            user=user,
-            defaults={"is_read": True, "read_at": timezone.now()}
-        )
+        """Mark this message (and everything before it in the room) as read by a specific user"""
+        ChatReadCursor.advance(self.chat_room_id, user.pk, self.id)
 
 
-class MessageReadStatus(models.Model):
+class ChatReadCursor(models.Model):
     """
-    Track which users have read which messages.
+    How far a user has read in a chat room: every message with
+    id <= last_read_id counts as read, so unread is `id > last_read_id`.
     """
-    message = models.ForeignKey(
-        ChatMessage,
+    chat_room = models.ForeignKey(
+        ChatRoom,
         on_delete=models.CASCADE,
-        related_name="read_by"
+        related_name="read_cursors"
     )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name="message_read_statuses"
+        related_name="chat_read_cursors"
     )
-    is_read = models.BooleanField(default=False)
-    read_at = models.DateTimeField(null=True, blank=True)
-    
+    last_read_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
-        unique_together = ["message", "user"]
-        verbose_name = "Message Read Status"
-        verbose_name_plural = "Message Read Statuses"
-    
+        constraints = [
+            models.UniqueConstraint(fields=["chat_room", "user"], name="uniq_chat_read_cursor"),
+        ]
+        verbose_name = "Chat Read Cursor"
+        verbose_name_plural = "Chat Read Cursors"
+
     def __str__(self):
-        status = "Read" if self.is_read else "Unread"
-        return f"{self.user.username} - {status}"
+        return f"{self.user.username} read #{self.last_read_id} in {self.chat_room_id}"
+
+    @classmethod
+    def last_read(cls, room_id, user_id) -> int:
+        return (
+            cls.objects.filter(chat_room_id=room_id, user_id=user_id)
+            .values_list("last_read_id", flat=True).first() or 0
+        )
+
+    @classmethod
+    def advance(cls, room_id, user_id, message_id) -> bool:
+        """
+        Move the cursor forward to `message_id`; never moves it back.
+        Returns False, having written nothing, if the cursor was already
+        there (re-reading a page the user has seen, e.g. on every poll).
+        """
+        cursor = cls.objects.filter(chat_room_id=room_id, user_id=user_id)
+
+        def bump():
+            return cursor.filter(last_read_id__lt=message_id).update(
+                last_read_id=message_id, updated_at=timezone.now()
+            )
+
+        if bump():
+            return True
+        if cursor.exists():
+            return False
+        cls.objects.bulk_create(
+            [cls(chat_room_id=room_id, user_id=user_id, last_read_id=message_id)],
+            ignore_conflicts=True,
+        )
+        # the row may have appeared concurrently (insert ignored) behind us
+        bump()
+        return True
     
 
 # --- Sponsor applications / adoptions ---
@@ -783,6 +1126,10 @@ class SponsorshipRequest(models.Model):
             driver.driver_profile.sponsors.add(sponsor)
             driver.driver_profile.save()
 
+        # The sponsor's team chat exists from their first approved driver on
+        if sponsor is not None and sponsor.groups.filter(name="sponsor").exists():
+            ChatRoom.ensure_for(sponsor)
+
     def deny(self):
         self.status = "denied"
         self.reviewed_at = timezone.now()
@@ -844,9 +1191,11 @@ class SponsorPointsAccount(models.Model):
         self.is_primary = True
         self.save(update_fields=["is_primary", "updated_at"])
 
+    @audit_outside_savepoint
     @transaction.atomic
-    def apply_points(self, delta, *, reason="", created_by=None, order=None):
+    def apply_points(self, delta, *, reason="", created_by=None, order=None, consume_lots=True):
         # Negative deltas spend points; don’t allow negative balances.
+        # consume_lots=False is for the expiry sweep, which drains lots itself.
         if delta == 0:
             return
         
@@ -864,18 +1213,12 @@ class SponsorPointsAccount(models.Model):
         # update balance
         self.balance = new_bal
         self.save(update_fields=["balance", "updated_at"])
+        DriverPointsBalance.apply_delta(self.driver_id, delta)
 
         # log to the consolidated ledger for driver history displays
-        prior_total = (
-            PointsLedger.objects.filter(user=self.driver)
-            .aggregate(total=Sum("delta"))
-            .get("total") or 0
-        )
         ledger_reason = reason or (
             f"{'Awarded' if delta > 0 else 'Spent'} via {self.sponsor.get_full_name() or self.sponsor.username}"
         )
-        new_balance = prior_total + delta
-        
         # Calculate expiration date if points are being added (delta > 0)
         expires_at = None
         if delta > 0:
@@ -886,13 +1229,24 @@ class SponsorPointsAccount(models.Model):
             if config.points_expiry_days > 0:
                 expires_at = timezone.now() + timedelta(days=config.points_expiry_days)
         
-        PointsLedger.objects.create(
-            user=self.driver,
-            delta=delta,
+        entry = PointsLedger.append(
+            self.driver,
+            delta,
             reason=ledger_reason[:255],
-            balance_after=new_balance,
             expires_at=expires_at,
         )
+        new_balance = entry.balance_after
+
+        from .audit import record_point_change
+        record_point_change(self.driver_id, delta, entry.reason, ledger_id=entry.id)
+
+        # FIFO expiry lots: credits open a lot, debits drain the oldest first
+        if delta > 0:
+            PointsLot.objects.create(
+                user=self.driver, wallet=self, amount=delta, remaining=delta, expires_at=expires_at
+            )
+        elif consume_lots:
+            PointsLot.consume(self.driver, self, -delta)
         
         # Trigger notification for points update
         try:
@@ -920,6 +1274,203 @@ class SponsorPointsTransaction(models.Model):
         return f"{self.tx_type} {self.amount} to {self.wallet}"
 
 
+class PointsLot(models.Model):
+    """
+    One credit of points that may expire. Debits drain the oldest open lots
+    first (FIFO) and the `expire_points` sweep zeroes due lots, recording
+    how much was lost in `expired`. `wallet` is null for ledger-only
+    adjustments made through accounts.services.adjust_points.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="points_lots")
+    wallet = models.ForeignKey(SponsorPointsAccount, null=True, blank=True, on_delete=models.CASCADE, related_name="lots")
+    amount = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField()
+    expired = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} lot {self.remaining}/{self.amount} pts (expires {self.expires_at or 'never'})"
+
+    @classmethod
+    def consume(cls, user, wallet, amount):
+        """Drain `amount` points from the oldest open lots; returns what was taken."""
+        left = amount
+        touched = []
+        lots = (
+            cls.objects.select_for_update()
+            .filter(user=user, wallet=wallet, remaining__gt=0)
+            .order_by("created_at", "id")
+        )
+        for lot in lots.iterator(chunk_size=100):
+            take = min(left, lot.remaining)
+            lot.remaining -= take
+            left -= take
+            touched.append(lot)
+            if left == 0:
+                break
+        cls.objects.bulk_update(touched, ["remaining"])
+        return amount - left
+
+
+class DriverPointsBalance(models.Model):
+    """
+    Materialized total of a driver's sponsor wallet balances.
+    Kept in step by SponsorPointsAccount.apply_points so reads don't need
+    a SUM over every wallet; `verify_balances` recomputes it on demand.
+    """
+    driver = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="points_balance")
+    total = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Driver points balance"
+        verbose_name_plural = "Driver points balances"
+
+    def __str__(self):
+        return f"{self.driver} → {self.total} pts"
+
+    @staticmethod
+    def invalidate(*driver_ids):
+        keys = [POINTS_BALANCE_CACHE_KEY.format(driver_id=d) for d in driver_ids]
+        cache.delete_many(keys)
+        # readers inside this transaction may have seen the old value
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @classmethod
+    def recompute(cls, driver_id):
+        """Rebuild the summary for one driver from the wallet rows."""
+        total = (
+            SponsorPointsAccount.objects.filter(driver_id=driver_id)
+            .aggregate(total=Sum("balance"))
+            .get("total") or 0
+        )
+        obj, _ = cls.objects.update_or_create(driver_id=driver_id, defaults={"total": total})
+        cls.invalidate(driver_id)
+        return obj
+
+    @classmethod
+    def apply_delta(cls, driver_id, delta):
+        """Shift the summary by `delta`; call inside the wallet's transaction."""
+        def shift():
+            return cls.objects.filter(driver_id=driver_id).update(
+                total=F("total") + delta, updated_at=timezone.now()
+            )
+
+        updated = shift()
+        if not updated:
+            # no summary row yet: serialize with other first writers, then
+            # re-check before seeding from wallets (which already include delta)
+            lock_drivers([driver_id])
+            updated = shift()
+        if not updated:
+            cls.recompute(driver_id)
+        else:
+            cls.invalidate(driver_id)
+
+
+class UnreadCounter(models.Model):
+    """
+    Per-user unread Notification / MessageRecipient counts for the navbar
+    badges. Call `adjust` after any write that changes what's unread (single
+    creates are covered by signals); `reconcile_unread_counts` recomputes.
+    Unopened broadcasts have no rows; `for_user` adds them on a cache miss.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="unread_counter")
+    notifications = models.IntegerField(default=0)
+    messages = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} → {self.notifications} notifications, {self.messages} messages"
+
+    @staticmethod
+    def _cache_key(user_id):
+        generation = cache.get(BROADCAST_GENERATION_CACHE_KEY, 0)
+        return UNREAD_COUNTS_CACHE_KEY.format(generation=generation, user_id=user_id)
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        keys = [cls._cache_key(u) for u in user_ids]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @classmethod
+    def recompute(cls, user_id):
+        """Rebuild one user's counters with two COUNT queries."""
+        obj, _ = cls.objects.update_or_create(user_id=user_id, defaults={
+            "notifications": Notification.objects.filter(user_id=user_id, read=False).count(),
+            "messages": MessageRecipient.objects.filter(user_id=user_id, is_read=False, is_deleted=False).count(),
+        })
+        cls.invalidate(user_id)
+        return obj
+
+    @classmethod
+    def adjust(cls, user_id, notifications=0, messages=0):
+        """Shift one user's counters; call after the rows themselves were written."""
+        if not notifications and not messages:
+            return
+        shift = {
+            "notifications": F("notifications") + notifications,
+            "messages": F("messages") + messages,
+            "updated_at": timezone.now(),
+        }
+        with transaction.atomic():
+            if not cls.objects.filter(user_id=user_id).update(**shift):
+                # first change for this user: seed from the tables (already
+                # includes this one). If a concurrent first writer wins the
+                # insert, its row didn't count ours, so shift it instead.
+                _, created = cls.objects.get_or_create(user_id=user_id, defaults={
+                    "notifications": lambda: Notification.objects.filter(user_id=user_id, read=False).count(),
+                    "messages": lambda: MessageRecipient.objects.filter(
+                        user_id=user_id, is_read=False, is_deleted=False
+                    ).count(),
+                })
+                if not created:
+                    cls.objects.filter(user_id=user_id).update(**shift)
+        cls.invalidate(user_id)
+
+    @classmethod
+    def adjust_many(cls, notifications=None, messages=None):
+        """
+        Apply {user_id: delta} maps from a bulk write with one UPDATE per
+        distinct delta instead of one per user.
+        """
+        for field, deltas in (("notifications", notifications or {}), ("messages", messages or {})):
+            by_delta = {}
+            for user_id, delta in deltas.items():
+                if delta:
+                    by_delta.setdefault(delta, []).append(user_id)
+            for delta, user_ids in by_delta.items():
+                # users without a counter row get one seeded from the tables
+                # the first time for_user sees them, so they're skipped here
+                cls.objects.filter(user_id__in=user_ids).update(
+                    **{field: F(field) + delta}, updated_at=timezone.now()
+                )
+                cls.invalidate(*user_ids)
+
+    @classmethod
+    def for_user(cls, user):
+        """(notifications, messages) unread counts, from the cache when possible."""
+        key = cls._cache_key(user.pk)
+        counts = cache.get(key)
+        if counts is None:
+            row = cls.objects.filter(user_id=user.pk).values_list("notifications", "messages").first()
+            if row is None:
+                obj = cls.recompute(user.pk)
+                row = (obj.notifications, obj.messages)
+            counts = (row[0], row[1] + Message.unopened_broadcasts_for(user).count())
+            if not transaction.get_connection().in_atomic_block:
+                cache.set(key, counts, getattr(settings, "UNREAD_COUNTS_CACHE_SECONDS", 300))
+        return counts
+
+
 class BulkUploadLog(models.Model):
     """Track bulk user uploads for audit and history purposes."""
     uploaded_by = models.ForeignKey(
@@ -1,7 +1,11 @@
+import datetime
+from collections import Counter
+
 from django.urls import reverse
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import DriverNotificationPreference, Notification, PointsLedger
+from .events import hub, user_topic
+from .models import AlertState, DriverNotificationPreference, Notification, NotificationOutbox, PointsLedger, UnreadCounter
+from .models import NotificationDigest
 from django.db.models import Sum, Max
 
 
@@ -48,34 +52,144 @@ def _send_sms_safe(user, title: str, body: str, url: str = "") -> bool:
 
 def _notify_channels(user, kind: str, title: str, body: str, url: str = ""):
     """
-    Channel fan-out with duplicate protection:
-      - Always create in-app Notification if kind allowed.
-      - If SMS enabled -> try SMS (and SKIP email to avoid duplicates).
-      - Else if Email enabled -> send email (if user.email).
+    Queue a notification for the dispatch_notifications worker. The outbox
+    row commits (or rolls back) with the caller's transaction; channel
+    fan-out and SMTP happen later, off the request.
     """
-    if _kind_allowed(user, kind):
-        Notification.objects.create(user=user, kind=kind, title=title, body=body, url=url)
-
-    # Channel prefs
-    prefs = DriverNotificationPreference.for_user(user)
+    NotificationOutbox.objects.create(user=user, kind=kind, title=title, body=body, url=url)
 
-    if prefs.sms_enabled:
-        sent_sms = _send_sms_safe(user, title, body, url)
-        if sent_sms:
-            return  # do not double-send email
 
+def send_emails(messages) -> dict:
+    """
+    Send [(key, EmailMessage)] over a single SMTP connection.
+    Returns {key: error} for the messages that didn't go out.
+    """
+    from django.core.mail import get_connection
 
-    if prefs.email_enabled and getattr(user, "email", ""):
+    failed = {}
+    if not messages:
+        return failed
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for key, message in messages:
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                failed[key] = str(e)
+    except Exception as e:
+        # couldn't reach the server at all: every message failed
+        failed.update((key, str(e)) for key, _ in messages if key not in failed)
+    finally:
         try:
-            send_mail(
-                subject=title,
-                message=f"{body}\n\n{('View: ' + url) if url else ''}".strip(),
-                from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
+            connection.close()
         except Exception:
             pass
+    return failed
+
+
+def _outbox_backoff(attempts: int) -> datetime.timedelta:
+    base = getattr(settings, "NOTIFICATION_OUTBOX_BACKOFF_SECONDS", 60)
+    return datetime.timedelta(seconds=base * 2 ** max(0, attempts - 1))
+
+
+def dispatch_outbox(batch_size: int = 200, now=None) -> dict:
+    """
+    Deliver one batch of due outbox rows.
+
+    Channel fan-out matches the old synchronous path:
+      - in-app Notification if the kind is allowed ('dropped' bypasses mutes),
+        bulk-created once per row even across retries;
+      - SMS if enabled and it went out, otherwise email if enabled.
+    Emails share one SMTP connection; a failed send is retried with
+    exponential backoff until NOTIFICATION_OUTBOX_MAX_ATTEMPTS. Points and
+    order emails for users on an hourly/daily digest are held instead
+    (see flush_digests).
+
+    Returns {"claimed", "in_app", "sent", "held", "retry", "failed"} counts.
+    """
+    from django.contrib.auth import get_user_model
+    from django.core.mail import EmailMessage
+    from django.db import transaction
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    max_attempts = getattr(settings, "NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5)
+    counts = {"claimed": 0, "in_app": 0, "sent": 0, "held": 0, "retry": 0, "failed": 0}
+
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not rows:
+            return counts
+        counts["claimed"] = len(rows)
+
+        user_ids = {r.user_id for r in rows}
+        prefs = {p.user_id: p for p in DriverNotificationPreference.objects.filter(user_id__in=user_ids)}
+        users = {u.id: u for u in get_user_model().objects.filter(id__in=user_ids).select_related("driver_profile")}
+
+        def allowed(row):
+            p = prefs.get(row.user_id)
+            if row.kind == "dropped" or p is None:
+                return True
+            return {"orders": p.orders, "points": p.points, "promotions": p.promotions}.get(row.kind, True)
+
+        in_app = [
+            Notification(user_id=r.user_id, kind=r.kind, title=r.title, body=r.body, url=r.url, created_at=r.created_at)
+            for r in rows if not r.in_app_done and allowed(r)
+        ]
+        Notification.objects.bulk_create(in_app, batch_size=1000)
+        UnreadCounter.adjust_many(notifications=Counter(n.user_id for n in in_app))
+        hub.publish_on_commit(*{user_topic(n.user_id) for n in in_app})
+        counts["in_app"] = len(in_app)
+        for r in rows:
+            r.in_app_done = True
+
+        outgoing = []
+        held = set()
+        for r in rows:
+            p = prefs.get(r.user_id)
+            user = users.get(r.user_id)
+            if p is not None and p.sms_enabled and user and _send_sms_safe(user, r.title, r.body, r.url):
+                continue
+            email = getattr(user, "email", "")
+            if (p is None or p.email_enabled) and email:
+                if p is not None and p.email_digest != p.DIGEST_IMMEDIATE and r.kind in p.DIGEST_KINDS:
+                    held.add(r.id)
+                    continue
+                outgoing.append((r.id, EmailMessage(
+                    subject=r.title,
+                    body=f"{r.body}\n\n{('View: ' + r.url) if r.url else ''}".strip(),
+                    from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+                    to=[email],
+                )))
+
+        failed = send_emails(outgoing)
+
+        for r in rows:
+            if r.id in held:
+                r.status = NotificationOutbox.STATUS_DIGEST
+                counts["held"] += 1
+            elif r.id in failed:
+                r.attempts += 1
+                r.last_error = failed[r.id][:1000]
+                if r.attempts >= max_attempts:
+                    r.status = NotificationOutbox.STATUS_FAILED
+                    counts["failed"] += 1
+                else:
+                    r.next_attempt_at = now + _outbox_backoff(r.attempts)
+                    counts["retry"] += 1
+            else:
+                r.status = NotificationOutbox.STATUS_SENT
+                r.sent_at = now
+                counts["sent"] += 1
+        NotificationOutbox.objects.bulk_update(
+            rows, ["status", "in_app_done", "attempts", "next_attempt_at", "last_error", "sent_at"]
+        )
+    return counts
 
 def send_in_app_notification(user, kind: str, title: str, body: str, url: str = ""):
     """
@@ -102,6 +216,88 @@ def send_in_app_notification(user, kind: str, title: str, body: str, url: str =
     )
 
 
+DIGEST_PERIODS = {
+    DriverNotificationPreference.DIGEST_HOURLY: datetime.timedelta(hours=1),
+    DriverNotificationPreference.DIGEST_DAILY: datetime.timedelta(days=1),
+}
+
+
+def flush_digests(now=None, force=False, batch_size=200) -> dict:
+    """
+    Email each user whose digest is due one summary of their held outbox
+    rows. A digest is due once its oldest row has waited the user's period
+    (immediately if they've since switched back to per-event emails);
+    `force` flushes everything. All emails in a batch of users share one
+    SMTP connection. Returns {"users", "rows", "sent", "failed"} counts.
+    """
+    from django.contrib.auth import get_user_model
+    from django.core.mail import EmailMessage
+    from django.db import transaction
+    from django.db.models import Min
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    max_attempts = getattr(settings, "NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5)
+    counts = {"users": 0, "rows": 0, "sent": 0, "failed": 0}
+
+    held = NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_DIGEST)
+    oldest = dict(held.order_by().values("user_id").annotate(oldest=Min("created_at")).values_list("user_id", "oldest"))
+    periods = dict(
+        DriverNotificationPreference.objects.filter(user_id__in=oldest).values_list("user_id", "email_digest")
+    )
+    due = sorted(
+        user_id for user_id, first in oldest.items()
+        if force or first <= now - DIGEST_PERIODS.get(periods.get(user_id), datetime.timedelta(0))
+    )
+
+    for start in range(0, len(due), batch_size):
+        user_ids = due[start:start + batch_size]
+        with transaction.atomic():
+            rows = list(held.select_for_update(skip_locked=True).filter(user_id__in=user_ids).order_by("user_id", "id"))
+            by_user = {}
+            for r in rows:
+                by_user.setdefault(r.user_id, []).append(r)
+            emails = dict(get_user_model().objects.filter(id__in=by_user).values_list("id", "email"))
+            enabled = set(
+                DriverNotificationPreference.objects.filter(user_id__in=by_user, email_enabled=True)
+                .values_list("user_id", flat=True)
+            )
+
+            outgoing = []
+            for user_id, items in by_user.items():
+                if user_id not in enabled or not emails.get(user_id):
+                    continue
+                lines = [
+                    f"- {r.title}: {r.body}" + (f" ({r.url})" if r.url else "")
+                    for r in items
+                ]
+                outgoing.append((user_id, EmailMessage(
+                    subject=f"Your notification summary ({len(items)} update{'s' if len(items) != 1 else ''})",
+                    body="\n".join(lines),
+                    from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+                    to=[emails[user_id]],
+                )))
+            failed = send_emails(outgoing)
+
+            for r in rows:
+                if r.user_id in failed:
+                    # stays held (and due) for the next flush
+                    r.attempts += 1
+                    r.last_error = failed[r.user_id][:1000]
+                    if r.attempts >= max_attempts:
+                        r.status = NotificationOutbox.STATUS_FAILED
+                else:
+                    r.status = NotificationOutbox.STATUS_SENT
+                    r.sent_at = now
+            NotificationOutbox.objects.bulk_update(rows, ["status", "attempts", "last_error", "sent_at"])
+
+        counts["users"] += len(by_user)
+        counts["rows"] += len(rows)
+        counts["sent"] += len(outgoing) - len(failed)
+        counts["failed"] += len(failed)
+    return counts
+
+
 def get_current_balance(user):
     """
     Return the user's latest known balance using PointsLedger.balance_after.
@@ -120,6 +316,7 @@ def check_low_balance(user):
     """
     If low-balance alerts are enabled and the driver's balance_after
     is below their threshold, send exactly one 'Low Points' alert.
+    The alert re-arms once the balance is back at or above the threshold.
     """
     prefs = DriverNotificationPreference.for_user(user)
 
@@ -131,6 +328,10 @@ def check_low_balance(user):
     balance = get_current_balance(user)
 
     if balance >= threshold:
+        AlertState.rearm(user.pk, AlertState.LOW_BALANCE)
+        return
+
+    if not AlertState.claim(user.pk, AlertState.LOW_BALANCE):
         return
 
     title = "Low Points Alert"
@@ -143,14 +344,6 @@ def check_low_balance(user):
     except Exception:
         url = ""
 
-    already_sent = Notification.objects.filter(
-        user=user,
-        kind="points",
-        title=title,
-    ).exists()
-    if already_sent:
-        return
-
     _notify_channels(
         user=user,
         kind="points",
@@ -186,26 +379,192 @@ def on_points_updated(user, delta: int, reason: str, new_balance: int):
     check_low_balance(user)
 
 
+def notify_points_bulk(entries):
+    """
+    Queue 'Points updated' for a bulk award with one outbox bulk_create.
+    `entries` is a list of (user_id, delta, reason, new_balance) tuples.
+    Credits can't newly drop anyone below their low-balance threshold, but
+    they can lift drivers back over it, so those drivers' low-balance alerts
+    are re-armed with one delete (as check_low_balance does one at a time).
+    """
+    if not entries:
+        return
+    try:
+        url = reverse("accounts:points_history")
+    except Exception:
+        url = ""
+
+    title = "Points updated"
+    rows = []
+    for user_id, delta, reason, new_balance in entries:
+        sign = "+" if delta >= 0 else ""
+        body = f"{sign}{delta} — {reason}. New balance: {new_balance}"
+        rows.append(NotificationOutbox(user_id=user_id, kind="points", title=title, body=body, url=url))
+    NotificationOutbox.objects.bulk_create(rows, batch_size=1000)
+
+    balances = {user_id: new_balance for user_id, _, _, new_balance in entries}
+    default = DriverNotificationPreference._meta.get_field("low_balance_threshold").get_default()
+    thresholds = dict(
+        DriverNotificationPreference.objects.filter(user_id__in=balances)
+        .values_list("user_id", "low_balance_threshold")
+    )
+    recovered = [u for u, balance in balances.items() if balance >= thresholds.get(u, default)]
+    if recovered:
+        AlertState.objects.filter(alert_type=AlertState.LOW_BALANCE, user_id__in=recovered).delete()
+
+
+def notify_orders_delayed_bulk(orders, now=None):
+    """
+    Bulk form of on_order_delayed for the check_delayed_orders scan.
+    `orders` is a list of (order_id, driver_id) pairs. Claims every alert
+    with one AlertState bulk insert, then writes 'Order Delayed' for the
+    claims this call won, skipping drivers who muted 'orders'.
+    Returns the number of notifications created.
+    """
+    from django.utils import timezone
+
+    if not orders:
+        return 0
+    now = now or timezone.now()
+
+    # stamping our own created_at lets us read back which claims were ours;
+    # a concurrent scan's rows carry a different timestamp
+    AlertState.objects.bulk_create(
+        [AlertState(user_id=driver_id, alert_type=AlertState.ORDER_DELAYED, subject_id=order_id, created_at=now)
+         for order_id, driver_id in orders],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+    claimed = set(
+        AlertState.objects.filter(
+            alert_type=AlertState.ORDER_DELAYED,
+            subject_id__in=[order_id for order_id, _ in orders],
+            created_at=now,
+        ).values_list("subject_id", flat=True)
+    )
+    muted = set(
+        DriverNotificationPreference.objects
+        .filter(user_id__in={driver_id for _, driver_id in orders}, orders=False)
+        .values_list("user_id", flat=True)
+    )
+
+    title = "Order Delayed"
+    rows = []
+    for order_id, driver_id in orders:
+        if order_id not in claimed or driver_id in muted:
+            continue
+        try:
+            url = reverse("shop:order_detail", args=[order_id])
+        except Exception:
+            url = ""
+        body = f"Order #{order_id} is delayed. We’ll notify you when it ships."
+        rows.append(Notification(user_id=driver_id, kind="orders", title=title, body=body, url=url))
+    Notification.objects.bulk_create(rows, batch_size=1000)
+    UnreadCounter.adjust_many(notifications=Counter(n.user_id for n in rows))
+    hub.publish_on_commit(*{user_topic(n.user_id) for n in rows})
+    return len(rows)
+
+
 def on_order_delayed(order):
     """
     Send an 'Order Delayed' in-app notification to the driver.
     Respects the 'orders' preference.
-    De-duplicates by URL+title so we don't spam.
+    De-duplicates per order via AlertState so we don't spam.
     """
     user = order.driver
     try:
-        url = reverse("order_detail", args=[order.id])
+        url = reverse("shop:order_detail", args=[order.id])
     except Exception:
         url = ""
 
     title = "Order Delayed"
     body = f"Order #{order.id} is delayed. We’ll notify you when it ships."
 
-    #  if we've already sent one for this order+url, skip
-    if Notification.objects.filter(
-        user=user, kind="orders", url=url, title=title
-    ).exists():
+    #  if we've already sent one for this order, skip
+    if not AlertState.claim(user.pk, AlertState.ORDER_DELAYED, order.id):
         return
 
     # respect prefs via your existing helper
-    send_in_app_notification(user, "orders", title, body, url=url)
\ No newline at end of file
+    send_in_app_notification(user, "orders", title, body, url=url)
+
+
+def notification_prune_q(now=None):
+    """
+    Q matching notifications past retention: read ones older than their
+    kind's NOTIFICATION_RETENTION_DAYS, unread ones older than
+    NOTIFICATION_UNREAD_RETENTION_DAYS (never, if that is None).
+    """
+    from django.db.models import Q
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    per_kind = getattr(settings, "NOTIFICATION_RETENTION_DAYS", {})
+    default = getattr(settings, "NOTIFICATION_RETENTION_DEFAULT_DAYS", 180)
+    kinds = [k for k, _ in Notification.KIND_CHOICES]
+
+    q = Q()
+    for kind in kinds:
+        days = per_kind.get(kind, default)
+        q |= Q(read=True, kind=kind, created_at__lt=now - datetime.timedelta(days=days))
+    q |= Q(read=True, created_at__lt=now - datetime.timedelta(days=default)) & ~Q(kind__in=kinds)
+
+    unread_days = getattr(settings, "NOTIFICATION_UNREAD_RETENTION_DAYS", None)
+    if unread_days is not None:
+        q |= Q(read=False, created_at__lt=now - datetime.timedelta(days=unread_days))
+    return q
+
+
+def prune_notification_range(lo, hi, now=None, digest=False, dry_run=False):
+    """
+    Delete notifications with lo <= id < hi that are past retention, in one
+    short transaction. With `digest`, read ones are first folded into the
+    user's NotificationDigest row for that day. Unread counters are
+    adjusted for unread rows removed. Returns {kind: rows pruned}.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.filter(id__gte=lo, id__lt=hi).filter(notification_prune_q(now))
+            .order_by().values_list("id", "user_id", "kind", "read", "created_at")
+        )
+        if not rows or dry_run:
+            return Counter(kind for _, _, kind, _, _ in rows)
+
+        if digest:
+            rollup = {}
+            for _, user_id, kind, read, created_at in rows:
+                if read:
+                    day = timezone.localdate(created_at)
+                    rollup.setdefault((user_id, day), Counter())[kind] += 1
+            if rollup:
+                _merge_digests(rollup)
+
+        unread = Counter(user_id for _, user_id, _, read, _ in rows if not read)
+        Notification.objects.filter(id__in=[row[0] for row in rows]).delete()
+        UnreadCounter.adjust_many(notifications={user_id: -n for user_id, n in unread.items()})
+    return Counter(kind for _, _, kind, _, _ in rows)
+
+
+def _merge_digests(rollup):
+    """Add {(user_id, day): Counter(kind)} into NotificationDigest rows."""
+    existing = {
+        (d.user_id, d.day): d
+        for d in NotificationDigest.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in rollup},
+            day__in={day for _, day in rollup},
+        )
+    }
+    to_create, to_update = [], []
+    for (user_id, day), kinds in rollup.items():
+        d = existing.get((user_id, day))
+        if d is None:
+            to_create.append(NotificationDigest(user_id=user_id, day=day, total=sum(kinds.values()), by_kind=dict(kinds)))
+        else:
+            merged = Counter(d.by_kind) + kinds
+            d.by_kind, d.total = dict(merged), sum(merged.values())
+            to_update.append(d)
+    NotificationDigest.objects.bulk_create(to_create, batch_size=1000)
+    NotificationDigest.objects.bulk_update(to_update, ["total", "by_kind"], batch_size=1000)
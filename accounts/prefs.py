@@ -0,0 +1,92 @@
+"""
+Read-side resolver for DriverNotificationPreference.
+
+Lookups go request memo -> process LRU -> DB. LRU entries carry a per-user
+version token kept in the default cache; saving or deleting a preference row
+bumps the token, so every process sharing that cache (see CACHES) reloads on
+its next lookup. Entries also expire after NOTIF_PREFS_LRU_SECONDS, which
+bounds staleness if the token is lost or the cache isn't shared. Users without
+a row get an unsaved instance with the model defaults: reading preferences
+never writes.
+
+Instances handed out here are shared; don't modify or save them. Views that
+edit preferences load their own copy.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import DriverNotificationPreference
+
+PREFS_VERSION_CACHE_KEY = "accounts.notif_prefs.version:v1:{user_id}"
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _lru_size():
+    return getattr(settings, "NOTIF_PREFS_LRU_SIZE", 1024)
+
+
+def _lru_seconds():
+    return getattr(settings, "NOTIF_PREFS_LRU_SECONDS", 60)
+
+
+def _current_version(user_id):
+    key = PREFS_VERSION_CACHE_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # unknown (never bumped, or evicted): mint a token so any older LRU
+        # entry for this user is treated as stale
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_prefs(user_id):
+    """Bump the user's version token now and again once the write commits."""
+    def bump():
+        cache.set(PREFS_VERSION_CACHE_KEY.format(user_id=user_id), time.time_ns(), None)
+        with _lru_lock:
+            _lru.pop(user_id, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_prefs(user, request=None):
+    """The user's notification preferences (read-only; defaults if no row)."""
+    if request is not None:
+        memo = getattr(request, "_notif_prefs", None)
+        if memo is not None and memo.user_id == user.pk:
+            return memo
+
+    version = _current_version(user.pk)
+    with _lru_lock:
+        entry = _lru.get(user.pk)
+        if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+            _lru.move_to_end(user.pk)
+            prefs = entry[2]
+        else:
+            prefs = None
+
+    if prefs is None:
+        prefs = (
+            DriverNotificationPreference.objects.filter(user_id=user.pk).first()
+            or DriverNotificationPreference(user_id=user.pk)
+        )
+        # don't publish a row read inside a transaction that may roll back
+        if not transaction.get_connection().in_atomic_block:
+            with _lru_lock:
+                _lru[user.pk] = (version, time.monotonic() + _lru_seconds(), prefs)
+                _lru.move_to_end(user.pk)
+                while len(_lru) > _lru_size():
+                    _lru.popitem(last=False)
+
+    if request is not None:
+        request._notif_prefs = prefs
+    return prefs
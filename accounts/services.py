@@ -1,19 +1,19 @@
 from django.db import transaction
 from django.db.models import Sum
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.utils import timezone
-from .models import PointsLedger, SponsorPointsAccount
+from .models import PointsLedger, PointsLot, SponsorPointsAccount, DriverPointsBalance, POINTS_BALANCE_CACHE_KEY
+from .models import audit_outside_savepoint, lock_drivers
 from .notifications import on_points_updated
+from .audit import block_audit_writer, record_point_change
 import logging
 log = logging.getLogger(__name__)
 
+@audit_outside_savepoint
 @transaction.atomic
-def adjust_points(user, delta: int, reason: str = "") -> PointsLedger:
-    # current balance before adjustment
-    total = PointsLedger.objects.filter(user=user).aggregate(s=Sum("delta"))["s"] or 0
-    new_balance = total + delta
-
+def adjust_points(user, delta: int, reason: str = "", *, consume_lots: bool = True) -> PointsLedger:
     # Calculate expiration date if points are being added (delta > 0)
     expires_at = None
     if delta > 0:
@@ -23,17 +23,18 @@ def adjust_points(user, delta: int, reason: str = "") -> PointsLedger:
             from datetime import timedelta
             expires_at = timezone.now() + timedelta(days=config.points_expiry_days)
 
-    # create ledger entry
-    entry = PointsLedger.objects.create(
-        user=user,
-        delta=delta,
-        reason=reason,
-        balance_after=new_balance,
-        expires_at=expires_at,
-    )
+    # create ledger entry, chained off the previous row's balance_after
+    entry = PointsLedger.append(user, delta, reason=reason, expires_at=expires_at)
+    record_point_change(user.pk, delta, reason, ledger_id=entry.id)
+
+    # ledger-only adjustments keep their own (wallet-less) expiry lots
+    if delta > 0:
+        PointsLot.objects.create(user=user, wallet=None, amount=delta, remaining=delta, expires_at=expires_at)
+    elif delta < 0 and consume_lots:
+        PointsLot.consume(user, None, -delta)
 
     # triggers the notification 
-    on_points_updated(user, delta, reason or "Adjustment", new_balance)
+    on_points_updated(user, delta, reason or "Adjustment", entry.balance_after)
 
     return entry
 
@@ -41,16 +42,218 @@ def adjust_points(user, delta: int, reason: str = "") -> PointsLedger:
 def get_driver_points_balance(user):
     """
     Return the driver's aggregated balance across all sponsor wallets.
+    Served from the cache / DriverPointsBalance summary; the wallet SUM only
+    runs the first time a driver is seen.
     """
     if not user:
         return 0
 
-    return (
-        SponsorPointsAccount.objects
-        .filter(driver=user)
-        .aggregate(total=Sum("balance"))
-        .get("total") or 0
+    key = POINTS_BALANCE_CACHE_KEY.format(driver_id=user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    total = (
+        DriverPointsBalance.objects
+        .filter(driver_id=user.pk)
+        .values_list("total", flat=True)
+        .first()
+    )
+    if total is None:
+        total = DriverPointsBalance.recompute(user.pk).total
+
+    # don't cache values a still-open transaction might roll back
+    if not transaction.get_connection().in_atomic_block:
+        cache.set(key, total, getattr(settings, "POINTS_BALANCE_CACHE_SECONDS", 300))
+    return total
+
+BULK_AWARD_CHUNK_SIZE = 1000
+
+
+def sponsored_driver_ids(sponsor, driver_ids):
+    """
+    Return the subset of `driver_ids` sponsored by `sponsor`, using the same
+    rules as the single-driver award (M2M, legacy sponsor_name, or an
+    approved SponsorshipRequest in either direction) in three queries.
+    """
+    from django.db.models import Q
+    from .models import DriverProfile, SponsorshipRequest
+
+    driver_ids = set(driver_ids)
+    allowed = set(
+        DriverProfile.objects.filter(user_id__in=driver_ids)
+        .filter(Q(sponsors=sponsor) | Q(sponsor_name=sponsor.username))
+        .values_list("user_id", flat=True)
+    )
+    for from_id, to_id in SponsorshipRequest.objects.filter(status="approved").filter(
+        Q(from_user=sponsor, to_user_id__in=driver_ids) | Q(to_user=sponsor, from_user_id__in=driver_ids)
+    ).values_list("from_user_id", "to_user_id"):
+        allowed.add(to_id if from_id == sponsor.pk else from_id)
+    # only real drivers
+    return set(
+        DriverProfile.objects.filter(user_id__in=allowed).values_list("user_id", flat=True)
+    )
+
+
+@transaction.atomic
+def bulk_award_points(sponsor, awards, *, reason="", created_by=None):
+    """
+    Credit many drivers from `sponsor` in one transaction.
+
+    `awards` is an iterable of (driver_id, amount) with positive amounts;
+    repeated drivers are summed. Wallets and summaries are updated with one
+    UPDATE per distinct amount, transactions/ledger/audit rows are written
+    with bulk_create (audit rows on commit), and notifications are queued
+    in the outbox.
+
+    Returns {"awarded": [driver ids], "skipped": [driver ids], "points": total}.
+    """
+    from django.core.exceptions import ValidationError
+    from django.db.models import F, Max
+    from .models import SponsorPointsTransaction
+    from .notifications import notify_points_bulk
+
+    amounts = {}
+    for driver_id, amount in awards:
+        amount = int(amount)
+        if amount <= 0:
+            raise ValidationError("Bulk awards must be positive amounts.")
+        amounts[int(driver_id)] = amounts.get(int(driver_id), 0) + amount
+
+    allowed = sponsored_driver_ids(sponsor, amounts)
+    skipped = sorted(set(amounts) - allowed)
+    amounts = {d: a for d, a in amounts.items() if d in allowed}
+    if not amounts:
+        return {"awarded": [], "skipped": skipped, "points": 0}
+
+    reason = (reason or f"Awarded via {sponsor.get_full_name() or sponsor.username}")[:255]
+    expires_at = None
+    from shop.models import PointsConfig
+    config = PointsConfig.get_solo()
+    if config.points_expiry_days > 0:
+        from datetime import timedelta
+        expires_at = timezone.now() + timedelta(days=config.points_expiry_days)
+
+    driver_ids = sorted(amounts)
+    audit = block_audit_writer()
+    for start in range(0, len(driver_ids), BULK_AWARD_CHUNK_SIZE):
+        chunk = driver_ids[start:start + BULK_AWARD_CHUNK_SIZE]
+
+        # wallets: create missing ones, then lock the whole chunk
+        existing = set(
+            SponsorPointsAccount.objects.filter(sponsor=sponsor, driver_id__in=chunk)
+            .values_list("driver_id", flat=True)
+        )
+        SponsorPointsAccount.objects.bulk_create(
+            [SponsorPointsAccount(sponsor=sponsor, driver_id=d, balance=0) for d in chunk if d not in existing],
+            ignore_conflicts=True,
+        )
+        wallet_ids = dict(
+            SponsorPointsAccount.objects.select_for_update()
+            .filter(sponsor=sponsor, driver_id__in=chunk)
+            .values_list("driver_id", "id")
+        )
+        # then the drivers (same wallet -> driver order as apply_points), so
+        # summary seeding and the ledger tail reads below can't race other writers
+        lock_drivers(chunk)
+
+        by_amount = {}
+        for d in chunk:
+            by_amount.setdefault(amounts[d], []).append(d)
+        now = timezone.now()
+        for amount, ids in by_amount.items():
+            SponsorPointsAccount.objects.filter(id__in=[wallet_ids[d] for d in ids]).update(
+                balance=F("balance") + amount, updated_at=now
+            )
+            updated = set(
+                DriverPointsBalance.objects.filter(driver_id__in=ids).values_list("driver_id", flat=True)
+            )
+            DriverPointsBalance.objects.filter(driver_id__in=updated).update(
+                total=F("total") + amount, updated_at=now
+            )
+            for d in set(ids) - updated:
+                DriverPointsBalance.recompute(d)
+            DriverPointsBalance.invalidate(*updated)
+
+        SponsorPointsTransaction.objects.bulk_create([
+            SponsorPointsTransaction(
+                wallet_id=wallet_ids[d], tx_type="credit", amount=amounts[d],
+                created_by=created_by, reason=reason,
+            )
+            for d in chunk
+        ])
+
+        # chain ledger rows off each driver's latest balance_after; the
+        # driver locks above keep these tails current until we commit
+        last_ids = (
+            PointsLedger.objects.filter(user_id__in=chunk)
+            .values("user_id").annotate(last_id=Max("id"))
+            .values_list("last_id", flat=True)
+        )
+        prior = dict(
+            PointsLedger.objects.filter(id__in=list(last_ids))
+            .values_list("user_id", "balance_after")
+        )
+        ledger_rows = [
+            PointsLedger(
+                user_id=d, delta=amounts[d], reason=reason,
+                balance_after=prior.get(d, 0) + amounts[d], expires_at=expires_at,
+            )
+            for d in chunk
+        ]
+        PointsLedger.objects.bulk_create(ledger_rows)
+        PointsLot.objects.bulk_create([
+            PointsLot(
+                user_id=d, wallet_id=wallet_ids[d], amount=amounts[d],
+                remaining=amounts[d], expires_at=expires_at, created_at=now,
+            )
+            for d in chunk
+        ])
+
+        for row in ledger_rows:
+            # row.id is None where bulk_create can't return ids; the block
+            # writer drops these rows with a rolled-back savepoint either way
+            audit.add(row.user_id, row.delta, row.reason, row.id)
+        notify_points_bulk([(row.user_id, row.delta, row.reason, row.balance_after) for row in ledger_rows])
+
+    return {"awarded": driver_ids, "skipped": skipped, "points": sum(amounts.values())}
+
+
+EXPIRED_REASON = "Points expired"
+
+
+@transaction.atomic
+def expire_points_for(user_id, wallet_id, now=None):
+    """
+    Expire every due lot for one driver/wallet pair and post a single debit
+    for the total. Returns the number of points removed.
+    """
+    from django.db.models import F
+
+    now = now or timezone.now()
+    wallet = None
+    if wallet_id is not None:
+        wallet = SponsorPointsAccount.objects.select_for_update().get(pk=wallet_id)
+
+    due = PointsLot.objects.select_for_update().filter(
+        user_id=user_id, wallet_id=wallet_id, remaining__gt=0, expires_at__lte=now
     )
+    total = sum(due.values_list("remaining", flat=True))
+    if not total:
+        return 0
+    due.update(expired=F("expired") + F("remaining"), remaining=0)
+
+    if wallet is not None:
+        # balances that predate lot tracking may already have been spent
+        total = min(total, wallet.balance)
+        if total:
+            wallet.apply_points(-total, reason=EXPIRED_REASON, consume_lots=False)
+    else:
+        from django.contrib.auth import get_user_model
+        user = get_user_model().objects.get(pk=user_id)
+        adjust_points(user, -total, EXPIRED_REASON, consume_lots=False)
+    return total
+
 
 def notify_password_change(user):
     """
@@ -1,12 +1,16 @@
 from django.core.cache import cache
-from .models import PasswordPolicy, PointsLedger, PointChangeLog, DriverProfile, LoginActivity, PasswordChangeLog
+from .models import PasswordPolicy, LoginActivity, PasswordChangeLog, DriverNotificationPreference
+from .models import Notification, MessageRecipient, UnreadCounter, ChatMessage
+from .models import ChatRoom, DriverProfile, SponsorshipRequest
+from .events import hub, room_topic, user_topic
 from django.contrib.auth.signals import user_logged_in, user_login_failed
 from django.dispatch import receiver
 from django.utils import timezone
 from .models import LoginActivity
 from django.db.models.signals import post_save
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save, pre_save, post_migrate
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save, post_migrate, post_delete
 
 User = get_user_model()
 
@@ -48,28 +52,43 @@ def record_failed_login(sender, credentials, request, **kwargs):
     LoginActivity.objects.create(user=None, username=username or "", successful=False, ip_address=ip, user_agent=ua)
 
 # --- Points -> PointChangeLog ---
+# Written by accounts.audit.record_point_change from the ledger-writing paths
+# (apply_points, adjust_points, bulk_award_points), batched per transaction.
 
-@receiver(post_save, sender=PointsLedger)
-def log_point_change(sender, instance: PointsLedger, created, **kwargs):
-    if not created:
-        return
-    user = instance.user
-    sponsor_name = ""
-    sponsor_email = ""
-    try:
-        if hasattr(user, "driver_profile") and user.driver_profile:
-            sponsor_name = user.driver_profile.sponsor_name or ""
-            sponsor_email = user.driver_profile.sponsor_email or ""
-    except Exception:
-        pass
-
-    PointChangeLog.objects.create(
-        driver=user,
-        sponsor_name=sponsor_name,
-        sponsor_email=sponsor_email,
-        points_changed=instance.delta,
-        reason=instance.reason or "",
-    )
+
+# --- Notification preferences -> resolver cache ---
+
+@receiver(post_save, sender=DriverNotificationPreference)
+@receiver(post_delete, sender=DriverNotificationPreference)
+def invalidate_notification_prefs(sender, instance, **kwargs):
+    from .prefs import invalidate_prefs
+    invalidate_prefs(instance.user_id)
+
+
+# --- Unread badge counters ---
+# Single-row creates land here; bulk creates, mark-read and deletes adjust
+# UnreadCounter where they happen.
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and not instance.read:
+        UnreadCounter.adjust(instance.user_id, notifications=1)
+    if created:
+        hub.publish_on_commit(user_topic(instance.user_id))
+
+
+@receiver(post_save, sender=MessageRecipient)
+def count_new_message(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        UnreadCounter.adjust(instance.user_id, messages=1)
+
+
+# --- Live streams (views.events_stream) ---
+
+@receiver(post_save, sender=ChatMessage)
+def publish_chat_message(sender, instance, created, **kwargs):
+    if created:
+        hub.publish_on_commit(room_topic(instance.chat_room_id))
 
 
 # --- Password change audit ---
@@ -86,4 +105,30 @@ def log_password_change(sender, instance, **kwargs):
         PasswordChangeLog.objects.create(
             user=instance,
             change_type="manual",
-        )
\ No newline at end of file
+        )
+
+
+# --- Sponsorships -> cached chat participant sets ---
+
+@receiver(post_save, sender=SponsorshipRequest)
+@receiver(post_delete, sender=SponsorshipRequest)
+def invalidate_chat_participants(sender, instance, **kwargs):
+    # approve/deny/end and the admin sponsor editor all save the request;
+    # either side may be the sponsor
+    ChatRoom.invalidate_participants(instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_save, sender=DriverProfile)
+@receiver(post_delete, sender=DriverProfile)
+def invalidate_driver_chat_participants(sender, instance, created=True, **kwargs):
+    # only drivers count as participants, so gaining/losing the profile matters
+    if not created:
+        return
+    sponsor_ids = set()
+    for from_id, to_id in SponsorshipRequest.objects.filter(
+        Q(from_user_id=instance.user_id) | Q(to_user_id=instance.user_id), status="approved"
+    ).values_list("from_user_id", "to_user_id"):
+        sponsor_ids.update((from_id, to_id))
+    if sponsor_ids:
+        ChatRoom.invalidate_participants(*sponsor_ids)
+
@@ -74,4 +74,728 @@ class PasswordPolicyValidatorTests(TestCase):
         with self.assertRaises(ValidationError):
             validate_password("GoodPassw0rd!")  # ~13 chars
 
-        validate_password("GoodPassword0000!")  # >=16 and complex
\ No newline at end of file
+        validate_password("GoodPassword0000!")  # >=16 and complex
+
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from accounts.models import DriverProfile, SponsorPointsAccount, DriverPointsBalance
+from accounts.services import get_driver_points_balance
+
+
+class DriverPointsBalanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("driver1", "d1@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver)
+        self.sponsor_a = User.objects.create_user("sponsor_a", "a@example.com", "pw")
+        self.sponsor_b = User.objects.create_user("sponsor_b", "b@example.com", "pw")
+
+    def test_apply_points_maintains_summary(self):
+        wa = SponsorPointsAccount.objects.create(driver=self.driver, sponsor=self.sponsor_a)
+        wb = SponsorPointsAccount.objects.create(driver=self.driver, sponsor=self.sponsor_b)
+        wa.apply_points(300, reason="bonus")
+        wb.apply_points(200, reason="bonus")
+        wa.apply_points(-50, reason="spend")
+
+        self.assertEqual(DriverPointsBalance.objects.get(driver=self.driver).total, 450)
+        self.assertEqual(get_driver_points_balance(self.driver), 450)
+
+    def test_verify_balances_reports_and_fixes_drift(self):
+        wallet = SponsorPointsAccount.objects.create(driver=self.driver, sponsor=self.sponsor_a)
+        wallet.apply_points(100)
+        DriverPointsBalance.objects.filter(driver=self.driver).update(total=7)
+
+        out = StringIO()
+        call_command("verify_balances", stdout=out)
+        self.assertIn("1 drifted", out.getvalue())
+        self.assertEqual(DriverPointsBalance.objects.get(driver=self.driver).total, 7)
+
+        call_command("verify_balances", "--fix", stdout=StringIO())
+        self.assertEqual(DriverPointsBalance.objects.get(driver=self.driver).total, 100)
+
+
+from accounts.models import PointsLedger
+from accounts.services import adjust_points
+
+
+class LedgerAppendTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.driver = User.objects.create_user("driver2", "d2@example.com", "pw")
+
+    def test_append_chains_balance_after(self):
+        adjust_points(self.driver, 100, "start")
+        adjust_points(self.driver, -30, "spend")
+        entry = adjust_points(self.driver, 5, "bonus")
+        self.assertEqual(entry.balance_after, 75)
+
+    def test_rebuild_ledger_balances_repairs_chain(self):
+        for delta in (10, 20, -5):
+            adjust_points(self.driver, delta, "x")
+        PointsLedger.objects.filter(user=self.driver).update(balance_after=0)
+
+        call_command("rebuild_ledger_balances", stdout=StringIO())
+        chain = list(PointsLedger.objects.filter(user=self.driver).order_by("id").values_list("balance_after", flat=True))
+        self.assertEqual(chain, [10, 30, 25])
+
+
+from accounts.models import Notification, PointChangeLog, SponsorPointsTransaction
+from accounts.services import bulk_award_points
+
+
+class BulkAwardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.sponsor = User.objects.create_user("bulk_sponsor", "s@example.com", "pw")
+        self.drivers = []
+        for i in range(3):
+            u = User.objects.create_user(f"bulk_driver{i}", f"bd{i}@example.com", "pw")
+            DriverProfile.objects.create(user=u).sponsors.add(self.sponsor)
+            self.drivers.append(u)
+        self.outsider = User.objects.create_user("outsider", "o@example.com", "pw")
+        DriverProfile.objects.create(user=self.outsider)
+
+    def test_bulk_award_credits_sponsored_drivers(self):
+        d0, d1, d2 = self.drivers
+        with self.captureOnCommitCallbacks(execute=True):
+            # audit rows are written on commit, so the seed credit goes in the same capture
+            SponsorPointsAccount.objects.create(driver=d0, sponsor=self.sponsor).apply_points(10)
+            result = bulk_award_points(
+                self.sponsor,
+                [(d0.id, 100), (d1.id, 100), (d2.id, 50), (self.outsider.id, 100)],
+                reason="Monthly bonus",
+            )
+
+        self.assertEqual(result["skipped"], [self.outsider.id])
+        self.assertEqual(result["points"], 250)
+        self.assertEqual(SponsorPointsAccount.objects.get(driver=d0, sponsor=self.sponsor).balance, 110)
+        self.assertEqual(get_driver_points_balance(d2), 50)
+        self.assertEqual(PointsLedger.objects.filter(user=d0).order_by("-id").first().balance_after, 110)
+        self.assertEqual(SponsorPointsTransaction.objects.filter(wallet__sponsor=self.sponsor, reason="Monthly bonus").count(), 3)
+        self.assertEqual(PointChangeLog.objects.filter(reason="Monthly bonus").count(), 3)
+        call_command("dispatch_notifications", stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(user=d1, title="Points updated").count(), 1)
+        self.assertFalse(SponsorPointsAccount.objects.filter(driver=self.outsider).exists())
+
+    def test_bulk_award_rearms_low_balance_alerts_above_threshold(self):
+        from accounts.models import AlertState
+        d0, d1, _ = self.drivers
+        for d in (d0, d1):
+            AlertState.claim(d.id, AlertState.LOW_BALANCE)
+        bulk_award_points(self.sponsor, [(d0.id, 100), (d1.id, 50)])
+        self.assertEqual(list(AlertState.objects.values_list("user_id", flat=True)), [d1.id])
+
+    def test_audit_rows_go_with_a_rolled_back_savepoint(self):
+        from django.db import transaction
+        d0, d1, _ = self.drivers
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                bulk_award_points(self.sponsor, [(d0.id, 5)], reason="kept")
+                try:
+                    with transaction.atomic():
+                        bulk_award_points(self.sponsor, [(d1.id, 5)], reason="rolled back")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        logs = list(PointChangeLog.objects.values_list("driver_id", "reason"))
+        self.assertEqual(logs, [(d0.id, "kept")])
+
+    def test_csv_upload_prefers_usernames_and_skips_header(self):
+        from django.contrib.auth.models import Group
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.urls import reverse
+        self.sponsor.groups.add(Group.objects.get_or_create(name="sponsor")[0])
+        numeric = get_user_model().objects.create_user(str(self.outsider.id), "n@example.com", "pw")
+        DriverProfile.objects.create(user=numeric).sponsors.add(self.sponsor)
+        upload = SimpleUploadedFile("awards.csv", f"driver\n{numeric.username}\nbulk_driver0\n".encode())
+
+        self.client.force_login(self.sponsor)
+        response = self.client.post(
+            reverse("accounts:sponsor_bulk_award_points"), {"file": upload, "default_amount": 5}
+        )
+        results = response.context["results"]
+        self.assertEqual(results["errors"], [])
+        self.assertEqual(sorted(results["awarded"]), sorted([numeric.id, self.drivers[0].id]))
+
+
+import datetime as _dt
+from django.utils import timezone
+from accounts.models import PointsLot
+
+
+class PointsExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("exp_driver", "ed@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver)
+        self.sponsor = User.objects.create_user("exp_sponsor", "es@example.com", "pw")
+        self.wallet = SponsorPointsAccount.objects.create(driver=self.driver, sponsor=self.sponsor)
+
+    def test_debits_consume_oldest_lots_first(self):
+        self.wallet.apply_points(100)
+        self.wallet.apply_points(50)
+        self.wallet.apply_points(-120)
+        self.assertEqual(list(PointsLot.objects.filter(wallet=self.wallet).values_list("remaining", flat=True)), [0, 30])
+
+    def test_expire_points_posts_one_debit_per_wallet(self):
+        self.wallet.apply_points(40)
+        self.wallet.apply_points(60)
+        self.wallet.apply_points(25)
+        past = timezone.now() - _dt.timedelta(days=1)
+        first_two = PointsLot.objects.filter(wallet=self.wallet).order_by("id")[:2]
+        PointsLot.objects.filter(id__in=[l.id for l in first_two]).update(expires_at=past)
+
+        out = StringIO()
+        call_command("expire_points", "--dry-run", stdout=out)
+        self.assertIn("Would expire 100 points across 1 driver wallets", out.getvalue())
+        call_command("expire_points", "--batch-size", "1", stdout=StringIO())
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, 25)
+        self.assertEqual(PointsLedger.objects.filter(user=self.driver, reason="Points expired").count(), 1)
+        self.assertEqual(get_driver_points_balance(self.driver), 25)
+        self.assertEqual(sum(PointsLot.objects.values_list("expired", flat=True)), 100)
+
+
+class PointsHistoryPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("hist_driver", "hd@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver)
+        PointsLedger.objects.bulk_create([
+            PointsLedger(user=self.driver, delta=1, reason=f"row {i}", balance_after=i + 1) for i in range(60)
+        ])
+        self.client.force_login(self.driver)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        from django.urls import reverse
+        url = reverse("accounts:points_history")
+        first = self.client.get(url)
+        self.assertEqual(len(first.context["rows"]), 50)
+        self.assertEqual(first.context["balance"], 60)
+
+        second = self.client.get(url, {"before": first.context["next_cursor"]})
+        self.assertEqual(len(second.context["rows"]), 10)
+        self.assertIsNone(second.context["next_cursor"])
+        seen = {r.id for r in first.context["rows"]} | {r.id for r in second.context["rows"]}
+        self.assertEqual(len(seen), 60)
+
+    def test_csv_download_streams_rows_and_total(self):
+        from django.urls import reverse
+        response = self.client.get(reverse("accounts:points_history_download"), {"format": "csv"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "Date,Change,Reason,Balance After")
+        self.assertEqual(len(lines), 1 + 60 + 2)
+        self.assertEqual(lines[-1], "Total Balance,,,60")
+
+
+from django.db import connection
+from django.test import TransactionTestCase
+from accounts.archive import archive_model, archived_months, history_rows
+
+
+class ArchiveHistoryTests(TransactionTestCase):
+    # archive tables are created with the schema editor, which can't run
+    # inside TestCase's wrapping transaction on SQLite
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("arch_driver", "ad@example.com", "pw")
+        PointsLedger.objects.bulk_create([
+            PointsLedger(user=self.driver, delta=10, reason=f"row {i}", balance_after=10 * (i + 1)) for i in range(5)
+        ])
+        old = timezone.now() - _dt.timedelta(days=400)
+        PointsLedger.objects.update(created_at=old)
+        PointChangeLog.objects.create(driver=self.driver, points_changed=10, reason="old")
+        PointChangeLog.objects.update(created_at=old)
+        self.old = old
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            for model in (PointsLedger, PointChangeLog):
+                for year, month in archived_months(model):
+                    editor.delete_model(archive_model(model, year, month))
+        cache.clear()
+
+    def test_archive_moves_old_rows_and_reports_still_see_them(self):
+        out = StringIO()
+        call_command("archive_history", "--dry-run", stdout=out)
+        self.assertIn("points_ledger: up to 4 rows", out.getvalue())
+        call_command("archive_history", "--batch-size", "2", stdout=StringIO())
+
+        # the newest ledger row stays hot so append() keeps chaining
+        self.assertEqual(list(PointsLedger.objects.values_list("balance_after", flat=True)), [50])
+        self.assertFalse(PointChangeLog.objects.exists())
+
+        start = self.old - _dt.timedelta(days=1)
+        rows = list(history_rows("points_ledger", start, timezone.now(), fields=("id", "delta"), user_id=self.driver.id))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(history_rows("point_change_log", start, None, fields=("id",)).count(), 1)
+
+        from django.urls import reverse
+        DriverProfile.objects.create(user=self.driver)
+        self.client.force_login(self.driver)
+        page = self.client.get(reverse("accounts:points_history"))
+        self.assertEqual((len(page.context["rows"]), page.context["balance"]), (5, 50))
+
+        adjust_points(self.driver, 5, "after archive")
+        self.assertEqual(PointsLedger.objects.order_by("-id").first().balance_after, 55)
+        out = StringIO()
+        call_command("rebuild_ledger_balances", "--dry-run", stdout=out)
+        self.assertIn("Found 0 rows", out.getvalue())
+
+
+from django.db import transaction
+from accounts.audit import PointAuditWriter
+
+
+class PointAuditWriterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("audit_driver", "au@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver, sponsor_name="Acme")
+
+    def test_rows_flush_once_on_commit_and_skip_rolled_back_savepoints(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                adjust_points(self.driver, 10, "one")
+                adjust_points(self.driver, 20, "two")
+                try:
+                    with transaction.atomic():
+                        adjust_points(self.driver, 30, "rolled back")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.assertFalse(PointChangeLog.objects.exists())
+
+        reasons = list(PointChangeLog.objects.order_by("id").values_list("reason", "sponsor_name"))
+        self.assertEqual(reasons, [("one", "Acme"), ("two", "Acme")])
+        self.assertEqual(sum(1 for cb in callbacks if getattr(cb, "__func__", None) is PointAuditWriter.flush), 1)
+
+    def test_writer_first_used_in_a_rolled_back_savepoint_is_not_reused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        adjust_points(self.driver, 30, "rolled back")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                adjust_points(self.driver, 10, "kept")
+
+        self.assertEqual(list(PointChangeLog.objects.values_list("reason", flat=True)), ["kept"])
+
+
+from unittest import mock
+from django.core import mail
+from accounts.models import NotificationOutbox
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("outbox_driver", "ob@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver)
+
+    def test_points_update_is_queued_then_dispatched(self):
+        adjust_points(self.driver, 500, "bonus")
+        self.assertEqual(NotificationOutbox.objects.filter(user=self.driver).count(), 1)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command("dispatch_notifications", stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(user=self.driver, title="Points updated").count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING).exists())
+
+    @override_settings(NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_email_retries_with_backoff_without_duplicating_in_app(self):
+        from accounts.notifications import dispatch_outbox
+        adjust_points(self.driver, 500, "bonus")
+        row = NotificationOutbox.objects.get(user=self.driver)
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")):
+            dispatch_outbox()
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts), (NotificationOutbox.STATUS_PENDING, 1))
+            self.assertGreater(row.next_attempt_at, timezone.now())
+
+            dispatch_outbox(now=row.next_attempt_at)
+            row.refresh_from_db()
+            self.assertEqual(row.status, NotificationOutbox.STATUS_FAILED)
+        self.assertEqual(Notification.objects.filter(user=self.driver).count(), 1)
+
+
+from accounts.models import DriverNotificationPreference
+
+
+class NotificationPrefsResolverTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("prefs_user", "pu@example.com", "pw")
+
+    def test_reads_never_create_rows_and_saves_invalidate(self):
+        prefs = DriverNotificationPreference.for_user(self.user)
+        self.assertTrue(prefs.points)
+        self.assertFalse(DriverNotificationPreference.objects.exists())
+
+        with self.assertNumQueries(0):
+            DriverNotificationPreference.for_user(self.user)
+
+        DriverNotificationPreference.objects.create(user=self.user, points=False, theme="dark")
+        self.assertFalse(DriverNotificationPreference.for_user(self.user).points)
+        with self.assertNumQueries(0):
+            self.assertEqual(DriverNotificationPreference.for_user(self.user).theme, "dark")
+
+        # entries are reloaded once they outlive NOTIF_PREFS_LRU_SECONDS
+        import time
+        later = time.monotonic() + 61
+        with mock.patch("accounts.prefs.time.monotonic", return_value=later), self.assertNumQueries(1):
+            DriverNotificationPreference.for_user(self.user)
+
+
+from accounts.models import AlertState
+
+
+class AlertStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.driver = get_user_model().objects.create_user("alert_driver", "al@example.com", "pw")
+
+    def test_low_balance_alert_fires_once_and_rearms_after_recovery(self):
+        adjust_points(self.driver, 50, "start")
+        adjust_points(self.driver, -10, "spend")
+        low = NotificationOutbox.objects.filter(user=self.driver, title="Low Points Alert")
+        self.assertEqual(low.count(), 1)
+        self.assertTrue(AlertState.objects.filter(user=self.driver, alert_type=AlertState.LOW_BALANCE).exists())
+
+        adjust_points(self.driver, 100, "top up")
+        self.assertFalse(AlertState.objects.filter(user=self.driver).exists())
+
+        adjust_points(self.driver, -100, "spend")
+        self.assertEqual(low.count(), 2)
+
+
+from accounts.models import Message, MessageRecipient, UnreadCounter
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("badge_user", "bu@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def test_counters_follow_creates_reads_and_deletes(self):
+        from django.urls import reverse
+        notes = [Notification.objects.create(user=self.user, kind="orders", title=f"n{i}", body="b") for i in range(3)]
+        msg = Message.objects.create(author=self.user, subject="s", body="b")
+        item = MessageRecipient.objects.create(message=msg, user=self.user)
+        self.assertEqual(UnreadCounter.for_user(self.user), (3, 1))
+
+        self.client.post(reverse("accounts:notifications_bulk_delete"), {"ids": [notes[0].id, notes[1].id]})
+        self.client.get(reverse("accounts:messages_detail", args=[item.id]))
+        self.assertEqual(UnreadCounter.for_user(self.user), (1, 0))
+
+        UnreadCounter.objects.filter(user=self.user).update(notifications=9)
+        call_command("reconcile_unread_counts", stdout=StringIO())
+        self.assertEqual(UnreadCounter.for_user(self.user), (1, 0))
+
+    def test_first_adjust_shifts_a_row_a_concurrent_writer_seeded(self):
+        from django.db.models.query import QuerySet
+        update = QuerySet.update
+
+        def racing_update(qs, **kwargs):
+            if qs.model is UnreadCounter and not UnreadCounter.objects.exists():
+                # another first writer seeds the row from its own, still
+                # uncommitted, notification; ours isn't in its count
+                UnreadCounter.objects.create(user=self.user, notifications=1)
+                return 0
+            return update(qs, **kwargs)
+
+        Notification.objects.create(user=self.user, kind="orders", title="mine", body="b")
+        UnreadCounter.objects.all().delete()
+        with mock.patch.object(QuerySet, "update", racing_update):
+            UnreadCounter.adjust(self.user.id, notifications=1)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).notifications, 2)
+
+
+class MessageBroadcastTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.admin = User.objects.create_user("msg_admin", "ma@example.com", "pw", is_staff=True)
+        self.drivers = []
+        for i in range(5):
+            u = User.objects.create_user(f"msg_driver{i}", f"md{i}@example.com", "pw")
+            DriverProfile.objects.create(user=u)
+            self.drivers.append(u)
+
+    def compose(self, **flags):
+        from django.urls import reverse
+        self.client.force_login(self.admin)
+        data = {"subject": "Hello", "body": "Body"}
+        data.update({k: "on" for k in flags})
+        self.client.post(reverse("accounts:message_compose"), data)
+        return Message.objects.get(subject="Hello")
+
+    def test_broadcast_is_stored_once_and_materialized_on_open(self):
+        from django.urls import reverse
+        msg = self.compose(select_all=True)
+        self.assertTrue(msg.is_broadcast)
+        self.assertFalse(MessageRecipient.objects.exists())
+
+        driver = self.drivers[0]
+        self.assertEqual(UnreadCounter.for_user(driver), (0, 1))
+        self.client.force_login(driver)
+        inbox = self.client.get(reverse("accounts:messages_inbox"))
+        self.assertEqual([r.message_id for r in inbox.context["rows"]], [msg.id])
+
+        self.client.get(reverse("accounts:messages_broadcast_detail", args=[msg.id]))
+        self.assertEqual(MessageRecipient.objects.filter(user=driver, is_read=True).count(), 1)
+        self.assertEqual(UnreadCounter.for_user(driver), (0, 0))
+
+        self.client.post(reverse("accounts:messages_bulk_delete"), {"ids": [f"b{msg.id}"]})
+        self.assertEqual(MessageRecipient.objects.count(), 1)
+        self.client.force_login(self.drivers[1])
+        self.client.post(reverse("accounts:messages_bulk_delete"), {"ids": [f"b{msg.id}"]})
+        self.assertEqual(self.client.get(reverse("accounts:messages_inbox")).context["rows"], [])
+
+    @override_settings(MESSAGE_DELIVERY_CHUNK_SIZE=2)
+    def test_targeted_send_is_delivered_in_chunks_with_progress(self):
+        msg = self.compose(include_drivers=True)
+        self.assertEqual(msg.delivery_status, Message.DELIVERY_DONE)
+        self.assertEqual((msg.recipients_total, msg.recipients_delivered), (5, 5))
+        self.assertEqual(msg.delivery_cursor, self.drivers[-1].id)
+        self.assertEqual(MessageRecipient.objects.filter(message=msg).count(), 5)
+        self.assertEqual(UnreadCounter.for_user(self.drivers[2]), (0, 1))
+
+
+@override_settings(SSE_MAX_STREAM_SECONDS=0.3, SSE_HEARTBEAT_SECONDS=0.1, SSE_DB_POLL_SECONDS=0)
+class EventsStreamTests(TestCase):
+    def setUp(self):
+        from accounts.models import ChatRoom, ChatMessage
+        User = get_user_model()
+        self.sponsor = User.objects.create_user("sse_sponsor", "ss@example.com", "pw")
+        self.other = User.objects.create_user("sse_other", "so@example.com", "pw")
+        self.room = ChatRoom.objects.create(sponsor=self.sponsor)
+        self.first = ChatMessage.objects.create(chat_room=self.room, sender=self.other, message="hi")
+        Notification.objects.create(user=self.sponsor, kind="orders", title="Shipped", body="b")
+
+    async def test_stream_sends_rows_past_cursors_then_heartbeats(self):
+        from django.urls import reverse
+        from accounts.models import ChatReadCursor
+        await self.async_client.aforce_login(self.sponsor)
+        response = await self.async_client.get(
+            reverse("accounts:events_stream"), {"room": self.room.id, "after": 0, "notif_after": 0}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = "".join([chunk.decode() if isinstance(chunk, bytes) else chunk
+                        async for chunk in response.streaming_content])
+        self.assertIn('event: chat\ndata: {"id": %d' % self.first.id, body)
+        self.assertIn("event: notification", body)
+        self.assertIn(": ping", body)
+        self.assertTrue(await ChatReadCursor.objects.filter(chat_room=self.room, user=self.sponsor, last_read_id=self.first.id).aexists())
+
+    def test_non_participant_is_refused(self):
+        from django.urls import reverse
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("accounts:events_stream"), {"room": self.room.id})
+        self.assertEqual(response.status_code, 403)
+
+    def test_wsgi_request_gets_no_content(self):
+        from django.urls import reverse
+        self.client.force_login(self.sponsor)
+        response = self.client.get(reverse("accounts:events_stream"), {"room": self.room.id})
+        self.assertEqual(response.status_code, 204)
+
+
+from accounts.models import NotificationDigest
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS={"promotions": 30}, NOTIFICATION_RETENTION_DEFAULT_DAYS=180,
+                   NOTIFICATION_UNREAD_RETENTION_DAYS=365)
+class PruneNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("pruned", "pruned@example.com", "pw")
+        self.now = timezone.now()
+
+    def make(self, kind, days, read=True):
+        return Notification.objects.create(
+            user=self.user, kind=kind, title=kind, body="b", read=read,
+            created_at=self.now - _dt.timedelta(days=days),
+        )
+
+    def test_prunes_by_kind_and_rolls_read_rows_into_digests(self):
+        old_promo = self.make("promotions", 40)
+        self.make("promotions", 40)
+        kept_points = self.make("points", 40)
+        old_points = self.make("points", 200)
+        kept_unread = self.make("orders", 200, read=False)
+        old_unread = self.make("orders", 400, read=False)
+        self.assertEqual(UnreadCounter.for_user(self.user)[0], 2)
+
+        out = StringIO()
+        call_command("prune_notifications", "--dry-run", stdout=out)
+        self.assertIn("4 notifications would be pruned", out.getvalue())
+        self.assertEqual(Notification.objects.count(), 6)
+
+        call_command("prune_notifications", "--digest", "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(set(Notification.objects.values_list("id", flat=True)), {kept_points.id, kept_unread.id})
+        self.assertEqual(UnreadCounter.for_user(self.user)[0], 1)
+
+        digests = {d.day: d for d in NotificationDigest.objects.filter(user=self.user)}
+        promo_day = timezone.localdate(old_promo.created_at)
+        self.assertEqual(digests[promo_day].total, 2)
+        self.assertEqual(digests[promo_day].by_kind, {"promotions": 2})
+        self.assertEqual(digests[timezone.localdate(old_points.created_at)].by_kind, {"points": 1})
+        # unread rows aren't digested
+        self.assertNotIn(timezone.localdate(old_unread.created_at), digests)
+
+
+class EmailDigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.driver = User.objects.create_user("digest_driver", "dg@example.com", "pw")
+        DriverNotificationPreference.objects.create(user=self.driver, email_digest="hourly")
+
+    def test_points_emails_are_held_and_sent_as_one_digest(self):
+        from accounts.notifications import dispatch_outbox, flush_digests
+        for n in range(3):
+            NotificationOutbox.objects.create(user=self.driver, kind="points", title="Points updated", body=f"+{n}")
+        NotificationOutbox.objects.create(user=self.driver, kind="dropped", title="Removed from sponsor", body="now")
+
+        counts = dispatch_outbox()
+        self.assertEqual((counts["held"], counts["in_app"]), (3, 4))
+        self.assertEqual([m.subject for m in mail.outbox], ["Removed from sponsor"])
+
+        self.assertEqual(flush_digests()["users"], 0)  # not due yet
+        counts = flush_digests(now=timezone.now() + _dt.timedelta(hours=1, minutes=1))
+        self.assertEqual((counts["rows"], counts["sent"]), (3, 1))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("3 updates", mail.outbox[1].subject)
+        self.assertIn("+2", mail.outbox[1].body)
+        self.assertFalse(NotificationOutbox.objects.exclude(status=NotificationOutbox.STATUS_SENT).exists())
+
+
+from django.urls import reverse
+from accounts.models import ChatRoom, ChatMessage, ChatReadCursor
+
+
+class ChatReadCursorTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.sponsor = User.objects.create_user("cursor_sponsor", "cs@example.com", "pw")
+        self.other = User.objects.create_user("cursor_other", "co@example.com", "pw")
+        self.room = ChatRoom.objects.create(sponsor=self.sponsor)
+        self.msgs = [ChatMessage.objects.create(chat_room=self.room, sender=self.other, message=str(n)) for n in range(5)]
+
+    def test_unread_is_everything_past_the_cursor(self):
+        self.assertEqual(self.room.get_unread_count(self.sponsor), 5)
+        self.msgs[2].mark_as_read(self.sponsor)
+        self.assertEqual(self.room.get_unread_count(self.sponsor), 2)
+        # never moves backwards, and doesn't write when it can't move
+        with self.assertNumQueries(2):
+            self.assertFalse(ChatReadCursor.advance(self.room.id, self.sponsor.id, self.msgs[0].id))
+        self.assertEqual(ChatReadCursor.last_read(self.room.id, self.sponsor.id), self.msgs[2].id)
+
+        self.client.force_login(self.sponsor)
+        self.client.get(reverse("accounts:chat_room_detail", args=[self.room.id]))
+        self.assertEqual(self.room.get_unread_count(self.sponsor), 0)
+        self.assertEqual(ChatReadCursor.objects.filter(user=self.sponsor).count(), 1)
+
+
+from django.contrib.auth.models import Group
+from accounts.models import SponsorshipRequest
+
+
+class ChatParticipantsCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.sponsor = User.objects.create_user("room_sponsor", "rs@example.com", "pw")
+        self.sponsor.groups.add(Group.objects.get_or_create(name="sponsor")[0])
+        self.driver = User.objects.create_user("room_driver", "rd@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver)
+        self.room = ChatRoom.objects.create(sponsor=self.sponsor)
+        self.req = SponsorshipRequest.objects.create(from_user=self.driver, to_user=self.sponsor)
+
+    def test_membership_is_cached_until_sponsorship_changes(self):
+        self.assertFalse(self.room.has_participant(self.driver))
+        self.req.approve()
+        self.assertTrue(self.room.has_participant(self.driver))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.room.has_participant(self.driver))
+            self.assertTrue(self.room.has_participant(self.sponsor))
+        self.req.end(ended_by=self.sponsor)
+        self.assertFalse(self.room.has_participant(self.driver))
+
+
+class ChatHistoryPaginationTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.sponsor = User.objects.create_user("page_sponsor", "ps@example.com", "pw")
+        self.other = User.objects.create_user("page_other", "po@example.com", "pw")
+        self.room = ChatRoom.objects.create(sponsor=self.sponsor)
+        self.ids = [
+            ChatMessage.objects.create(chat_room=self.room, sender=self.other, message=str(n)).id
+            for n in range(60)
+        ]
+        self.client.force_login(self.sponsor)
+
+    def test_newest_page_then_older_then_newer_by_id(self):
+        from accounts.views import CHAT_PAGE_SIZE
+        response = self.client.get(reverse("accounts:chat_room_detail", args=[self.room.id]))
+        shown = [m.id for m in response.context["chat_messages"]]
+        self.assertEqual(shown, self.ids[-CHAT_PAGE_SIZE:])
+        self.assertTrue(response.context["has_older"])
+
+        url = reverse("accounts:get_chat_messages", args=[self.room.id])
+        older = self.client.get(url, {"before": shown[0]}).json()
+        self.assertEqual([m["id"] for m in older["messages"]], self.ids[:-CHAT_PAGE_SIZE])
+        self.assertFalse(older["has_more"])
+
+        newer = ChatMessage.objects.create(chat_room=self.room, sender=self.other, message="new")
+        data = self.client.get(url, {"after": shown[-1]}).json()
+        self.assertEqual([m["id"] for m in data["messages"]], [newer.id])
+        self.assertEqual(ChatReadCursor.last_read(self.room.id, self.sponsor.id), newer.id)
+
+
+class ChatRoomsListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.sponsor = User.objects.create_user("list_sponsor", "ls@example.com", "pw")
+        self.sponsor.groups.add(Group.objects.get_or_create(name="sponsor")[0])
+        self.driver = User.objects.create_user("list_driver", "ld@example.com", "pw")
+        DriverProfile.objects.create(user=self.driver)
+
+    def test_room_is_provisioned_on_approval_and_listed_with_counts(self):
+        self.client.force_login(self.driver)
+        self.assertEqual(list(self.client.get(reverse("accounts:chat_rooms_list")).context["chat_rooms"]), [])
+        self.assertFalse(ChatRoom.objects.exists())
+
+        SponsorshipRequest.objects.create(from_user=self.driver, to_user=self.sponsor).approve()
+        room = ChatRoom.objects.get(sponsor=self.sponsor)
+        msgs = [ChatMessage.objects.create(chat_room=room, sender=self.sponsor, message=f"m{n}") for n in range(3)]
+        ChatMessage.objects.create(chat_room=room, sender=self.driver, message="mine")
+        msgs[0].mark_as_read(self.driver)
+
+        rooms = self.client.get(reverse("accounts:chat_rooms_list")).context["chat_rooms"]
+        self.assertEqual([r.id for r in rooms], [room.id])
+        self.assertEqual(rooms[0].unread_count, 2)
+        self.assertEqual((rooms[0].latest_message_text, rooms[0].latest_message_sender), ("mine", "list_driver"))
+        self.assertEqual([u.username for u in rooms[0].participants_list], ["list_driver", "list_sponsor"])
+
+        with self.assertNumQueries(1):
+            list(ChatRoom.list_for(self.sponsor, is_sponsor=True))
@@ -17,6 +17,7 @@ urlpatterns = [
     # Wallet
     path("wallets/", views.wallets, name="wallets"),
     path("wallets/award/", views.sponsor_award_points, name="sponsor_award_points"),
+    path("wallets/award/bulk/", views.sponsor_bulk_award_points, name="sponsor_bulk_award_points"),
 
     # Multi-factor authentication (MFA)
     path("mfa/setup/", views.mfa_setup, name="mfa_setup"),
@@ -31,6 +32,8 @@ urlpatterns = [
     path("messages/delete/<int:pk>/", views.message_delete, name="messages_delete"),
     path("messages/bulk-delete/", views.messages_bulk_delete, name="messages_bulk_delete"),
     path("messages/sent/delete/<int:pk>/", views.message_sent_delete, name="messages_sent_delete"),
+    path("messages/broadcast/<int:message_id>/", views.message_broadcast_detail, name="messages_broadcast_detail"),
+    path("messages/broadcast/<int:message_id>/delete/", views.message_broadcast_delete, name="messages_broadcast_delete"),
     
     # Security Measures
     path("security-questions/", views.security_questions_configure, name="security_questions_configure"),
@@ -164,6 +167,7 @@ urlpatterns = [
     path("chat/<int:room_id>/", views.chat_room_detail, name="chat_room_detail"),
     path("chat/<int:room_id>/messages/", views.get_chat_messages, name="get_chat_messages"),
     path("chat/<int:room_id>/send/", views.send_chat_message, name="send_chat_message"),
+    path("events/", views.events_stream, name="events_stream"),
 
     path("api/suggest/drivers/", views.api_driver_suggest, name="api_driver_suggest"),
     path("api/suggest/sponsors/", views.api_sponsor_suggest, name="api_sponsor_suggest"),
@@ -29,9 +29,9 @@ from urllib3 import request
 from .forms import RegistrationForm  
 from .models import PasswordPolicy, LockoutPolicy
 from .models import DriverProfile, SponsorProfile
-from .models import ChatRoom, ChatMessage, MessageReadStatus
-from .models import Notification
-from .models import PointsLedger
+from .models import ChatRoom, ChatMessage, ChatReadCursor
+from .models import Notification, UnreadCounter
+from .models import PointsLedger, PointsLot
 from .models import Message, MessageRecipient
 from .models import FailedLoginAttempt
 from .models import SecurityQuestion, UserSecurityAnswer
@@ -47,10 +47,11 @@ from django.db.models import Q
 from django import db as django_db
 from django.db import models
 from .models import LoginActivity
+from .archive import archive_cutoff, history_rows
 from shop.models import Order, Wishlist, Wishlist
 from shop.utils import order_is_delayed
 from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import csv
 from io import BytesIO
 from django.template.loader import render_to_string
@@ -95,13 +96,13 @@ from django.views.decorators.csrf import csrf_protect
 
 from django.contrib.auth.views import PasswordChangeView, PasswordResetConfirmView
 from django.contrib import messages
-from .services import notify_password_change, get_driver_points_balance
+from .services import notify_password_change, get_driver_points_balance, bulk_award_points
 from .forms import LabelForm, AssignLabelForm
 from .models import CustomLabel, DriverProfile
 
 from django.db import transaction
 from .models import SponsorPointsAccount
-from .forms import SponsorAwardForm, SetPrimaryWalletForm, ContactSponsorForm, PointsGoalForm, SponsorFeeRatioForm
+from .forms import SponsorAwardForm, SponsorBulkAwardForm, SetPrimaryWalletForm, ContactSponsorForm, PointsGoalForm, SponsorFeeRatioForm
 from django.db.models import OuterRef, Subquery, IntegerField
 
 User = get_user_model()
@@ -199,82 +200,95 @@ def audit_report(request):
             return qs
         return qs.filter(**{f"{driver_field}__driver_profile__sponsor_name": sponsor_scope})
 
+    # Sponsor-scoped users, resolved once; the archive tables only carry ids
+    sponsor_user_ids, sponsor_usernames = [], []
+    if sponsor_scope and category in ("login_attempts", "password_changes"):
+        for uid, uname in DriverProfile.objects.filter(
+            sponsor_name=sponsor_scope, user__isnull=False
+        ).values_list("user_id", "user__username"):
+            sponsor_user_ids.append(uid)
+            sponsor_usernames.append(uname)
+
+    def usernames_for(recs, key):
+        ids = {r[key] for r in recs if r[key]}
+        return dict(User.objects.filter(id__in=ids).values_list("id", "username"))
+
     # --- Build dataset per category ---
+    # login/point/password history reads through history_rows so rows moved
+    # to the monthly archives (archive_history) still show up here.
     if category == "login_attempts":
-        qs = LoginActivity.objects.filter(created_at__range=(start_dt, end_dt))
-
-        # Sponsor scoping
+        q = []
         if sponsor_scope:
-            sponsor_usernames = list(
-                DriverProfile.objects.filter(sponsor_name=sponsor_scope, user__isnull=False)
-                .values_list("user__username", flat=True)
-            )
-            qs = qs.filter(
-                Q(user__driver_profile__sponsor_name=sponsor_scope) |
-                Q(username__in=sponsor_usernames)
-            )
+            q.append(Q(user_id__in=sponsor_user_ids) | Q(username__in=sponsor_usernames))
 
         # User ID filter: match either the resolved user FK or the attempted username
         if user_id:
-            try:
-                target_user = User.objects.get(id=user_id)
-                qs = qs.filter(Q(user_id=user_id) | Q(username=target_user.username))
-            except User.DoesNotExist:
-                qs = qs.none()
-
-        qs = qs.select_related("user").order_by("-created_at")
+            target_username = User.objects.filter(id=user_id).values_list("username", flat=True).first()
+            q.append(Q(user_id=user_id) | Q(username=target_username) if target_username else Q(pk__in=[]))
+
+        recs = list(history_rows(
+            "login_activity", start_dt, end_dt, *q,
+            fields=("created_at", "user_id", "username", "successful", "ip_address"),
+            order_by=("-created_at",),
+        ))
+        names = usernames_for(recs, "user_id")
         columns = ["Date", "Username", "Success", "IP"]
-        for rec in qs:
+        for rec in recs:
             rows.append([
-                timezone.localtime(rec.created_at).strftime("%Y-%m-%d %H:%M"),
-                (rec.user.username if rec.user else rec.username) or "",
-                "OK" if rec.successful else "FAIL",
-                rec.ip_address or "",
+                timezone.localtime(rec["created_at"]).strftime("%Y-%m-%d %H:%M"),
+                names.get(rec["user_id"]) or rec["username"] or "",
+                "OK" if rec["successful"] else "FAIL",
+                rec["ip_address"] or "",
             ])
 
     elif category == "point_changes":
-        qs = PointChangeLog.objects.filter(created_at__range=(start_dt, end_dt))
-
-        # Sponsor scoping
+        filters = {}
         if sponsor_scope:
-            if _field_exists(PointChangeLog, "sponsor_name"):
-                qs = qs.filter(sponsor_name=sponsor_scope)
-            else:
-                qs = filter_by_sponsor_via_driver(qs, driver_field="driver")
+            filters["sponsor_name"] = sponsor_scope
 
         # User ID filter (driver)
         if user_id:
-            qs = qs.filter(driver_id=user_id)
-
-        qs = qs.select_related("driver").order_by("-created_at")
+            filters["driver_id"] = user_id
+
+        recs = list(history_rows(
+            "point_change_log", start_dt, end_dt,
+            fields=("created_at", "sponsor_name", "driver_id", "points_changed", "reason"),
+            order_by=("-created_at",),
+            **filters,
+        ))
+        names = usernames_for(recs, "driver_id")
         columns = ["Date", "Sponsor", "Driver", "Points", "Reason"]
-        for rec in qs:
-            sponsor_name = getattr(rec, "sponsor_name", "") or getattr(
-                getattr(rec.driver, "driver_profile", None), "sponsor_name", ""
-            )
+        for rec in recs:
             rows.append([
-                timezone.localtime(rec.created_at).strftime("%Y-%m-%d %H:%M"),
-                sponsor_name or "",
-                rec.driver.username if rec.driver_id else "",
-                rec.points_changed,
-                rec.reason or "",
+                timezone.localtime(rec["created_at"]).strftime("%Y-%m-%d %H:%M"),
+                rec["sponsor_name"] or "",
+                names.get(rec["driver_id"], ""),
+                rec["points_changed"],
+                rec["reason"] or "",
             ])
 
     elif category == "password_changes":
-        qs = PasswordChangeLog.objects.filter(created_at__range=(start_dt, end_dt))
-        qs = filter_by_sponsor_via_driver(qs, driver_field="user")
+        filters = {}
+        if sponsor_scope:
+            filters["user_id__in"] = sponsor_user_ids
 
         # User ID filter (user)
         if user_id:
-            qs = qs.filter(user_id=user_id)
-
-        qs = qs.select_related("user").order_by("-created_at")
+            filters["user_id"] = user_id
+
+        recs = list(history_rows(
+            "password_change_log", start_dt, end_dt,
+            fields=("created_at", "user_id", "change_type"),
+            order_by=("-created_at",),
+            **filters,
+        ))
+        names = usernames_for(recs, "user_id")
         columns = ["Date", "User", "Type"]
-        for rec in qs:
+        for rec in recs:
             rows.append([
-                timezone.localtime(rec.created_at).strftime("%Y-%m-%d %H:%M"),
-                rec.user.username if rec.user_id else "",
-                rec.change_type,
+                timezone.localtime(rec["created_at"]).strftime("%Y-%m-%d %H:%M"),
+                names.get(rec["user_id"], ""),
+                rec["change_type"],
             ])
 
     elif category == "driver_applications":
@@ -1580,7 +1594,7 @@ def sponsor_award_points(request):
             if delta < 0 and wallet.balance < abs(delta):
                 messages.error(request, "Insufficient points to deduct.")
             else:
-                wallet.apply_points(delta, reason=reason, awarded_by=request.user)
+                wallet.apply_points(delta, reason=reason, created_by=request.user)
                 if delta > 0:
                     messages.success(request, f"Awarded {amount} points to {driver.username}.")
                 else:
@@ -1590,6 +1604,75 @@ def sponsor_award_points(request):
         form = SponsorAwardForm()
     return render(request, "accounts/sponsor_award_points.html", {"form": form})
 
+BULK_AWARD_HEADER_NAMES = {"driver", "driver_id", "id", "user", "username"}
+
+
+@login_required
+@user_passes_test(is_sponsor)
+def sponsor_bulk_award_points(request):
+    """
+    Credit many drivers at once from a CSV upload (`driver,amount` rows).
+    Rows naming drivers outside this sponsor's roster are skipped and reported.
+    """
+    results = None
+    if request.method == "POST":
+        form = SponsorBulkAwardForm(request.POST, request.FILES)
+        if form.is_valid():
+            default_amount = form.cleaned_data.get("default_amount")
+            errors = []
+            parsed = []
+            reader = csv.reader(TextIOWrapper(form.cleaned_data["file"].file, encoding="utf-8"))
+            for row_num, row in enumerate(reader, 1):
+                row = [c.strip() for c in row]
+                if not row or not row[0]:
+                    continue
+                if row_num == 1 and row[0].lower() in BULK_AWARD_HEADER_NAMES:
+                    continue  # header row, even when amounts come from default_amount
+                raw_amount = row[1] if len(row) > 1 and row[1] else default_amount
+                try:
+                    amount = int(raw_amount)
+                except (TypeError, ValueError):
+                    if row_num == 1:
+                        continue  # header row
+                    errors.append(f"Row {row_num}: invalid or missing amount")
+                    continue
+                if amount <= 0:
+                    errors.append(f"Row {row_num}: amount must be positive")
+                    continue
+                parsed.append((row_num, row[0], amount))
+
+            # resolve usernames in one query; an all-digit value is only read
+            # as a user id when no username matches it
+            names = {ident for _, ident, _ in parsed}
+            ids_by_name = dict(User.objects.filter(username__in=names).values_list("username", "id"))
+            awards = []
+            for row_num, ident, amount in parsed:
+                driver_id = ids_by_name.get(ident)
+                if driver_id is None and ident.isdigit():
+                    driver_id = int(ident)
+                if driver_id is None:
+                    errors.append(f"Row {row_num}: unknown driver '{ident}'")
+                    continue
+                awards.append((driver_id, amount))
+
+            try:
+                results = bulk_award_points(
+                    request.user, awards, reason=form.cleaned_data.get("reason", ""), created_by=request.user
+                )
+            except forms.ValidationError as e:
+                messages.error(request, f"Could not award points: {' '.join(e.messages)}")
+            else:
+                results["errors"] = errors
+                for driver_id in results["skipped"]:
+                    errors.append(f"Driver {driver_id} is not under your sponsorship")
+                messages.success(
+                    request,
+                    f"Awarded {results['points']} points to {len(results['awarded'])} drivers.",
+                )
+    else:
+        form = SponsorBulkAwardForm()
+    return render(request, "accounts/sponsor_bulk_award_points.html", {"form": form, "results": results})
+
 @login_required
 def wallets(request):
     qs = SponsorPointsAccount.objects.filter(driver=request.user).select_related("sponsor")
@@ -1609,39 +1692,26 @@ def messages_compose(request):
     if request.method == "POST":
         form = MessageComposeForm(request.POST)
         if form.is_valid():
+            data = form.cleaned_data
             msg = form.save(commit = False)
             msg.author = request.user
+            # "All users" is stored once; inbox rows appear as users open it
+            msg.is_broadcast = bool(data["select_all"])
+            if not msg.is_broadcast:
+                msg.delivery_status = Message.DELIVERY_PENDING
             msg.save()
-            form.save_m2m()  # for direct_users
-
-            # Determine recipients
-            recipients = User.objects.none()
-            active = User.objects.filter(is_active=True)
+            form.save_m2m()
+            if data["users"] and not msg.is_broadcast:
+                msg.direct_users.set(data["users"])
 
-            data = form.cleaned_data
-            if data["select_all"]:
-                recipients = active
+            if msg.is_broadcast:
+                Message.broadcasts_changed()
+                messages.success(request, "Message broadcast to all users.")
             else:
-                if data["include_admins"]:
-                    recipients = recipients | active.filter(Q(is_staff=True) | Q(is_superuser=True))
-                if data["include_sponsors"]:
-                    recipients = recipients | active.filter(groups__name="sponsor")
-                if data["include_drivers"]:
-                    recipients = (
-                        recipients | active.filter(driver_profile__isnull=False)
-                        .exclude(groups__name="sponsor")
-                        .exclude(Q(is_staff=True) | Q(is_superuser=True))
-                    )
-                if data["users"]:
-                    recipients = recipients | data["users"] 
-            recipients = recipients.distinct()
-
-            MessageRecipient.objects.bulk_create(
-                [MessageRecipient(message=msg, user=u) for u in recipients],
-                ignore_conflicts = True,
-            )
-
-            messages.success(request, f"Message sent to {recipients.count()} recipients.")
+                msg.recipients_total = msg.audience().count()
+                Message.objects.filter(pk=msg.pk).update(recipients_total=msg.recipients_total)
+                msg.deliver(chunk_size=getattr(settings, "MESSAGE_DELIVERY_CHUNK_SIZE", 1000))
+                messages.success(request, f"Message sent to {msg.recipients_delivered} recipients.")
             return redirect("accounts:messages_sent")
     else:
         form = MessageComposeForm()
@@ -1649,13 +1719,42 @@ def messages_compose(request):
 
 @login_required
 def messages_inbox(request):
-    rows = (MessageRecipient.objects
+    rows = list(MessageRecipient.objects
             .select_related("message", "message__author")
-            .filter(user=request.user)
+            .filter(user=request.user, is_deleted=False)
             .order_by("delivered_at")
     )
+    # unopened broadcasts have no row yet; list them as unsaved, unread items
+    rows += [
+        MessageRecipient(message=m, user=request.user, delivered_at=m.created_at)
+        for m in Message.unopened_broadcasts_for(request.user).select_related("author")
+    ]
+    rows.sort(key=lambda r: r.delivered_at)
     return render(request, "accounts/messages_inbox.html", {"rows": rows})
 
+def _open_broadcast(user, message_id, **defaults):
+    """Materialize `user`'s inbox row for a broadcast they can see."""
+    msg = get_object_or_404(Message.broadcasts_for(user), pk=message_id)
+    item, created = MessageRecipient.objects.get_or_create(message=msg, user=user, defaults=defaults)
+    if created:
+        UnreadCounter.invalidate(user.id)
+    return item
+
+@login_required
+def message_broadcast_detail(request, message_id: int):
+    item = _open_broadcast(request.user, message_id, is_read=True, read_at=timezone.now())
+    return redirect("accounts:messages_detail", item.pk)
+
+@login_required
+@require_POST
+def message_broadcast_delete(request, message_id: int):
+    item = _open_broadcast(request.user, message_id, is_read=True, is_deleted=True)
+    if not item.is_deleted:
+        item.is_deleted = True
+        item.save(update_fields=["is_deleted"])
+    messages.success(request, "Message deleted.")
+    return redirect("accounts:messages_inbox")
+
 @staff_member_required
 def messages_sent(request):
     rows = Message.objects.filter(author = request.user).order_by("-created_at")
@@ -1664,8 +1763,15 @@ def messages_sent(request):
 @login_required
 @require_POST
 def message_delete(request, pk: int):
-    item = get_object_or_404(MessageRecipient, pk=pk, user=request.user)
-    item.delete()
+    item = get_object_or_404(MessageRecipient.objects.select_related("message"), pk=pk, user=request.user, is_deleted=False)
+    if item.message.is_broadcast:
+        # keep a hidden row, otherwise the broadcast would come back
+        item.is_deleted = True
+        item.save(update_fields=["is_deleted"])
+    else:
+        item.delete()
+    if not item.is_read:
+        UnreadCounter.adjust(request.user.id, messages=-1)
     messages.success(request, "Message deleted.")
     return redirect("accounts:messages_inbox")
     #return redirect(request.META.get("HTTP_REFERER", "accounts:messages_inbox"))
@@ -1675,9 +1781,19 @@ def message_delete(request, pk: int):
 def messages_bulk_delete(request):
     ids = request.POST.getlist("ids")
     if ids:
-        (MessageRecipient.objects
-            .filter(user=request.user, pk__in=ids)
-            .delete())
+        # unopened broadcasts are posted as "b<message id>"
+        broadcast_ids = [i[1:] for i in ids if i.startswith("b") and i[1:].isdigit()]
+        ids = [i for i in ids if i.isdigit()]
+        qs = MessageRecipient.objects.filter(user=request.user, pk__in=ids, is_deleted=False)
+        unread = qs.filter(is_read=False).count()
+        qs.filter(message__is_broadcast=True).update(is_deleted=True)
+        qs.filter(message__is_broadcast=False).delete()
+        MessageRecipient.objects.bulk_create([
+            MessageRecipient(message=m, user=request.user, is_read=True, is_deleted=True)
+            for m in Message.unopened_broadcasts_for(request.user).filter(pk__in=broadcast_ids)
+        ], ignore_conflicts=True)
+        UnreadCounter.adjust(request.user.id, messages=-unread)
+        UnreadCounter.invalidate(request.user.id)
         messages.success(request, "Selected messages deleted.")
     else:
         messages.info(request, "No messages selected for deletion.")
@@ -1687,36 +1803,67 @@ def messages_bulk_delete(request):
 @require_POST
 def message_sent_delete(request, pk: int):
     msg = get_object_or_404(Message, pk=pk, author=request.user)
+    unread = dict(
+        MessageRecipient.objects.filter(message=msg, is_read=False, is_deleted=False)
+        .values_list("user_id").annotate(n=Count("id"))
+    )
     msg.delete()
+    UnreadCounter.adjust_many(messages={user_id: -n for user_id, n in unread.items()})
+    if msg.is_broadcast:
+        Message.broadcasts_changed()
     messages.success(request, "Sent message deleted.")
     return redirect("accounts:messages_sent")
 
 @staff_member_required
 def login_activity(request):
     """Admin page: list login activity records with optional user filter and success/failure filter."""
-    qs = LoginActivity.objects.select_related("user").all()
     user_q = request.GET.get("user", "").strip()
     status = request.GET.get("status", "")  # 'success' | 'fail' | ''
 
+    # filters stick to the table's own columns so they also apply to archives
+    filters = []
     if user_q:
         # allow searching by username or id
         if user_q.isdigit():
-            qs = qs.filter(models.Q(user__id=int(user_q)) | models.Q(username__icontains=user_q))
+            filters.append(models.Q(user_id=int(user_q)) | models.Q(username__icontains=user_q))
         else:
-            qs = qs.filter(models.Q(user__username__icontains=user_q) | models.Q(username__icontains=user_q))
+            matching = get_user_model().objects.filter(username__icontains=user_q).values("id")
+            filters.append(models.Q(user_id__in=matching) | models.Q(username__icontains=user_q))
 
     if status == "success":
-        qs = qs.filter(successful=True)
+        filters.append(models.Q(successful=True))
     elif status == "fail":
-        qs = qs.filter(successful=False)
-
-    qs = qs.order_by("-created_at")
+        filters.append(models.Q(successful=False))
+
+    # Recent activity by default: the hot table holds the last ARCHIVE_HORIZON_DAYS.
+    # Archived months are only unioned in when the range reaches back past them.
+    cutoff = archive_cutoff(getattr(settings, "ARCHIVE_HORIZON_DAYS", 365))
+    date_from, date_to, start, end = _date_range(request)
+    if start is None:
+        start = cutoff
+        date_from = timezone.localdate(cutoff).isoformat()
+    fields = [f.attname for f in LoginActivity._meta.concrete_fields]
+    order_by = ("-created_at", "-id")
+    if start < cutoff:
+        qs = history_rows("login_activity", start, end, *filters, fields=fields, order_by=order_by)
+    else:
+        filters.append(models.Q(created_at__gte=start))
+        if end:
+            filters.append(models.Q(created_at__lte=end))
+        qs = LoginActivity.objects.filter(*filters).values(*fields).order_by(*order_by)
 
     paginator = Paginator(qs, 50)
     page = request.GET.get("page", 1)
     page_obj = paginator.get_page(page)
-
-    return render(request, "accounts/login_activity.html", {"page": page_obj, "user_q": user_q, "status": status})
+    records = [LoginActivity(**row) for row in page_obj.object_list]
+    users = get_user_model().objects.in_bulk({r.user_id for r in records if r.user_id})
+    for rec in records:
+        rec.user = users.get(rec.user_id)
+    page_obj.object_list = records
+
+    return render(request, "accounts/login_activity.html", {
+        "page": page_obj, "user_q": user_q, "status": status, "date_from": date_from, "date_to": date_to,
+    })
 
 @login_required
 def driver_security_log(request):
@@ -1819,11 +1966,12 @@ def _parse_user_agent(user_agent):
 @login_required
 def message_detail(request, pk: int):
     item = get_object_or_404(MessageRecipient.objects.select_related("message", "message__author"), 
-                            pk=pk, user=request.user)
+                            pk=pk, user=request.user, is_deleted=False)
     if not item.is_read:
         item.is_read = True
         item.read_at = timezone.now()
         item.save(update_fields = ["is_read", "read_at"])
+        UnreadCounter.adjust(request.user.id, messages=-1)
     return render(request, "accounts/messages_detail.html", {"item":item})
 
 @staff_member_required
@@ -2544,7 +2692,12 @@ def notifications(request):
 
 @login_required
 def notification_settings(request):
-    prefs = DriverNotificationPreference.for_user(request.user)
+    # an editable copy; the shared read-only instance from for_user must not
+    # be bound to a form. The row is only created when the form is saved.
+    prefs = (
+        DriverNotificationPreference.objects.filter(user=request.user).first()
+        or DriverNotificationPreference(user=request.user)
+    )
 
     if request.method == "POST":
         form = NotificationPreferenceForm(request.POST, request.FILES, instance=prefs)
@@ -2572,7 +2725,14 @@ def notification_settings(request):
 @require_POST
 def notifications_clear(request):
     Notification.objects.filter(user=request.user).delete()
-    MessageRecipient.objects.filter(user=request.user).delete()
+    MessageRecipient.objects.filter(user=request.user, message__is_broadcast=False).delete()
+    # broadcasts stay deleted through hidden rows
+    MessageRecipient.objects.filter(user=request.user, message__is_broadcast=True).update(is_deleted=True)
+    MessageRecipient.objects.bulk_create([
+        MessageRecipient(message=m, user=request.user, is_read=True, is_deleted=True)
+        for m in Message.unopened_broadcasts_for(request.user)
+    ], ignore_conflicts=True)
+    UnreadCounter.recompute(request.user.id)
     messages.success(request, "All notifications & messages cleared.")
     return redirect("accounts:notifications_feed")
 
@@ -2581,6 +2741,8 @@ def notifications_clear(request):
 def notification_delete(request, pk: int):
     notif = get_object_or_404(Notification, pk=pk, user=request.user)
     notif.delete()
+    if not notif.read:
+        UnreadCounter.adjust(request.user.id, notifications=-1)
     messages.success(request, "Notification deleted.")
     return redirect(request.META.get("HTTP_REFERER", "accounts:notifications"))
 
@@ -2589,7 +2751,10 @@ def notification_delete(request, pk: int):
 def notifications_bulk_delete(request):
     ids = request.POST.getlist("ids")
     if ids:
-        Notification.objects.filter(user=request.user, pk__in=ids).delete()
+        qs = Notification.objects.filter(user=request.user, pk__in=ids)
+        unread = qs.filter(read=False).count()
+        qs.delete()
+        UnreadCounter.adjust(request.user.id, notifications=-unread)
         messages.success(request, "Selected notifications deleted.")
     else:
         messages.info(request, "No notifications selected for deletion.")
@@ -2644,6 +2809,70 @@ def notifications_history(request):
     return render(request, "accounts/notification_history.html", context)
 
 
+POINTS_HISTORY_PAGE_SIZE = 50
+
+
+LEDGER_HISTORY_FIELDS = ("id", "user_id", "delta", "reason", "balance_after", "created_at", "expires_at")
+
+
+def _ledger_history(user, start, end, *q):
+    """A driver's ledger rows in [start, end], hot table plus archives, newest first."""
+    return history_rows(
+        "points_ledger", start, end, *q,
+        fields=LEDGER_HISTORY_FIELDS, order_by=("-created_at", "-id"), user_id=user.id,
+    )
+
+
+def _date_range(request):
+    """(date_from, date_to, start, end) from a history page's `date_from`/`date_to` filters."""
+    from django.utils.dateparse import parse_date
+
+    date_from_str = request.GET.get("date_from", "").strip()
+    date_to_str = request.GET.get("date_to", "").strip()
+    start = end = None
+    d = parse_date(date_from_str) if date_from_str else None
+    if d:
+        start = timezone.make_aware(datetime.datetime.combine(d, datetime.time.min))
+    d = parse_date(date_to_str) if date_to_str else None
+    if d:
+        end = timezone.make_aware(datetime.datetime.combine(d, datetime.time.max))
+    return date_from_str, date_to_str, start, end
+
+
+def _ledger_balance(user, start, end):
+    """Balance at the end of the range: balance_after of its newest row."""
+    if start is None and end is None:
+        # archiving always leaves a driver's newest row hot
+        newest = PointsLedger.objects.filter(user=user).order_by("-id").values("balance_after")[:1]
+    else:
+        newest = _ledger_history(user, start, end)[:1]
+    return newest[0]["balance_after"] if newest else 0
+
+
+def _ledger_keyset_page(user, start, end, cursor, page_size=POINTS_HISTORY_PAGE_SIZE):
+    """
+    Newest-first page of ledger rows after an opaque "<created_at>_<id>" cursor.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    from django.utils.dateparse import parse_datetime
+
+    q = ()
+    if cursor:
+        ts_str, _, id_str = cursor.rpartition("_")
+        ts = parse_datetime(ts_str)
+        if ts and id_str.isdigit():
+            q = (Q(created_at__lt=ts) | Q(created_at=ts, id__lt=int(id_str)),)
+
+    # unsaved instances so the template keeps its model helpers (days_until_expiry)
+    page = [PointsLedger(**row) for row in _ledger_history(user, start, end, *q)[:page_size + 1]]
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        last = page[-1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+    return page, next_cursor
+
+
 @login_required
 def points_history(request):
     # Only allow drivers (not sponsors or admins)
@@ -2655,47 +2884,25 @@ def points_history(request):
         messages.error(request, "Points history is only available to drivers.")
         return redirect("accounts:profile")
     
-    from django.utils.dateparse import parse_date
     from datetime import timedelta
     
-    rows = PointsLedger.objects.filter(user=request.user)
-    
-    # Date filtering
-    date_from_str = request.GET.get("date_from", "").strip()
-    date_to_str = request.GET.get("date_to", "").strip()
-    
-    if date_from_str:
-        d = parse_date(date_from_str)
-        if d:
-            start_dt = timezone.make_aware(datetime.datetime.combine(d, datetime.time.min))
-            rows = rows.filter(created_at__gte=start_dt)
+    # Date filtering; archived months are read alongside the hot table
+    date_from_str, date_to_str, start, end = _date_range(request)
     
-    if date_to_str:
-        d = parse_date(date_to_str)
-        if d:
-            end_dt = timezone.make_aware(datetime.datetime.combine(d, datetime.time.max))
-            rows = rows.filter(created_at__lte=end_dt)
+    balance = _ledger_balance(request.user, start, end)
+    cursor = request.GET.get("before", "").strip()
+    rows, next_cursor = _ledger_keyset_page(request.user, start, end, cursor)
     
-    rows = rows.order_by("-created_at")
-    balance = rows.aggregate(s=Sum("delta"))["s"] or 0
-    
-    # Calculate expiring points summary (from ALL points, not just filtered)
+    # Expiry summary (from ALL points, not just filtered), read off the lots table
     now = timezone.now()
     expiring_soon_threshold = now + timedelta(days=30)  # Points expiring in next 30 days
-    
-    # Get all points for this user to calculate expiration summary
-    all_points = PointsLedger.objects.filter(user=request.user)
-    
-    # Get points that will expire soon (only positive deltas that haven't expired)
-    expiring_entries = [
-        r for r in all_points 
-        if r.delta > 0 and r.expires_at and r.expires_at > now and r.expires_at <= expiring_soon_threshold
-    ]
-    expiring_points = sum(r.delta for r in expiring_entries)
-    
-    # Get expired points (only positive deltas)
-    expired_entries = [r for r in all_points if r.delta > 0 and r.expires_at and r.expires_at <= now]
-    expired_points = sum(r.delta for r in expired_entries)
+    expiry = PointsLot.objects.filter(user=request.user, expires_at__isnull=False).aggregate(
+        expiring=Sum("remaining", filter=Q(expires_at__gt=now, expires_at__lte=expiring_soon_threshold)),
+        swept=Sum("expired"),
+        due=Sum("remaining", filter=Q(expires_at__lte=now)),
+    )
+    expiring_points = expiry["expiring"] or 0
+    expired_points = (expiry["swept"] or 0) + (expiry["due"] or 0)
     
     context = {
         "rows": rows,
@@ -2703,12 +2910,48 @@ def points_history(request):
         "date_from": date_from_str,
         "date_to": date_to_str,
         "expiring_soon_points": expiring_points,
-        "expiring_entries": expiring_entries[:10],  # Show top 10 expiring soon
         "expired_points": expired_points,
         "now": now,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
     }
     return render(request, "accounts/points_history.html", context)
 
+class _EchoBuffer:
+    """File-like object csv.writer can write to; hands each line straight back."""
+    def write(self, value):
+        return value
+
+
+POINTS_CSV_CHUNK_SIZE = 2000
+
+
+def _stream_points_csv(rows):
+    """
+    Yield CSV lines for newest-first ledger rows. The total, the balance at
+    the end of the range, is picked up on the way through: it's the first
+    row's balance_after.
+    """
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(["Date", "Change", "Reason", "Balance After"])
+
+    balance = None
+    for row in rows.iterator(chunk_size=POINTS_CSV_CHUNK_SIZE):
+        if balance is None:
+            balance = row["balance_after"]
+        delta = row["delta"]
+        yield writer.writerow([
+            row["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
+            f"{'+' if delta >= 0 else ''}{delta}",
+            row["reason"] or "",
+            row["balance_after"],
+        ])
+
+    # Add summary row
+    yield writer.writerow([])
+    yield writer.writerow(["Total Balance", "", "", balance or 0])
+
+
 @login_required
 def points_history_download(request):
     """Download points history as CSV or PDF."""
@@ -2720,76 +2963,46 @@ def points_history_download(request):
     if not is_driver or is_sponsor or is_admin:
         return HttpResponse("Points history download is only available to drivers.", status=403)
     
-    from django.utils.dateparse import parse_date
-    
     format_type = request.GET.get("format", "csv").lower()
-    rows = PointsLedger.objects.filter(user=request.user)
     
     # Date filtering (same as points_history view)
-    date_from_str = request.GET.get("date_from", "").strip()
-    date_to_str = request.GET.get("date_to", "").strip()
-    
-    if date_from_str:
-        d = parse_date(date_from_str)
-        if d:
-            start_dt = timezone.make_aware(datetime.datetime.combine(d, datetime.time.min))
-            rows = rows.filter(created_at__gte=start_dt)
-    
-    if date_to_str:
-        d = parse_date(date_to_str)
-        if d:
-            end_dt = timezone.make_aware(datetime.datetime.combine(d, datetime.time.max))
-            rows = rows.filter(created_at__lte=end_dt)
-    
-    rows = rows.order_by("-created_at")
-    balance = rows.aggregate(s=Sum("delta"))["s"] or 0
+    date_from_str, date_to_str, start, end = _date_range(request)
+    rows = _ledger_history(request.user, start, end)
     
     if format_type == "csv":
-        # Generate CSV
-        response = HttpResponse(content_type="text/csv")
+        # Stream the CSV so worker memory stays flat however long the history is
         filename = f"points_history_{request.user.username}_{timezone.now().strftime('%Y%m%d')}.csv"
+        response = StreamingHttpResponse(_stream_points_csv(rows), content_type="text/csv")
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        
-        writer = csv.writer(response)
-        writer.writerow(["Date", "Change", "Reason", "Balance After"])
-        
-        for row in rows:
-            writer.writerow([
-                row.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                f"{'+' if row.delta >= 0 else ''}{row.delta}",
-                row.reason or "",
-                row.balance_after,
-            ])
-        
-        # Add summary row
-        writer.writerow([])
-        writer.writerow(["Total Balance", "", "", balance])
-        
         return response
     
     elif format_type == "pdf" and PDF_AVAILABLE:
-        # Generate PDF
-        html = render_to_string(
-            "accounts/points_history_pdf.html",
-            {
-                "rows": rows,
-                "balance": balance,
-                "user": request.user,
-                "generated_at": timezone.now(),
-            },
+        from shop.pdf_service import pdf_service, pdf_download_response, requested_wait, FAILED
+
+        # The ledger is append-only, so its newest id is a watermark for the content
+        watermark = (
+            PointsLedger.objects.filter(user=request.user)
+            .order_by("-id").values_list("id", flat=True).first()
         )
-        
-        pdf_io = BytesIO()
-        result = pisa.CreatePDF(src=html, dest=pdf_io, encoding="UTF-8")
-        
-        if result.err:
+        key = pdf_service.content_key("points", request.user.pk, date_from_str, date_to_str, watermark)
+
+        def build_html():
+            return render_to_string(
+                "accounts/points_history_pdf.html",
+                {
+                    "rows": rows,
+                    "balance": _ledger_balance(request.user, start, end),
+                    "user": request.user,
+                    "generated_at": timezone.now(),
+                },
+            )
+
+        status, path = pdf_service.get_or_render("points", key, build_html, wait=requested_wait(request))
+        if status == FAILED:
             return HttpResponse("Error generating PDF", status=500)
-        
-        pdf = pdf_io.getvalue()
+
         filename = f"points_history_{request.user.username}_{timezone.now().strftime('%Y%m%d')}.pdf"
-        response = HttpResponse(pdf, content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+        return pdf_download_response(request, status, path, filename)
     
     elif format_type == "pdf" and not PDF_AVAILABLE:
         return HttpResponse("PDF generation is not available. Please use CSV format.", status=400)
@@ -3728,56 +3941,27 @@ def simple_password_reset(request):
 def chat_rooms_list(request):
     """Display all chat rooms available to the user."""
     user = request.user
-    chat_rooms = []
-    
-    # Get sponsors from approved sponsorship requests (same as Sponsorship Center)
-    from django.db.models import Q
-    approved_requests = SponsorshipRequest.objects.filter(
-        Q(from_user=user, status="approved") | Q(to_user=user, status="approved")
-    ).select_related("from_user", "to_user")
-    
-    # If user is a sponsor, show chat rooms for their drivers
-    if user.groups.filter(name="sponsor").exists():
-        # Get chat room for this sponsor
-        chat_room, created = ChatRoom.objects.get_or_create(
-            sponsor=user,
-            defaults={"name": f"{user.username}'s Team Chat"}
-        )
-        chat_rooms = [chat_room]
-    
-    # If user is a driver, find chat rooms based on approved sponsorships
-    elif hasattr(user, "driver_profile"):
-        driver_sponsors = []
-        for req in approved_requests:
-            # Get the sponsor (the other user who is a sponsor)
-            if req.from_user == user:
-                sponsor = req.to_user
-            else:
-                sponsor = req.from_user
-            
-            if sponsor.groups.filter(name="sponsor").exists():
-                driver_sponsors.append(sponsor)
-        
-        # Get or create chat room for each sponsor
-        for sponsor in driver_sponsors:
-            chat_room, created = ChatRoom.objects.get_or_create(
-                sponsor=sponsor,
-                defaults={"name": f"{sponsor.username}'s Team Chat"}
-            )
-            chat_rooms.append(chat_room)
-    
-    # Annotate each chat room with latest message and unread count
+    is_sponsor = user.groups.filter(name="sponsor").exists()
+
+    # Rooms are provisioned when a sponsorship is approved; drivers see the
+    # rooms of the sponsors they're approved with
+    if is_sponsor or hasattr(user, "driver_profile"):
+        chat_rooms = list(ChatRoom.list_for(user, is_sponsor))
+    else:
+        chat_rooms = []
+
+    # participant sets are cached per room; one query names them all
+    participant_ids = {room.id: room.participant_ids() for room in chat_rooms}
+    users_by_id = User.objects.in_bulk(set().union(*participant_ids.values()))
     for room in chat_rooms:
-        room.latest_message = room.get_latest_message()
-        room.unread_count = room.messages.exclude(sender=user).exclude(
-            read_by__user=user,
-            read_by__is_read=True
-        ).count()
-        room.participants_list = room.get_participants()
+        room.participants_list = sorted(
+            (users_by_id[i] for i in participant_ids[room.id] if i in users_by_id),
+            key=lambda u: (u.pk == room.sponsor_id, u.username),
+        )
     
     context = {
         "chat_rooms": chat_rooms,
-        "is_sponsor": user.groups.filter(name="sponsor").exists(),
+        "is_sponsor": is_sponsor,
     }
     
     return render(request, "accounts/chat_rooms_list.html", context)
@@ -3795,18 +3979,17 @@ def chat_room_detail(request, room_id):
         return redirect("accounts:chat_rooms_list")
     
     # Check if user has access to this chat room
-    participants = chat_room.get_participants()
-    if user not in participants:
+    if not chat_room.has_participant(user):
         messages.error(request, "You don't have access to this chat room.")
         return redirect("accounts:chat_rooms_list")
+    participants = chat_room.get_participants()
     
-    # Get all messages in the chat room
-    chat_messages = chat_room.messages.select_related("sender").all()
+    # Newest page only; older messages load on demand (get_chat_messages?before=)
+    chat_messages, has_older = _chat_page(chat_room, before=None)
     
-    # Mark all messages as read for this user
-    for message in chat_messages:
-        if message.sender != user:
-            message.mark_as_read(user)
+    # Everything up to the newest message is now read for this user
+    if chat_messages:
+        ChatReadCursor.advance(chat_room.id, user.id, chat_messages[-1].id)
     
     # Handle new message submission
     if request.method == "POST":
@@ -3827,6 +4010,7 @@ def chat_room_detail(request, room_id):
     context = {
         "chat_room": chat_room,
         "chat_messages": chat_messages,
+        "has_older": has_older,
         "participants": participants,
         "is_sponsor": user.groups.filter(name="sponsor").exists(),
     }
@@ -3834,9 +4018,32 @@ def chat_room_detail(request, room_id):
     return render(request, "accounts/chat_room_detail.html", context)
 
 
+CHAT_PAGE_SIZE = 50
+
+
+def _chat_page(chat_room, before=None, after=None, page_size=CHAT_PAGE_SIZE):
+    """
+    One keyset page of a room's messages, oldest first, and whether more
+    remain in that direction. `after` reads forward from a cursor (new
+    messages); otherwise it's the newest page, or the one ending just
+    before `before`. Uses the (chat_room, id) index either way.
+    """
+    qs = chat_room.messages.select_related("sender", "sender__driver_profile")
+    if after is not None:
+        rows = list(qs.filter(id__gt=after).order_by("id")[:page_size + 1])
+        return rows[:page_size], len(rows) > page_size
+    if before is not None:
+        qs = qs.filter(id__lt=before)
+    rows = list(qs.order_by("-id")[:page_size + 1])
+    return rows[:page_size][::-1], len(rows) > page_size
+
+
 @login_required
 def get_chat_messages(request, room_id):
-    """AJAX endpoint to get new messages for a chat room."""
+    """
+    AJAX endpoint for a room's messages by id cursor: `?after=<id>` for
+    new ones, `?before=<id>` for the page of older ones ("load older").
+    """
     from django.http import JsonResponse
     
     user = request.user
@@ -3847,36 +4054,154 @@ def get_chat_messages(request, room_id):
         return JsonResponse({"error": "Chat room not found"}, status=404)
     
     # Check if user has access
-    participants = chat_room.get_participants()
-    if user not in participants:
+    if not chat_room.has_participant(user):
         return JsonResponse({"error": "Access denied"}, status=403)
     
-    # Get messages since a certain time (if provided)
-    since = request.GET.get("since")
-    messages_qs = chat_room.messages.select_related("sender")
+    after = _int_param(request, "after")
+    before = _int_param(request, "before")
+    rows, has_more = _chat_page(chat_room, before=before, after=after)
     
-    if since:
-        try:
-            since_dt = timezone.datetime.fromisoformat(since.replace('Z', '+00:00'))
-            messages_qs = messages_qs.filter(created_at__gt=since_dt)
-        except (ValueError, AttributeError):
-            pass
+    # older pages were already read; only reading forward moves the cursor
+    if rows and before is None:
+        ChatReadCursor.advance(chat_room.id, user.id, rows[-1].id)
     
-    # Mark new messages as read
-    for message in messages_qs:
-        if message.sender != user:
-            message.mark_as_read(user)
+    messages_data = [_chat_message_payload(msg, user.id) for msg in rows]
     
-    messages_data = [{
+    return JsonResponse({"messages": messages_data, "has_more": has_more})
+
+
+def _chat_message_payload(msg, user_id):
+    return {
         "id": msg.id,
         "sender": msg.sender.username,
         "sender_name": msg.sender.get_full_name() or msg.sender.username,
         "message": msg.message,
         "created_at": msg.created_at.isoformat(),
-        "is_own": msg.sender == user,
-    } for msg in messages_qs]
-    
-    return JsonResponse({"messages": messages_data})
+        "is_own": msg.sender_id == user_id,
+    }
+
+
+def _events_batch(user_id, room_id, chat_after, notif_after, limit=100):
+    """
+    New chat messages (advancing `user_id`'s read cursor) and
+    notifications past the stream's cursors.
+    """
+    chats = []
+    if room_id:
+        rows = list(
+            ChatMessage.objects.filter(chat_room_id=room_id, id__gt=chat_after)
+            .select_related("sender").order_by("id")[:limit]
+        )
+        if rows:
+            ChatReadCursor.advance(room_id, user_id, rows[-1].id)
+        chats = [_chat_message_payload(m, user_id) for m in rows]
+    notifs = list(
+        Notification.objects.filter(user_id=user_id, id__gt=notif_after)
+        .order_by("id").values("id", "kind", "title", "body", "url")[:limit]
+    )
+    return chats, notifs
+
+
+def _events_start(user, room_id, last_event_id, chat_after, notif_after):
+    """Access check and starting cursors for events_stream."""
+    if room_id:
+        room = ChatRoom.objects.filter(id=room_id).first()
+        if room is None or not room.has_participant(user):
+            return None
+    if last_event_id:
+        # our event ids are "<chat cursor>:<notification cursor>"
+        try:
+            chat_after, notif_after = (int(x) for x in last_event_id.split(":"))
+        except ValueError:
+            pass
+    if chat_after is None:
+        chat_after = (ChatMessage.objects.filter(chat_room_id=room_id).order_by("-id")
+                      .values_list("id", flat=True).first() or 0) if room_id else 0
+    if notif_after is None:
+        notif_after = (Notification.objects.filter(user=user).order_by("-id")
+                       .values_list("id", flat=True).first() or 0)
+    return chat_after, notif_after
+
+
+def _int_param(request, name):
+    value = request.GET.get(name, "")
+    return int(value) if value.isdigit() else None
+
+
+@login_required
+async def events_stream(request):
+    """
+    Server-sent events for the current user: new Notification rows, plus
+    ChatMessage rows for `?room=<id>`. Wake-ups come from accounts.events;
+    idle connections only send heartbeats (and the optional DB fallback
+    poll). Streams end after SSE_MAX_STREAM_SECONDS and the browser's
+    EventSource reconnects with Last-Event-ID.
+
+    Under WSGI a stream would be buffered and hold a worker for its whole
+    lifetime, so non-ASGI requests get 204 No Content, which tells
+    EventSource not to reconnect; the chat page then polls
+    get_chat_messages instead.
+    """
+    import asyncio
+    import json
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from .events import hub, room_topic, user_topic
+
+    user = await request.auser()
+    room_id = _int_param(request, "room")
+    start = await sync_to_async(_events_start)(
+        user, room_id, request.headers.get("Last-Event-ID", ""),
+        _int_param(request, "after"), _int_param(request, "notif_after"),
+    )
+    if start is None:
+        return JsonResponse({"error": "Access denied"}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    heartbeat = getattr(settings, "SSE_HEARTBEAT_SECONDS", 20)
+    poll = getattr(settings, "SSE_DB_POLL_SECONDS", 15)
+    max_seconds = getattr(settings, "SSE_MAX_STREAM_SECONDS", 300)
+    fetch = sync_to_async(_events_batch)
+
+    async def stream():
+        chat_after, notif_after = start
+        topics = [user_topic(user.id)] + ([room_topic(room_id)] if room_id else [])
+        sub = hub.subscribe(topics)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        try:
+            yield "retry: 3000\n\n"
+            check_db = True
+            while loop.time() < deadline:
+                if check_db:
+                    sub.event.clear()
+                    chats, notifs = await fetch(user.id, room_id, chat_after, notif_after)
+                    if chats:
+                        chat_after = chats[-1]["id"]
+                    if notifs:
+                        notif_after = notifs[-1]["id"]
+                    event_id = f"{chat_after}:{notif_after}"
+                    for payload in chats:
+                        yield f"id: {event_id}\nevent: chat\ndata: {json.dumps(payload)}\n\n"
+                    for payload in notifs:
+                        yield f"id: {event_id}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+                    next_poll = loop.time() + poll if poll else deadline
+                wait = max(0.0, min(heartbeat, next_poll - loop.time(), deadline - loop.time()))
+                try:
+                    await asyncio.wait_for(sub.event.wait(), timeout=wait)
+                    check_db = True
+                except asyncio.TimeoutError:
+                    check_db = loop.time() >= next_poll
+                    if not check_db:
+                        yield ": ping\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @login_required
@@ -3895,8 +4220,7 @@ def send_chat_message(request, room_id):
         return JsonResponse({"error": "Chat room not found"}, status=404)
     
     # Check if user has access
-    participants = chat_room.get_participants()
-    if user not in participants:
+    if not chat_room.has_participant(user):
         return JsonResponse({"error": "Access denied"}, status=403)
     
     message_text = request.POST.get("message", "").strip()
@@ -4335,6 +4659,7 @@ def admin_manage_driver_sponsors(request, user_id):
                     Q(from_user=driver, to_user=sponsor) | Q(from_user=sponsor, to_user=driver)
                 ).first()
                 
+                ChatRoom.ensure_for(sponsor)
                 if existing_request:
                     # Update existing request to approved
                     if existing_request.status != "approved":
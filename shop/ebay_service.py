@@ -1,15 +1,129 @@
 import base64
+import hashlib
+import json
 import logging
+import threading
+import time
 from typing import Any, Dict, Optional, List
 
 import requests
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connections
+from requests.adapters import HTTPAdapter
 
 from .utils import get_points_per_usd
 
 logger = logging.getLogger(__name__)
 
+SEARCH_CACHE_KEY = "ebay.search:v1:{env}:{digest}"
+SEARCH_STATS_CACHE_KEY = "ebay.search.stats:v1:{name}"
+SEARCH_STATS = ("hit", "stale", "miss", "negative", "error", "rejected")
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class EbayError(Exception):
+    """An eBay API call failed (after retries)."""
+
+
+class EbayUnavailable(EbayError):
+    """The circuit breaker is open: eBay calls fail fast until it half-opens."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker whose state lives in the shared cache, so
+    every worker trips and recovers together.
+
+    closed:    calls go through; `threshold` outage failures in a row open it.
+    open:      calls fail fast for `cooldown` seconds.
+    half-open: after the cooldown one caller (claimed with cache.add) probes;
+               success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.prefix = f"ebay.breaker:v1:{name}"
+
+    @property
+    def threshold(self) -> int:
+        return getattr(settings, "EBAY_BREAKER_FAILURE_THRESHOLD", 5)
+
+    @property
+    def cooldown(self) -> int:
+        return getattr(settings, "EBAY_BREAKER_COOLDOWN_SECONDS", 30)
+
+    def _key(self, part: str) -> str:
+        return f"{self.prefix}:{part}"
+
+    def state(self) -> str:
+        open_until = cache.get(self._key("open_until"))
+        if open_until is None:
+            return "closed"
+        return "open" if time.time() < open_until else "half-open"
+
+    def allow(self) -> bool:
+        open_until = cache.get(self._key("open_until"))
+        if open_until is None:
+            return True
+        if time.time() < open_until:
+            return False
+        # half-open: a single probe; it holds the slot for at most one cooldown
+        return cache.add(self._key("probe"), 1, self.cooldown)
+
+    def record_success(self) -> None:
+        cache.delete_many([self._key("failures"), self._key("open_until"), self._key("probe")])
+
+    def record_failure(self) -> None:
+        key = self._key("failures")
+        cache.add(key, 0, None)
+        try:
+            failures = cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+            failures = 1
+        if failures >= self.threshold or cache.get(self._key("open_until")) is not None:
+            logger.warning("eBay circuit breaker open for %ss after %s failures", self.cooldown, failures)
+            # keep the marker past the cooldown so the next call knows to probe
+            cache.set(self._key("open_until"), time.time() + self.cooldown, None)
+            cache.delete_many([key, self._key("probe")])
+
+
+def _is_outage(exc: Exception) -> bool:
+    """Connection errors, timeouts, 429 and 5xx count against the breaker; other 4xx don't."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+def _refresh_in_background(fn) -> None:
+    def run():
+        try:
+            fn()
+        finally:
+            # the thread's own DB connections (cache/ORM lookups) would
+            # otherwise stay open until the server's wait_timeout
+            connections.close_all()
+
+    threading.Thread(target=run, name="ebay-search-refresh", daemon=True).start()
+
+
+def _bump_stat(name: str) -> None:
+    key = SEARCH_STATS_CACHE_KEY.format(name=name)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted between add and incr
+        cache.set(key, 1, None)
+
+
+def search_cache_stats() -> Dict[str, int]:
+    """Hit/stale/miss/negative/error counters for EbayService.search_products."""
+    keys = {name: SEARCH_STATS_CACHE_KEY.format(name=name) for name in SEARCH_STATS}
+    values = cache.get_many(list(keys.values()))
+    return {name: int(values.get(key, 0)) for name, key in keys.items()}
+
 
 class EbayService:
     """Service for interacting with the eBay Browse API."""
@@ -29,6 +143,123 @@ class EbayService:
             "ebay_access_token:sandbox" if self.is_sandbox else "ebay_access_token:prod"
         )
 
+        # (connect, read) seconds for every call
+        self.timeout = (
+            getattr(settings, "EBAY_HTTP_CONNECT_TIMEOUT", 3.05),
+            getattr(settings, "EBAY_HTTP_READ_TIMEOUT", 15),
+        )
+        # wall-clock budget for one call, retries and backoff included
+        self.deadline: float = getattr(settings, "EBAY_HTTP_DEADLINE_SECONDS", 20)
+        self.max_retries: int = getattr(settings, "EBAY_HTTP_MAX_RETRIES", 3)
+        self.backoff_factor: float = getattr(settings, "EBAY_HTTP_BACKOFF_FACTOR", 0.5)
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self.breaker = CircuitBreaker("sandbox" if self.is_sandbox else "prod")
+
+    # ------------------------- http ----------------------------
+
+    def _build_session(self) -> requests.Session:
+        # retries happen in _call, where they can be held to the deadline
+        adapter = HTTPAdapter(
+            pool_connections=2,  # api.ebay.com / api.sandbox.ebay.com
+            pool_maxsize=getattr(settings, "EBAY_HTTP_POOL_SIZE", 10),
+            max_retries=0,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    def _retry_delay(self, attempt: int, resp: Optional[requests.Response]) -> float:
+        """Exponential backoff, stretched to a numeric Retry-After when eBay sends one."""
+        delay = self.backoff_factor * (2 ** attempt)
+        retry_after = resp.headers.get("Retry-After", "") if resp is not None else ""
+        if retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        return delay
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send with retries on connection errors, 429 and 5xx; read timeouts are
+        not retried. Every attempt, and any backoff or Retry-After wait, has to
+        fit inside `self.deadline` seconds, otherwise the last error is raised.
+        """
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+            resp, error = None, None
+            try:
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.ConnectionError as e:  # includes ConnectTimeout, not ReadTimeout
+                error = e
+            if error is None and resp.status_code not in RETRY_STATUSES:
+                return resp
+            if attempt < self.max_retries:
+                # the token POST only mints a client-credentials token, so it's safe to repeat
+                delay = self._retry_delay(attempt, resp)
+                if time.monotonic() + delay < deadline:
+                    logger.info("Retrying eBay %s %s in %.1fs (%s)", method, url, delay, error or resp.status_code)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+            if error is not None:
+                raise error
+            return resp
+
+    def _call(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        One HTTP call through the shared session and the circuit breaker.
+        Raises EbayUnavailable without calling out while the breaker is open.
+        """
+        if not self.breaker.allow():
+            raise EbayUnavailable("eBay is temporarily unavailable; showing local catalog items only.")
+        try:
+            resp = self._send(method, url, **kwargs)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            if _is_outage(e):
+                self.breaker.record_failure()
+            else:
+                # the API answered; only the request was bad
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return resp
+
+    @property
+    def session(self) -> requests.Session:
+        """Shared keep-alive session; connections are reused across requests and threads."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Per-host connection pool counters for this process: connections
+        opened, requests sent, and idle connections ready for reuse.
+        """
+        stats = {}
+        if self._session is None:
+            return stats
+        adapter = self._session.get_adapter(self.base_url)
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            # the queue is pre-filled with None placeholders for unopened slots
+            slots = list(pool.pool.queue) if pool.pool is not None else []
+            stats[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle": sum(1 for conn in slots if conn is not None),
+                "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+            }
+        return stats
+
     # ------------------------- helpers -------------------------
 
     def _get_base64_auth(self) -> str:
@@ -76,8 +307,7 @@ class EbayService:
         }
 
         try:
-            resp = requests.post(url, headers=headers, data=data, timeout=15)
-            resp.raise_for_status()
+            resp = self._call("POST", url, headers=headers, data=data)
             payload = resp.json()
             access_token = payload["access_token"]
             expires_in = int(payload.get("expires_in", 7200))
@@ -154,21 +384,8 @@ class EbayService:
 
     # ------------------------- browse --------------------------
 
-    def search_products(
-        self,
-        query: str,
-        limit: int = 20,
-        offset: int = 0,
-        category_ids: Optional[Any] = None,
-    ) -> Dict[str, Any]:
-        """
-        Call Browse API: GET /buy/browse/v1/item_summary/search
-        Returns the raw JSON; caller formats it.
-        """
-        token = self.get_access_token()
-        url = f"{self.base_url}/buy/browse/v1/item_summary/search"
-
-        # Build category_ids
+    @staticmethod
+    def _category_param(category_ids: Optional[Any]) -> Optional[str]:
         cat_param = None
         if category_ids:
             if isinstance(category_ids, (list, tuple, set)):
@@ -183,40 +400,116 @@ class EbayService:
                 c = str(category_ids).strip()
                 if c and c.lower() not in {"all", "0"}:
                     cat_param = c
+        if cat_param:
+            # same set of categories, same cache entry
+            cat_param = ",".join(sorted(set(cat_param.split(","))))
+        return cat_param
+
+    def _search_cache_key(self, params: Dict[str, Any]) -> str:
+        raw = json.dumps([self.marketplace, params], sort_keys=True)
+        return SEARCH_CACHE_KEY.format(
+            env="sandbox" if self.is_sandbox else "prod",
+            digest=hashlib.sha256(raw.encode("utf-8")).hexdigest(),
+        )
 
+    def _fetch_search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """One Browse API search; raises requests.RequestException on failure."""
+        token = self.get_access_token()
+        url = f"{self.base_url}/buy/browse/v1/item_summary/search"
+        # If sandbox Browse returns 404/400 for odd inputs, surface the error
+        resp = self._call("GET", url, headers=self._bearer_headers(token), params=params)
+        data = resp.json()
+
+        # If sandbox returns 0 results, provide demo items so UI isn't blank
+        if self.is_sandbox and int(data.get("total", 0)) == 0:
+            logger.info("Sandbox Browse returned 0 results; serving demo items.")
+            return self._sandbox_demo_response(limit=params["limit"], offset=params["offset"])
+
+        # make sure keys exist
+        if "itemSummaries" not in data:
+            data.setdefault("itemSummaries", [])
+            data.setdefault("total", 0)
+        return data
+
+    def _store_search(self, key: str, data: Dict[str, Any]) -> None:
+        ttl = getattr(settings, "EBAY_SEARCH_CACHE_SECONDS", 300)
+        stale = getattr(settings, "EBAY_SEARCH_STALE_SECONDS", 3600)
+        cache.set(key, {"data": data, "fresh_until": time.time() + ttl}, ttl + stale)
+
+    def search_products(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        category_ids: Optional[Any] = None,
+    ) -> Dict[str, Any]:
+        """
+        Call Browse API: GET /buy/browse/v1/item_summary/search
+        Returns the raw JSON; caller formats it.
+
+        Responses are shared through the cache, keyed by marketplace,
+        normalized query, categories, limit and offset. Fresh for
+        EBAY_SEARCH_CACHE_SECONDS; for EBAY_SEARCH_STALE_SECONDS after that
+        the stale copy is served while one background refresh runs.
+        A search that fails is remembered for EBAY_SEARCH_FAILURE_CACHE_SECONDS
+        (a negative entry), so repeats raise EbayError without calling eBay.
+        With the circuit breaker open, uncached searches raise
+        EbayUnavailable at once and callers show their local catalog.
+        """
         params = {
-            "q": query,
+            "q": " ".join((query or "").split()).lower(),
             "limit": min(int(limit or 20), 200),
             "offset": max(int(offset or 0), 0),
         }
+        cat_param = self._category_param(category_ids)
         if cat_param:
             params["category_ids"] = cat_param
 
-        headers = self._bearer_headers(token)
+        key = self._search_cache_key(params)
+        entry = cache.get(key)
+        if entry is not None:
+            if entry["fresh_until"] > time.time():
+                _bump_stat("hit")
+                return entry["data"]
+            _bump_stat("stale")
+            # one refresher per key; everyone else keeps serving the stale copy
+            if cache.add(f"{key}:refreshing", 1, 60):
+                def refresh():
+                    try:
+                        self._store_search(key, self._fetch_search(params))
+                    except Exception as e:
+                        logger.warning("Background eBay search refresh failed: %s (params=%s)", e, params)
+                    finally:
+                        cache.delete(f"{key}:refreshing")
+                _refresh_in_background(refresh)
+            return entry["data"]
+
+        failed_key = f"{key}:failed"
+        failure = cache.get(failed_key)
+        if failure is not None:
+            _bump_stat("negative")
+            if self.is_sandbox:
+                return self._sandbox_demo_response(limit=limit, offset=offset)
+            raise EbayError(f"Failed to search eBay products: {failure}")
 
+        _bump_stat("miss")
         try:
-            resp = requests.get(url, headers=headers, params=params, timeout=20)
-            # If sandbox Browse returns 404/400 for odd inputs, surface the error
-            resp.raise_for_status()
-            data = resp.json()
-
-            # If sandbox returns 0 results, provide demo items so UI isn't blank
-            if self.is_sandbox and int(data.get("total", 0)) == 0:
-                logger.info("Sandbox Browse returned 0 results; serving demo items.")
+            data = self._fetch_search(params)
+        except EbayUnavailable:
+            _bump_stat("rejected")
+            if self.is_sandbox:
                 return self._sandbox_demo_response(limit=limit, offset=offset)
-
-            # make sure keys exist
-            if "itemSummaries" not in data:
-                data.setdefault("itemSummaries", [])
-                data.setdefault("total", 0)
-            return data
-
+            raise
         except requests.RequestException as e:
+            _bump_stat("error")
             logger.error("Error searching products: %s (params=%s)", e, params, exc_info=True)
+            cache.set(failed_key, str(e), getattr(settings, "EBAY_SEARCH_FAILURE_CACHE_SECONDS", 15))
             # As a last resort in sandbox, fall back to demo items instead of crashing
             if self.is_sandbox:
                 return self._sandbox_demo_response(limit=limit, offset=offset)
-            raise Exception(f"Failed to search eBay products: {e}")
+            raise EbayError(f"Failed to search eBay products: {e}")
+        self._store_search(key, data)
+        return data
 
     def get_product_details(self, item_id: str) -> Dict[str, Any]:
         """GET /buy/browse/v1/item/{item_id}"""
@@ -225,12 +518,11 @@ class EbayService:
         headers = self._bearer_headers(token)
 
         try:
-            resp = requests.get(url, headers=headers, timeout=15)
-            resp.raise_for_status()
+            resp = self._call("GET", url, headers=headers)
             return resp.json()
         except requests.RequestException as e:
             logger.error("Error getting product details: %s", e, exc_info=True)
-            raise Exception(f"Failed to get product details: {e}")
+            raise EbayError(f"Failed to get product details: {e}")
 
     # ------------------------- formatting ----------------------
 
@@ -1,12 +1,14 @@
+import time
+
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
-from shop.models import Order  
-from shop.utils import order_is_delayed
-from accounts.notifications import on_order_delayed
+from shop.utils import delayed_orders
+from accounts.models import AlertState
+from accounts.notifications import notify_orders_delayed_bulk
 
-TERMINAL = {"delivered", "cancelled"}
 
 class Command(BaseCommand):
     help = "Scan open orders and send 'Order Delayed' alerts where applicable."
@@ -14,29 +16,45 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--grace-hours", type=int, default=24,
                             help="Extra grace hours beyond promised ship-by.")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Delayed orders alerted per transaction.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count orders that would be alerted without writing anything.")
 
     def handle(self, *args, **opts):
         grace = opts["grace_hours"]
+        batch_size = max(1, opts["batch_size"])
         now = timezone.now()
-
-        # broad filter: orders not in terminal state (if you have a status field)
-        qs = Order.objects.all()
-        if hasattr(Order, "status"):
-            qs = qs.exclude(status__in=TERMINAL)
-
-        count_scanned = 0
+        started = time.monotonic()
+
+        # delayed by deadline arithmetic, minus orders already alerted
+        already_alerted = AlertState.objects.filter(
+            user_id=OuterRef("driver_id"),
+            alert_type=AlertState.ORDER_DELAYED,
+            subject_id=OuterRef("id"),
+        )
+        qs = delayed_orders(now=now, grace_hours=grace).filter(~Exists(already_alerted))
+
+        if opts["dry_run"]:
+            pending = qs.count()
+            self.stdout.write(self.style.SUCCESS(
+                f"{pending} delayed orders would be alerted ({time.monotonic() - started:.2f}s)."
+            ))
+            return
+
+        count_pending = 0
         count_alerted = 0
-
-        for order in qs.select_related("driver"):
-            count_scanned += 1
-            try:
-                if order.driver and order_is_delayed(order, now=now, grace_hours=grace):
-                    on_order_delayed(order)
-                    count_alerted += 1
-            except Exception as exc:
-                # don't explode the whole run on one bad row
-                self.stderr.write(f"Order {getattr(order, 'id', '?')}: {exc}")
+        last_id = 0
+        while True:
+            batch = list(qs.filter(id__gt=last_id).order_by("id").values_list("id", "driver_id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            with transaction.atomic():
+                count_alerted += notify_orders_delayed_bulk(batch, now=now)
+            count_pending += len(batch)
 
         self.stdout.write(self.style.SUCCESS(
-            f"Checked {count_scanned} orders, sent {count_alerted} delayed alerts."
-        ))
\ No newline at end of file
+            f"Found {count_pending} newly delayed orders, sent {count_alerted} delayed alerts "
+            f"({time.monotonic() - started:.2f}s)."
+        ))
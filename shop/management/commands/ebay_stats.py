@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from shop.ebay_service import ebay_service, search_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show eBay Browse search cache counters and circuit breaker state."
+
+    def handle(self, *args, **opts):
+        stats = search_cache_stats()
+        lookups = stats["hit"] + stats["stale"] + stats["miss"] + stats["negative"]
+        for name, value in stats.items():
+            self.stdout.write(f"  {name}: {value}")
+        self.stdout.write(f"  circuit breaker: {ebay_service.breaker.state()}")
+        if lookups:
+            served = (stats["hit"] + stats["stale"]) / lookups
+            self.stdout.write(self.style.SUCCESS(f"{lookups} searches, {served:.1%} served from cache."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No searches recorded."))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.pdf_service import pdf_service
+
+
+class Command(BaseCommand):
+    help = "Delete stored PDF receipts/statements older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age-days", type=int, default=None,
+                            help="Delete PDFs older than this many days (default: settings.PDF_CACHE_MAX_AGE_DAYS).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count PDFs that would be deleted without deleting them.")
+
+    def handle(self, *args, **opts):
+        max_age = opts["max_age_days"]
+        if max_age is None:
+            max_age = getattr(settings, "PDF_CACHE_MAX_AGE_DAYS", 30)
+        if max_age < 1:
+            raise CommandError("--max-age-days must be at least 1.")
+        started = time.monotonic()
+
+        files, size = pdf_service.prune(max_age * 86400, dry_run=opts["dry_run"])
+        verb = "would be deleted" if opts["dry_run"] else "deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{files} PDFs ({size / 1024:.0f} KiB) older than {max_age} days {verb} "
+            f"({time.monotonic() - started:.2f}s)."
+        ))
@@ -0,0 +1,187 @@
+import hashlib
+import hmac
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+READY = "ready"
+PENDING = "pending"
+FAILED = "failed"
+
+
+def _render_pdf_file(html: str, path: str) -> bool:
+    """
+    Worker-process entry point: render `html` with xhtml2pdf into `path`.
+    Writes to a temp file first so readers never see a half-written PDF.
+    """
+    from xhtml2pdf import pisa
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            result = pisa.CreatePDF(src=html, dest=out, encoding="UTF-8")
+        if result.err:
+            return False
+        os.replace(tmp_path, path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+class PdfRenderService:
+    """
+    Renders PDFs off the request thread in a process pool and keeps the
+    output under PDF_CACHE_ROOT (outside MEDIA_ROOT, never served directly),
+    keyed by an HMAC of whatever identifies the content (e.g. order id +
+    updated_at). Repeat downloads are served from
+    the stored file without touching xhtml2pdf.
+    """
+
+    def __init__(self) -> None:
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # in-flight renders for this process, by output path
+        self._pending: Dict[str, object] = {}
+
+    # ------------------------- settings ------------------------
+
+    @property
+    def max_workers(self) -> int:
+        # 0 renders inline, for servers that can't host a process pool
+        return int(getattr(settings, "PDF_RENDER_WORKERS", 2))
+
+    @property
+    def wait_seconds(self) -> float:
+        return float(getattr(settings, "PDF_RENDER_WAIT_SECONDS", 1))
+
+    @property
+    def root(self) -> str:
+        return str(getattr(settings, "PDF_CACHE_ROOT", os.path.join(settings.BASE_DIR, "pdf_cache")))
+
+    # ------------------------- paths ---------------------------
+
+    @staticmethod
+    def content_key(*parts) -> str:
+        # keyed with SECRET_KEY so file names can't be derived from ids
+        message = ":".join(str(p) for p in parts).encode("utf-8")
+        return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+    def path_for(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, f"{key}.pdf")
+
+    # ------------------------- rendering -----------------------
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def get_or_render(
+        self,
+        kind: str,
+        key: str,
+        build_html: Callable[[], str],
+        wait: Optional[float] = None,
+    ) -> Tuple[str, str]:
+        """
+        Return (status, path) for the PDF identified by (kind, key).
+
+        A stored file is returned straight away. Otherwise `build_html` is
+        called (only when no render is already in flight here) and the job is
+        handed to the pool; we wait up to `wait` seconds for it, then report
+        PENDING so the caller can answer 202 and have the client poll.
+        """
+        path = self.path_for(kind, key)
+        if os.path.exists(path):
+            return READY, path
+
+        if self.max_workers <= 0:
+            return (READY if _render_pdf_file(build_html(), path) else FAILED), path
+
+        with self._lock:
+            future = self._pending.get(path)
+        if future is None:
+            # templates and their queries run outside the lock, so other
+            # PDFs aren't held up behind this one
+            html = build_html()
+            with self._lock:
+                future = self._pending.get(path)
+                if future is None:
+                    future = self._get_executor().submit(_render_pdf_file, html, path)
+                    self._pending[path] = future
+                    # drop the entry even if no request is left waiting on it
+                    future.add_done_callback(lambda done, path=path: self._forget(path, done))
+
+        wait = self.wait_seconds if wait is None else wait
+        try:
+            ok = future.result(timeout=wait)
+        except FutureTimeout:
+            return PENDING, path
+        except Exception as e:
+            logger.error("PDF render failed for %s: %s", path, e, exc_info=True)
+            ok = False
+        return (READY if ok else FAILED), path
+
+    def _forget(self, path: str, future) -> None:
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+
+    # ------------------------- cleanup -------------------------
+
+    def prune(self, max_age_seconds: float, dry_run: bool = False) -> Tuple[int, int]:
+        """
+        Delete stored PDFs (and leftover .part files) last written more than
+        `max_age_seconds` ago; they are re-rendered if requested again.
+        Returns (files, bytes) removed, or that would be with `dry_run`.
+        """
+        cutoff = time.time() - max_age_seconds
+        files = size = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith((".pdf", ".part")):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime >= cutoff:
+                        continue
+                    if not dry_run:
+                        os.unlink(path)
+                except FileNotFoundError:
+                    continue
+                files += 1
+                size += stat.st_size
+        return files, size
+
+
+def pdf_download_response(request, status: str, path: str, filename: str):
+    """FileResponse for a stored PDF, or a 202 telling the client where to poll."""
+    if status == READY:
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=filename, content_type="application/pdf")
+    response = JsonResponse({"status": PENDING, "poll_url": request.get_full_path()}, status=202)
+    response["Retry-After"] = "2"
+    return response
+
+
+def requested_wait(request) -> Optional[float]:
+    """`?wait=<seconds>` lets async clients ask for an immediate 202 (wait=0)."""
+    try:
+        return max(0.0, float(request.GET["wait"]))
+    except (KeyError, ValueError):
+        return None
+
+
+pdf_service = PdfRenderService()
@@ -12,4 +12,255 @@ class PointsConfigTests(TestCase):
         cfg = PointsConfig.get_solo()
         cfg.points_per_usd = 250
         cfg.save()
-        self.assertEqual(get_points_per_usd(), 250)
\ No newline at end of file
+        self.assertEqual(get_points_per_usd(), 250)
+
+import os
+import tempfile
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from .models import Order, OrderItem
+from .pdf_service import pdf_service
+
+
+class OrderReceiptPdfTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.driver = get_user_model().objects.create_user("pdf_driver", "pd@example.com", "pw")
+        self.order = Order.objects.create(driver=self.driver, points_spent=100)
+        OrderItem.objects.create(order=self.order, name_snapshot="Mug", points_each=100, quantity=1)
+        self.client.force_login(self.driver)
+
+    def test_receipt_rendered_once_then_served_from_storage(self):
+        url = reverse("shop:order_receipt_pdf", args=[self.order.id])
+        with override_settings(PDF_CACHE_ROOT=self.media.name, PDF_RENDER_WORKERS=0):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first["Content-Type"], "application/pdf")
+            self.assertTrue(b"".join(first.streaming_content).startswith(b"%PDF"))
+
+            key = pdf_service.content_key("order", self.order.id, self.order.updated_at.isoformat())
+            path = pdf_service.path_for("receipts", key)
+            self.assertTrue(os.path.exists(path))
+            os.utime(path, (0, 0))
+
+            second = self.client.get(url)
+            b"".join(second.streaming_content)
+            self.assertEqual(os.stat(path).st_mtime, 0)
+
+            from io import StringIO
+            from django.core.management import call_command
+            fresh = pdf_service.path_for("receipts", "fresh")
+            os.makedirs(os.path.dirname(fresh), exist_ok=True)
+            open(fresh, "wb").close()
+            out = StringIO()
+            call_command("prune_pdf_cache", "--max-age-days", "30", stdout=out)
+            self.assertIn("1 PDFs", out.getvalue())
+            self.assertEqual((os.path.exists(path), os.path.exists(fresh)), (False, True))
+
+    def test_finished_renders_are_forgotten(self):
+        from concurrent.futures import Future
+        from unittest import mock
+        future = Future()
+        with override_settings(PDF_CACHE_ROOT=self.media.name, PDF_RENDER_WORKERS=2), \
+                mock.patch.object(pdf_service, "_get_executor") as executor:
+            executor.return_value.submit.return_value = future
+            status, path = pdf_service.get_or_render("receipts", "k", lambda: "<p>x</p>", wait=0)
+        self.assertEqual(status, "pending")
+        self.assertIn(path, pdf_service._pending)
+        # nobody polls again, yet the entry goes once the render finishes
+        future.set_result(True)
+        self.assertNotIn(path, pdf_service._pending)
+
+
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from accounts.models import AlertState, DriverNotificationPreference, Notification
+
+
+class CheckDelayedOrdersTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.driver = User.objects.create_user("late_driver", "late@example.com", "pw")
+        self.muted = User.objects.create_user("muted_driver", "muted@example.com", "pw")
+        DriverNotificationPreference.objects.create(user=self.muted, orders=False)
+        old = timezone.now() - datetime.timedelta(days=10)
+        self.late = Order.objects.create(driver=self.driver)
+        self.late_muted = Order.objects.create(driver=self.muted)
+        self.recent = Order.objects.create(driver=self.driver)
+        self.done = Order.objects.create(driver=self.driver, status="delivered")
+        Order.objects.filter(id__in=[self.late.id, self.late_muted.id, self.done.id]).update(placed_at=old)
+
+    def test_alerts_each_delayed_order_once(self):
+        out = StringIO()
+        call_command("check_delayed_orders", "--dry-run", stdout=out)
+        self.assertIn("2 delayed orders would be alerted", out.getvalue())
+        self.assertFalse(AlertState.objects.exists())
+
+        call_command("check_delayed_orders", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(
+            set(AlertState.objects.values_list("subject_id", flat=True)),
+            {self.late.id, self.late_muted.id},
+        )
+        notes = Notification.objects.filter(title="Order Delayed")
+        self.assertEqual(list(notes.values_list("user_id", flat=True)), [self.driver.id])
+        self.assertEqual(notes.get().url, reverse("shop:order_detail", args=[self.late.id]))
+
+        out = StringIO()
+        call_command("check_delayed_orders", stdout=out)
+        self.assertIn("Found 0 newly delayed orders", out.getvalue())
+        self.assertEqual(notes.count(), 1)
+
+
+import time
+from unittest import mock
+from django.core.cache import cache
+import requests
+from .ebay_service import EbayService, EbayError, EbayUnavailable, search_cache_stats
+
+
+@override_settings(EBAY_SEARCH_CACHE_SECONDS=60, EBAY_SEARCH_STALE_SECONDS=600, EBAY_SANDBOX=False)
+class EbaySearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = EbayService()
+        patcher = mock.patch.object(EbayService, "_fetch_search", side_effect=self.fake_fetch)
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.version = 0
+
+    def fake_fetch(self, params):
+        self.version += 1
+        return {"total": 1, "itemSummaries": [{"itemId": f"v{self.version}"}], "q": params["q"]}
+
+    def test_background_refresh_closes_its_db_connections(self):
+        from shop.ebay_service import _refresh_in_background
+        job = mock.Mock(side_effect=RuntimeError)
+        with mock.patch("shop.ebay_service.connections.close_all") as close_all, \
+                mock.patch("shop.ebay_service.threading.Thread") as thread:
+            _refresh_in_background(job)
+            with self.assertRaises(RuntimeError):
+                thread.call_args.kwargs["target"]()
+        job.assert_called_once()
+        close_all.assert_called_once()
+
+    def test_normalized_queries_share_one_entry_and_stale_entries_refresh_in_background(self):
+        first = self.service.search_products("  Electronics ", category_ids=["9355", "58058"])
+        again = self.service.search_products("electronics", category_ids="58058,9355")
+        self.assertEqual(first, again)
+        self.assertEqual(self.fetch.call_count, 1)
+        self.service.search_products("electronics", offset=20)
+        self.assertEqual(self.fetch.call_count, 2)
+
+        with mock.patch("shop.ebay_service.time.time", return_value=time.time() + 120), \
+                mock.patch("shop.ebay_service._refresh_in_background", side_effect=lambda fn: fn()) as refresh:
+            stale = self.service.search_products("electronics", category_ids=["9355", "58058"])
+        self.assertEqual(stale["itemSummaries"][0]["itemId"], "v1")
+        refresh.assert_called_once()
+        fresh = self.service.search_products("electronics", category_ids=["9355", "58058"])
+        self.assertEqual(fresh["itemSummaries"][0]["itemId"], "v3")
+
+        self.assertEqual(search_cache_stats(), {"hit": 2, "stale": 1, "miss": 2, "negative": 0, "error": 0, "rejected": 0})
+
+    def test_failed_search_is_cached_negatively_for_a_short_while(self):
+        self.fetch.side_effect = requests.Timeout("read timed out")
+        for _ in range(3):
+            with self.assertRaises(EbayError):
+                self.service.search_products("tires")
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual((search_cache_stats()["miss"], search_cache_stats()["negative"]), (1, 2))
+
+        # only that search key is marked
+        self.fetch.side_effect = self.fake_fetch
+        self.assertEqual(self.service.search_products("brakes")["q"], "brakes")
+
+
+@override_settings(EBAY_HTTP_POOL_SIZE=4, EBAY_HTTP_MAX_RETRIES=2, EBAY_HTTP_CONNECT_TIMEOUT=1, EBAY_HTTP_READ_TIMEOUT=7,
+                   EBAY_HTTP_BACKOFF_FACTOR=0.5, EBAY_HTTP_DEADLINE_SECONDS=10)
+class EbayHttpSessionTests(TestCase):
+    def test_calls_share_one_pooled_session(self):
+        service = EbayService()
+        self.assertEqual(service.pool_stats(), {})
+        self.assertIs(service.session, service.session)
+
+        adapter = service.session.get_adapter(service.base_url)
+        self.assertEqual(adapter.max_retries.total, 0)
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"itemId": "x"}
+        with mock.patch.object(EbayService, "get_access_token", return_value="t"), \
+                mock.patch.object(service.session, "request", return_value=response) as get:
+            service.get_product_details("x")
+        self.assertEqual(get.call_args.kwargs["timeout"], (1, 7))
+
+        adapter.poolmanager.connection_from_url(service.base_url)
+        stats = service.pool_stats()
+        self.assertEqual(list(stats.values()), [{"connections_opened": 0, "requests": 0, "idle": 0, "maxsize": 4}])
+
+    def test_retries_stay_inside_the_deadline(self):
+        service = EbayService()
+        busy = mock.Mock(status_code=503, headers={})
+        ok = mock.Mock(status_code=200, headers={})
+        with mock.patch("shop.ebay_service.time.sleep") as sleep, \
+                mock.patch.object(service.session, "request", side_effect=[requests.ConnectionError("reset"), busy, ok]) as request:
+            self.assertIs(service._send("GET", "https://api.ebay.com/x"), ok)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+        # read timeouts aren't retried
+        with mock.patch.object(service.session, "request", side_effect=requests.ReadTimeout("slow")) as request:
+            with self.assertRaises(requests.ReadTimeout):
+                service._send("GET", "https://api.ebay.com/x")
+        self.assertEqual(request.call_count, 1)
+
+        # a Retry-After past the deadline isn't waited out
+        throttled = mock.Mock(status_code=429, headers={"Retry-After": "120"})
+        with mock.patch("shop.ebay_service.time.sleep") as sleep, \
+                mock.patch.object(service.session, "request", return_value=throttled) as request:
+            self.assertIs(service._send("GET", "https://api.ebay.com/x"), throttled)
+        self.assertEqual(request.call_count, 1)
+        sleep.assert_not_called()
+
+
+@override_settings(EBAY_SANDBOX=False, EBAY_BREAKER_FAILURE_THRESHOLD=2, EBAY_BREAKER_COOLDOWN_SECONDS=30,
+                   EBAY_HTTP_MAX_RETRIES=0)
+class EbayCircuitBreakerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.service = EbayService()
+        for patcher in (
+            mock.patch.object(EbayService, "get_access_token", return_value="t"),
+            mock.patch.object(self.service.session, "request", side_effect=requests.ConnectionError("down")),
+        ):
+            self.request = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_opens_after_consecutive_failures_then_probes_once(self):
+        with self.assertLogs("shop.ebay_service", "WARNING") as logs:
+            for n in range(2):
+                with self.assertRaises(EbayError):
+                    self.service.search_products(f"query {n}")
+        self.assertEqual(self.service.breaker.state(), "open")
+        self.assertTrue(any("circuit breaker open" in line for line in logs.output))
+
+        with self.assertRaises(EbayUnavailable):
+            self.service.search_products("another")
+        with self.assertRaises(EbayUnavailable):
+            self.service.get_product_details("x")
+        self.assertEqual(self.request.call_count, 2)
+
+        ok = mock.Mock(status_code=200)
+        ok.json.return_value = {"total": 1, "itemSummaries": [{"itemId": "a"}]}
+        self.request.side_effect = None
+        self.request.return_value = ok
+        with mock.patch("shop.ebay_service.time.time", return_value=time.time() + 31):
+            self.assertEqual(self.service.breaker.state(), "half-open")
+            self.assertTrue(self.service.breaker.allow())
+            self.assertFalse(self.service.breaker.allow())  # one probe at a time
+            cache.delete(self.service.breaker._key("probe"))
+            self.assertEqual(self.service.search_products("back")["total"], 1)
+        self.assertEqual(self.service.breaker.state(), "closed")
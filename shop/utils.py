@@ -41,6 +41,18 @@ def order_is_delayed(order, now=None, grace_hours=24):
     deadline = promised + timedelta(hours=grace_hours)
     return now > deadline
 
+def delayed_orders(now=None, grace_hours=24):
+    """
+    Queryset form of order_is_delayed for the nightly scan. Order has none
+    of the promised ship-by fields, so the deadline is always placed_at +
+    7 days + grace and the test reduces to one comparison on placed_at.
+    """
+    from .models import Order
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=7, hours=grace_hours)
+    return Order.objects.exclude(status__in=TERMINAL_STATUSES).filter(placed_at__lt=cutoff)
+
 def get_points_per_usd(user=None):
     if user is not None:
         try:
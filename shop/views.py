@@ -18,11 +18,11 @@ from .models import Order, OrderItem, CartItem, Favorite, PointsConfig, SponsorC
 from django.urls import reverse
 from .models import Wishlist, WishListItem
 from django.core.paginator import Paginator
-from .ebay_service import ebay_service
+from .ebay_service import ebay_service, EbayUnavailable
 from django.utils.dateparse import parse_date
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.http import JsonResponse
-from xhtml2pdf import pisa
+from .pdf_service import pdf_service, pdf_download_response, requested_wait, FAILED
 import json
 import csv
 from accounts.models import SponsorPointsAccount
@@ -1117,6 +1117,8 @@ def catalog_search_ajax(request):
             'offset': offset
         })
         
+    except EbayUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=503)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
     
@@ -1243,34 +1245,33 @@ def add_to_wishlist_from_catalog(request):
 
 @login_required
 def order_receipt_pdf(request, order_id: int):
-    """Generate a PDF receipt for the logged-in driver's order."""
+    """
+    Serve the PDF receipt for the logged-in driver's order.
+    Rendered once per (order, updated_at) in the PDF worker pool and then
+    served from the PDF cache; returns 202 with a polling URL while rendering.
+    """
     order = get_object_or_404(Order, id=order_id, driver=request.user)
-    items = order.items.all()
-    subtotal_points = sum(i.points_each * i.quantity for i in items)
-
-    html = render_to_string(
-        "shop/order_receipt.html",
-        {
-            "order": order,
-            "items": items,
-            "subtotal_points": subtotal_points,
-            "user": request.user,
-            "base_url": request.build_absolute_uri("/"),
-        },
-    )
 
-    pdf_io = BytesIO()
-    # Let xhtml2pdf resolve relative URLs (images, css) via link_callback
-    result = pisa.CreatePDF(src=html, dest=pdf_io, encoding="UTF-8")
+    def build_html():
+        items = order.items.all()
+        subtotal_points = sum(i.points_each * i.quantity for i in items)
+        return render_to_string(
+            "shop/order_receipt.html",
+            {
+                "order": order,
+                "items": items,
+                "subtotal_points": subtotal_points,
+                "user": request.user,
+                "base_url": request.build_absolute_uri("/"),
+            },
+        )
 
-    if result.err:
-        return HttpResponse(html)
+    key = pdf_service.content_key("order", order.id, order.updated_at.isoformat())
+    status, path = pdf_service.get_or_render("receipts", key, build_html, wait=requested_wait(request))
 
-    pdf = pdf_io.getvalue()
-    filename = f"order_{order.id}_receipt.pdf"
-    resp = HttpResponse(pdf, content_type="application/pdf")
-    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return resp
+    if status == FAILED:
+        return HttpResponse(build_html())
+    return pdf_download_response(request, status, path, f"order_{order.id}_receipt.pdf")
 
 @login_required
 def favorites_list(request):
@@ -1388,6 +1389,7 @@ def _csv_or_render(request, filename_base, columns, rows, template_name, context
 # ------------------------------
 from django.contrib.auth.decorators import login_required
 from accounts.models import PointsLedger, DriverProfile
+from accounts.archive import history_rows
 from django.contrib.auth.models import User
 
 @login_required
@@ -1412,15 +1414,25 @@ def report_driver_points(request):
         sponsor_scope = getattr(getattr(user, "driver_profile", None), "sponsor_name", "") or ""
 
     # --- Build QuerySet ---
-    qs = PointsLedger.objects.filter(created_at__range=(start_dt, end_dt))
-
-    if driver_username:
-        qs = qs.filter(user__username=driver_username)
-
-    if sponsor_scope:
-        qs = qs.filter(user__driver_profile__sponsor_name=sponsor_scope)
-
-    qs = qs.select_related("user", "user__driver_profile").order_by("-created_at")
+    # history_rows unions in archived months so old ranges still report.
+    filters = {}
+    if driver_username or sponsor_scope:
+        drivers = User.objects.all()
+        if driver_username:
+            drivers = drivers.filter(username=driver_username)
+        if sponsor_scope:
+            drivers = drivers.filter(driver_profile__sponsor_name=sponsor_scope)
+        filters["user_id__in"] = list(drivers.values_list("id", flat=True))
+
+    recs = list(history_rows(
+        "points_ledger", start_dt, end_dt,
+        fields=("created_at", "user_id", "delta", "reason"),
+        order_by=("-created_at",),
+        **filters,
+    ))
+    user_ids = {r["user_id"] for r in recs}
+    usernames = dict(User.objects.filter(id__in=user_ids).values_list("id", "username"))
+    sponsors = dict(DriverProfile.objects.filter(user_id__in=user_ids).values_list("user_id", "sponsor_name"))
 
     # --- Build Data Table ---
     columns = ["Date", "Driver", "Sponsor", "Δ Points", "Reason"]
@@ -1428,14 +1440,13 @@ def report_driver_points(request):
     total_credited = 0
     total_debited = 0
     total_fee_usd = 0.0
-    for rec in qs:
-        sponsor_name = getattr(getattr(rec.user, "driver_profile", None), "sponsor_name", "") or ""
+    for rec in recs:
         rows.append([
-            timezone.localtime(rec.created_at).strftime("%Y-%m-%d %H:%M"),
-            rec.user.username,
-            sponsor_name,
-            rec.delta,
-            rec.reason or "",
+            timezone.localtime(rec["created_at"]).strftime("%Y-%m-%d %H:%M"),
+            usernames.get(rec["user_id"], ""),
+            sponsors.get(rec["user_id"]) or "",
+            rec["delta"],
+            rec["reason"] or "",
         ])
 
     # Sponsor dropdown options
@@ -151,16 +151,113 @@ SESSION_SAVE_EVERY_REQUEST = True  # refresh session expiry on each request
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "no-reply@demo.local"
 
+# Notification outbox (dispatch_notifications): failed sends retry after
+# BACKOFF * 2**(attempt-1) seconds, giving up after MAX_ATTEMPTS.
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 5
+NOTIFICATION_OUTBOX_BACKOFF_SECONDS = 60
+
+# prune_notifications: days to keep read notifications, per kind (kinds not
+# listed use NOTIFICATION_RETENTION_DEFAULT_DAYS). Unread ones are kept for
+# NOTIFICATION_UNREAD_RETENTION_DAYS; None keeps them until read.
+NOTIFICATION_RETENTION_DAYS = {
+    "promotions": 30,
+    "points": 180,
+    "orders": 180,
+    "dropped": 365,
+}
+NOTIFICATION_RETENTION_DEFAULT_DAYS = 180
+NOTIFICATION_UNREAD_RETENTION_DAYS = 365
+
 # eBay API Configuration - Load from environment variables, fallback to defaults
 EBAY_CLIENT_ID = os.getenv("EBAY_CLIENT_ID", "")
 EBAY_CLIENT_SECRET = os.getenv("EBAY_CLIENT_SECRET", "")
 EBAY_SANDBOX = os.getenv("EBAY_SANDBOX", "False").lower() in ("true", "1", "yes")
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Browse search responses are shared for EBAY_SEARCH_CACHE_SECONDS, then
+# served stale (while one request refreshes them) for EBAY_SEARCH_STALE_SECONDS.
+EBAY_SEARCH_CACHE_SECONDS = 300
+EBAY_SEARCH_STALE_SECONDS = 3600
+# A failed search is cached (negatively) this long, so retries of the same
+# query don't each wait out another eBay timeout.
+EBAY_SEARCH_FAILURE_CACHE_SECONDS = 15
+
+# eBay HTTP client: one pooled keep-alive session per process. 429/5xx and
+# connection errors retry with exponential backoff (BACKOFF_FACTOR * 2**n s,
+# or Retry-After if longer); read timeouts don't retry. A call, retries and
+# waits included, gives up after EBAY_HTTP_DEADLINE_SECONDS.
+EBAY_HTTP_POOL_SIZE = 10
+EBAY_HTTP_MAX_RETRIES = 3
+EBAY_HTTP_BACKOFF_FACTOR = 0.5
+EBAY_HTTP_CONNECT_TIMEOUT = 3.05
+EBAY_HTTP_READ_TIMEOUT = 15
+EBAY_HTTP_DEADLINE_SECONDS = 20
+
+# After this many consecutive eBay outage errors (connection/timeout/429/5xx)
+# all workers fail fast for the cooldown, then let one request probe.
+EBAY_BREAKER_FAILURE_THRESHOLD = 5
+EBAY_BREAKER_COOLDOWN_SECONDS = 30
+
+# The cache must be shared by every worker process: the eBay breaker, search
+# cache counters and invalidation of cached balances/preferences rely on it.
+# Set REDIS_URL (redis://host:6379/0) or MEMCACHED_LOCATION (host:11211).
+# Without either the per-process LocMemCache is used, which is only fine for
+# a single-process dev server; `manage.py check` warns about it (accounts.W001).
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+elif os.getenv("MEMCACHED_LOCATION"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.getenv("MEMCACHED_LOCATION"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
     }
-}
 
 # Settings file updated - ready for EC2 deployment
+
+# Seconds a driver's materialized points total may be served from cache
+POINTS_BALANCE_CACHE_SECONDS = 300
+
+UNREAD_COUNTS_CACHE_SECONDS = 300
+
+# Chat room participant-id sets gate chat access. They're dropped whenever a
+# sponsorship changes; the short TTL bounds how long a removed driver keeps
+# access if an invalidation is missed.
+CHAT_PARTICIPANTS_CACHE_SECONDS = 60
+
+# Server-sent events (accounts.views.events_stream). SSE_DB_POLL_SECONDS is
+# the fallback re-check for rows written by other processes; 0 disables it.
+SSE_HEARTBEAT_SECONDS = 20
+SSE_DB_POLL_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = 300
+
+# Targeted admin messages create inbox rows this many recipients at a time.
+MESSAGE_DELIVERY_CHUNK_SIZE = 1000
+
+# Per-process LRU of DriverNotificationPreference rows (accounts.prefs);
+# entries are reloaded at least every NOTIF_PREFS_LRU_SECONDS.
+NOTIF_PREFS_LRU_SIZE = 1024
+NOTIF_PREFS_LRU_SECONDS = 60
+
+# PDF receipts/statements: rendered in a process pool and stored under PDF_CACHE_ROOT, which
+# must not be web-served (they're private; downloads go through the views' access checks).
+# PDF_RENDER_WORKERS = 0 renders inline; requests wait up to PDF_RENDER_WAIT_SECONDS before returning 202.
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_RENDER_WAIT_SECONDS = 1
+PDF_CACHE_ROOT = os.getenv("PDF_CACHE_ROOT", str(BASE_DIR / "pdf_cache"))
+# prune_pdf_cache deletes stored PDFs older than this; they re-render on demand.
+PDF_CACHE_MAX_AGE_DAYS = 30
+
+# Ledger/audit rows older than this move to monthly archive tables (archive_history).
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))